@@ -0,0 +1,425 @@
+"""
+Benchmark suite: agent overhead, throughput and memory with stub backends.
+
+Runs both agents offline against StubLLM / StubTavily (benchmarks/stubs.py),
+so the numbers are the agents' own cost on top of a known backend latency
+and can be compared across commits:
+
+- nodes:      per-node latency (p50/p99/mean) calling each node directly
+- overhead:   graph invoke time minus the same nodes run back to back, with
+              zero-latency stubs, i.e. what LangGraph + state handling adds
+- throughput: requests/s and latency percentiles through ainvoke at several
+              concurrency levels
+- memory:     tracemalloc peak per request (alone and while N are in flight)
+              and what stays allocated after the run
+
+Caches, coalescing, speculation and context reuse are switched off so every
+request does the full work. Results are written as JSON (with the commit
+they were measured on); ``--compare`` prints the change against an earlier
+file.
+
+Usage:
+    python benchmarks/agent_suite.py
+    python benchmarks/agent_suite.py --llm-latency 0.05 --search-latency 0.2 \\
+        --concurrency 1,8,32,128 --requests 256 --output .cache/benchmarks/new.json
+    python benchmarks/agent_suite.py --compare .cache/benchmarks/old.json
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from stubs import AsyncStubLLM, AsyncStubTavily, StubLLM, StubTavily
+
+from agents import conversational, multi_tool
+from tools import search
+from tools.search import WebSearchTool
+from utils import llm
+from utils.config import Config
+from utils.context_reuse import set_context_reuse
+from utils.semantic_cache import set_semantic_cache
+
+MULTI_TOOL_QUESTIONS = [
+    "What is 157 * 23?",                               # rules → calculator → template
+    "Latest AI news this week",                        # rules → search → LLM synthesis
+    "Tell me something interesting about octopuses",   # LLM router → direct
+    "Who is the CEO of the largest chip maker?",       # LLM router → search
+]
+CHAT_QUESTION = "What did we decide about the launch date?"
+SEARCH_STRATEGIES = {"search": "llm"}
+
+
+# ====================
+# SETUP
+# ====================
+
+def install_stubs(llm_latency: float, search_latency: float, per_token: float) -> dict:
+    """Point the LLM layer and the search tool at stubs; return them."""
+    stubs = {
+        "llm": StubLLM(llm_latency, per_token=per_token),
+        "allm": AsyncStubLLM(llm_latency, per_token=per_token),
+        "tavily": StubTavily(search_latency),
+        "atavily": AsyncStubTavily(search_latency),
+    }
+    llm.set_client(stubs["llm"])
+    llm.set_async_client(stubs["allm"])
+    search.web_search_tool = WebSearchTool(client=stubs["tavily"], async_client=stubs["atavily"])
+    return stubs
+
+
+def disable_shortcuts() -> None:
+    """Every request should do the full work."""
+    for flag in (
+        "LLM_CACHE_ENABLED", "COALESCE_ENABLED", "SEMANTIC_CACHE_ENABLED",
+        "SPECULATION_ENABLED", "CONTEXT_REUSE_ENABLED", "SESSION_STORE_ENABLED",
+    ):
+        setattr(Config, flag, False)
+    Config.OLLAMA_BACKENDS = ""
+    Config.OLLAMA_MAX_OUTSTANDING = 0
+    llm.set_llm_cache(None)
+    llm.set_llm_flight(None)
+    llm.set_backend_pool(None)
+    set_context_reuse(None)
+    set_semantic_cache(None)
+
+
+def build_agents() -> dict:
+    return {
+        "multi_tool": multi_tool.create_multi_tool_agent(
+            synthesis_strategies=SEARCH_STRATEGIES, speculate=False, coalesce=False
+        ),
+        "conversational": conversational.create_conversational_agent(memory_mode="rolling"),
+    }
+
+
+def chat_state(turns: int = 6) -> dict:
+    """A session a few turns in, so memory folding and the window both run."""
+    messages = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"Question {i} about the launch plan?"})
+        messages.append({"role": "assistant", "content": f"Answer {i}: the plan is on track."})
+    return {"messages": messages, "summary": "We are planning a launch.", "summarized_count": 0}
+
+
+def multi_tool_input(i: int) -> dict:
+    return {"question": MULTI_TOOL_QUESTIONS[i % len(MULTI_TOOL_QUESTIONS)]}
+
+
+def chat_input(i: int) -> dict:
+    return {**chat_state(), "current_question": f"{CHAT_QUESTION} (#{i})"}
+
+
+# ====================
+# MEASUREMENTS
+# ====================
+
+def summarize(samples: List[float]) -> dict:
+    ms = np.asarray(samples) * 1e3
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "mean_ms": round(float(ms.mean()), 4),
+    }
+
+
+def timed(fn: Callable[[], object], repeats: int) -> List[float]:
+    fn()  # warm up
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def node_cases() -> Dict[str, Callable[[], object]]:
+    """Each node called directly with a representative state."""
+    calc, news, chat, lookup = MULTI_TOOL_QUESTIONS
+    searched = {"question": news, "tool_choice": "search", "tool_output": search.search_web(news)}
+    calculated = {
+        "question": calc, "tool_choice": "calculator",
+        **multi_tool.calculator_node({"question": calc}),
+    }
+    window = Config.MEMORY_WINDOW_TURNS
+    turn = {**chat_state(), "current_question": CHAT_QUESTION}
+    answered = {**turn, "answer": "The launch is on Friday.", "retrieved_context": "Friday."}
+
+    return {
+        "multi_tool.router[rules]": lambda: multi_tool.router_node({"question": calc}),
+        "multi_tool.router[llm]": lambda: multi_tool.router_node({"question": chat}),
+        "multi_tool.search": lambda: multi_tool.search_node({"question": lookup}),
+        "multi_tool.calculator": lambda: multi_tool.calculator_node({"question": calc}),
+        "multi_tool.direct": lambda: multi_tool.direct_answer_node({"question": chat}),
+        "multi_tool.synthesizer[template]": lambda: multi_tool.synthesizer_node(calculated),
+        "multi_tool.synthesizer[llm]": lambda: multi_tool.synthesizer_node(
+            searched, strategies=SEARCH_STRATEGIES
+        ),
+        "conversational.retrieve_context": lambda: conversational.retrieve_context_node(
+            turn, window_turns=window
+        ),
+        "conversational.answer_question": lambda: conversational.answer_question_node(
+            turn, window_turns=window
+        ),
+        "conversational.update_memory": lambda: conversational.update_memory_node(
+            answered, window_turns=window
+        ),
+    }
+
+
+def run_multi_tool_nodes(state: dict) -> dict:
+    """The multi-tool graph's path, as plain function calls."""
+    state = {**state, **multi_tool.router_node(state)}
+    tool = multi_tool.route_to_tool(state)
+    node = {
+        "search": multi_tool.search_node,
+        "calculator": multi_tool.calculator_node,
+        "direct": multi_tool.direct_answer_node,
+    }[tool]
+    state = {**state, **node(state)}
+    return {**state, **multi_tool.synthesizer_node(state, strategies=SEARCH_STRATEGIES)}
+
+
+def run_conversational_nodes(state: dict) -> dict:
+    """The conversational graph's path, as plain function calls."""
+    window = Config.MEMORY_WINDOW_TURNS
+    state = {**state, **conversational.retrieve_context_node(state, window_turns=window)}
+    state = {**state, **conversational.answer_question_node(state, window_turns=window)}
+    return {**state, **conversational.update_memory_node(state, window_turns=window)}
+
+
+def graph_overhead(agents: dict, repeats: int) -> dict:
+    """Graph invoke vs. the same node sequence (run with zero-latency stubs)."""
+    results = {}
+    plans = {
+        "multi_tool": (multi_tool_input, run_multi_tool_nodes),
+        "conversational": (chat_input, run_conversational_nodes),
+    }
+    for name, (make_input, run_nodes) in plans.items():
+        agent = agents[name]
+        counter = iter(range(10**9))
+        graph = summarize(timed(lambda: agent.invoke(make_input(next(counter))), repeats))
+        counter = iter(range(10**9))
+        nodes = summarize(timed(lambda: run_nodes(make_input(next(counter))), repeats))
+        results[name] = {
+            "graph_p50_ms": graph["p50_ms"],
+            "nodes_p50_ms": nodes["p50_ms"],
+            "overhead_p50_ms": round(graph["p50_ms"] - nodes["p50_ms"], 4),
+            "graph_p99_ms": graph["p99_ms"],
+            "nodes_p99_ms": nodes["p99_ms"],
+        }
+    return results
+
+
+async def _burst(agent, make_input, requests: int, concurrency: int) -> List[float]:
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with slots:
+            start = time.perf_counter()
+            await agent.ainvoke(make_input(i))
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies
+
+
+def throughput(agents: dict, levels: List[int], requests: int) -> dict:
+    results = {}
+    for name, make_input in (("multi_tool", multi_tool_input), ("conversational", chat_input)):
+        results[name] = {}
+        for level in levels:
+            count = max(requests, level)
+            start = time.perf_counter()
+            latencies = asyncio.run(_burst(agents[name], make_input, count, level))
+            elapsed = time.perf_counter() - start
+            results[name][str(level)] = {
+                "requests": count,
+                "rps": round(count / elapsed, 2),
+                **summarize(latencies),
+            }
+    return results
+
+
+def memory(agents: dict, concurrency: int) -> dict:
+    results = {}
+    for name, make_input in (("multi_tool", multi_tool_input), ("conversational", chat_input)):
+        agent = agents[name]
+        asyncio.run(_burst(agent, make_input, concurrency, concurrency))  # warm up
+
+        gc.collect()
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        agent.invoke(make_input(0))
+        single_peak = tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+
+        gc.collect()
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        asyncio.run(_burst(agent, make_input, concurrency, concurrency))
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results[name] = {
+            "single_peak_kb": round(single_peak / 1024, 2),
+            "concurrent_peak_kb_per_request": round((peak - base) / concurrency / 1024, 2),
+            "retained_kb_per_request": round(max(0, current - base) / concurrency / 1024, 2),
+            "concurrency": concurrency,
+        }
+    return results
+
+
+# ====================
+# REPORTING
+# ====================
+
+def git_commit() -> str:
+    try:
+        sha = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+            capture_output=True, text=True,
+        ).stdout.strip()
+        return f"{sha}-dirty" if dirty else sha
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(current: dict, baseline: dict) -> None:
+    """Print metrics that moved by more than 5% against a baseline file."""
+    sections = ("nodes", "overhead", "throughput", "memory")
+    now = flatten({k: current[k] for k in sections if k in current})
+    before = flatten({k: baseline[k] for k in sections if k in baseline})
+    print(f"\nChange vs {baseline['meta']['commit']} (|Δ| > 5%):")
+    moved = 0
+    for key in sorted(now.keys() & before.keys()):
+        old, new = before[key], now[key]
+        # Sub-0.05 ms/KB differences are timer noise on the near-free nodes
+        if not old or key.endswith(("requests", "concurrency")) or abs(new - old) < 0.05:
+            continue
+        change = (new - old) / old
+        if abs(change) > 0.05:
+            moved += 1
+            print(f"  {key:<60}{old:>12.3f} → {new:<12.3f}{change:+.1%}")
+    if not moved:
+        print("  nothing moved")
+
+
+def print_report(results: dict) -> None:
+    print(f"\nNode latency (stub LLM {results['meta']['llm_latency'] * 1e3:.0f}ms, "
+          f"search {results['meta']['search_latency'] * 1e3:.0f}ms)")
+    print(f"{'node':<38}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for node, r in results["nodes"].items():
+        print(f"{node:<38}{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}{r['mean_ms']:>10.3f}")
+
+    print("\nGraph overhead (zero-latency stubs)")
+    print(f"{'agent':<16}{'graph p50':>12}{'nodes p50':>12}{'overhead':>12}")
+    for name, r in results["overhead"].items():
+        print(f"{name:<16}{r['graph_p50_ms']:>10.3f}ms{r['nodes_p50_ms']:>10.3f}ms"
+              f"{r['overhead_p50_ms']:>10.3f}ms")
+
+    print("\nThroughput (ainvoke)")
+    print(f"{'agent':<16}{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, levels in results["throughput"].items():
+        for level, r in levels.items():
+            print(f"{name:<16}{level:>6}{r['rps']:>10.1f}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}")
+
+    print("\nMemory per request")
+    print(f"{'agent':<16}{'alone KB':>10}{'in flight KB':>14}{'retained KB':>13}")
+    for name, r in results["memory"].items():
+        print(f"{name:<16}{r['single_peak_kb']:>10.1f}"
+              f"{r['concurrent_peak_kb_per_request']:>14.1f}{r['retained_kb_per_request']:>13.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per LLM call")
+    parser.add_argument("--per-token", type=float, default=0.0, help="seconds per generated token")
+    parser.add_argument("--search-latency", type=float, default=0.2, help="seconds per search")
+    parser.add_argument("--repeats", type=int, default=30, help="samples per node / overhead")
+    parser.add_argument("--concurrency", default="1,8,32,128")
+    parser.add_argument("--requests", type=int, default=128, help="requests per level")
+    parser.add_argument("--memory-concurrency", type=int, default=32)
+    parser.add_argument("--output", help="JSON path (default .cache/benchmarks/agents-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to diff against")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    disable_shortcuts()
+    agents = build_agents()
+
+    results = {
+        "meta": {
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "llm_latency": args.llm_latency,
+            "per_token": args.per_token,
+            "search_latency": args.search_latency,
+            "repeats": args.repeats,
+        }
+    }
+
+    # Node prints would dominate the terminal; they still run (and count)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        stubs = install_stubs(args.llm_latency, args.search_latency, args.per_token)
+        results["nodes"] = {
+            name: summarize(timed(fn, args.repeats)) for name, fn in node_cases().items()
+        }
+
+        install_stubs(0.0, 0.0, 0.0)
+        results["overhead"] = graph_overhead(agents, args.repeats)
+
+        stubs = install_stubs(args.llm_latency, args.search_latency, args.per_token)
+        results["throughput"] = throughput(agents, levels, args.requests)
+        results["memory"] = memory(agents, args.memory_concurrency)
+        results["meta"]["backend_calls"] = {
+            "llm": stubs["llm"].calls + stubs["allm"].calls,
+            "search": stubs["tavily"].calls + stubs["atavily"].calls,
+        }
+
+    print_report(results)
+
+    output = Path(args.output or ROOT / ".cache" / "benchmarks" / f"agents-{commit}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(results, json.loads(Path(args.compare).read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark: conversation history updates over long sessions.
+
+Compares the old update_memory pattern (copy the whole list of dicts and
+return it every turn) with the append_messages reducer over a MessageLog of
+slotted Messages. Optionally runs the real conversational graph with a stub
+LLM to show per-turn time staying flat.
+
+Usage:
+    python benchmarks/history_updates.py --turns 10000
+    python benchmarks/history_updates.py --turns 10000 --graph-turns 2000
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from utils.messages import Message, MessageLog, append_messages
+
+
+def _turn(i: int):
+    return f"Question number {i} about the session?", f"Answer number {i}, kept short."
+
+
+def copy_per_turn(turns: int):
+    """Old pattern: list(messages) + two new dicts, returned as the new state."""
+    messages = []
+    for i in range(turns):
+        question, answer = _turn(i)
+        history = list(messages)
+        history.append({"role": "user", "content": question})
+        history.append({"role": "assistant", "content": answer})
+        messages = history
+    return messages
+
+
+def append_reducer(turns: int):
+    """New pattern: the node emits only the new turn; the reducer appends it."""
+    messages = MessageLog()
+    for i in range(turns):
+        question, answer = _turn(i)
+        messages = append_messages(messages, [Message("user", question), Message("assistant", answer)])
+    return messages
+
+
+def measure(fn, turns: int) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    history = fn(turns)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(history) == 2 * turns
+    return {
+        "seconds": elapsed,
+        "us_per_turn": elapsed / turns * 1e6,
+        "retained_mb": current / 1e6,
+        "peak_mb": peak / 1e6,
+    }
+
+
+def graph_per_turn(turns: int) -> dict:
+    """Per-turn latency of the real graph (rolling memory, stub LLM)."""
+    from types import SimpleNamespace
+
+    from agents.conversational import create_conversational_agent
+    from utils import llm
+
+    llm.set_client(SimpleNamespace(generate=lambda model, prompt, options=None, **_: {"response": "ok"}))
+    agent = create_conversational_agent(memory_mode="rolling")
+
+    state = {"messages": MessageLog()}
+    timings = []
+    for i in range(turns):
+        start = time.perf_counter()
+        result = agent.invoke({**state, "current_question": _turn(i)[0]})
+        timings.append(time.perf_counter() - start)
+        state = {k: result[k] for k in ("messages", "summary", "summarized_count") if k in result}
+
+    tenth = max(1, turns // 10)
+    return {
+        "first_10pct_ms": sum(timings[:tenth]) / tenth * 1e3,
+        "last_10pct_ms": sum(timings[-tenth:]) / tenth * 1e3,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turns", type=int, default=10_000)
+    parser.add_argument("--graph-turns", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"History updates over {args.turns:,} turns")
+    print(f"{'approach':<18}{'total s':>10}{'µs/turn':>10}{'retained MB':>14}{'peak MB':>10}")
+    for name, fn in [("copy per turn", copy_per_turn), ("append reducer", append_reducer)]:
+        r = measure(fn, args.turns)
+        print(
+            f"{name:<18}{r['seconds']:>10.3f}{r['us_per_turn']:>10.1f}"
+            f"{r['retained_mb']:>14.2f}{r['peak_mb']:>10.2f}"
+        )
+
+    as_dict = sys.getsizeof({"role": "user", "content": ""})
+    as_message = sys.getsizeof(Message("user", ""))
+    print(f"\nPer-message container: dict {as_dict} B, Message {as_message} B")
+
+    if args.graph_turns:
+        r = graph_per_turn(args.graph_turns)
+        print(
+            f"\nGraph, {args.graph_turns:,} turns: first 10% {r['first_10pct_ms']:.2f} ms/turn, "
+            f"last 10% {r['last_10pct_ms']:.2f} ms/turn"
+        )
+
+
+if __name__ == "__main__":
+    main()
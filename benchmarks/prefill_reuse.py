@@ -0,0 +1,85 @@
+"""
+Benchmark: prefill time with and without KV-context reuse.
+
+Needs a running Ollama with the configured model. Runs the same router
+prompts and a short full-transcript conversation twice, first with context
+reuse off and then on, and prints the prefill tokens/time Ollama reports
+(prompt_eval_count / prompt_eval_duration).
+
+Usage:
+    python benchmarks/prefill_reuse.py --questions 20 --turns 8
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from agents import multi_tool
+from agents.conversational import create_conversational_agent
+from utils import llm
+from utils.config import Config
+from utils.context_reuse import (
+    DEFAULT_RAW_FORMATS,
+    ContextReuse,
+    parse_raw_formats,
+    set_context_reuse,
+)
+
+QUESTIONS = [
+    "Who is the current CEO of the largest chip maker?",
+    "Tell me something interesting about octopuses",
+    "How much is a quarter of 1,024?",
+    "Which team leads the league this season?",
+    "Give me a tip for learning Rust",
+]
+
+
+def run_workload(questions: int, turns: int) -> dict:
+    llm.reset_prefill_stats()
+    for i in range(questions):
+        multi_tool.router_node({"question": f"{QUESTIONS[i % len(QUESTIONS)]} (#{i})"})
+
+    agent = create_conversational_agent(memory_mode="full")
+    state = {"session_id": "prefill-benchmark"}
+    for i in range(turns):
+        result = agent.invoke({**state, "current_question": f"Tell me fact #{i} about the Moon."})
+        state["messages"] = result["messages"]
+    return llm.prefill_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=8)
+    args = parser.parse_args()
+
+    if not Config.check_ollama():
+        sys.exit("Ollama is not reachable; start it with `ollama serve`.")
+
+    Config.FAST_ROUTER_ENABLED = False  # every question should hit the router prompt
+    Config.LLM_CACHE_ENABLED = False
+    llm.set_llm_cache(None)
+
+    set_context_reuse(None)
+    before = run_workload(args.questions, args.turns)
+
+    reuse = ContextReuse(
+        raw_formats={**DEFAULT_RAW_FORMATS, **parse_raw_formats(Config.RAW_PROMPT_FORMATS)}
+    )
+    set_context_reuse(reuse)
+    after = run_workload(args.questions, args.turns)
+
+    print(f"{'':<16}{'calls':>8}{'prefill tok/call':>18}{'prefill ms/call':>17}{'prime ms':>10}")
+    for name, stats in (("without reuse", before), ("with reuse", after)):
+        print(
+            f"{name:<16}{stats.get('request_calls', 0):>8}"
+            f"{stats.get('request_tokens_avg', 0):>18.1f}"
+            f"{stats.get('request_ms_avg', 0):>17.1f}"
+            f"{stats.get('prime_ms', 0):>10.1f}"
+        )
+    print(f"\nContext reuse: {reuse.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: semantic cache lookups at 100k entries.
+
+Fills a SemanticCache with synthetic questions, then times lookups for
+paraphrases of cached questions and for unseen questions (should miss).
+Reports the similarity-search time on its own and the full lookup
+(normalize + embed + search) at p50/p99, the hit rate, and the LSH recall:
+hits among paraphrases whose exact similarity clears the threshold.
+
+Usage:
+    python benchmarks/semantic_cache.py --entries 100000 --queries 2000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from utils.semantic_cache import SemanticCache, normalize_question
+
+STEMS = ["what is", "how do i", "who is", "why does", "when did", "where is", "explain"]
+
+
+def make_questions(count: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return [
+        f"{STEMS[rng.integers(len(STEMS))]} "
+        + " ".join(f"term{t}" for t in rng.integers(0, 5000, rng.integers(4, 10)))
+        for _ in range(count)
+    ]
+
+
+def percentiles(samples):
+    ms = np.asarray(samples) * 1e3
+    return np.percentile(ms, 50), np.percentile(ms, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=0.9)
+    args = parser.parse_args()
+
+    questions = make_questions(args.entries)
+    cache = SemanticCache(threshold=args.threshold)
+    start = time.perf_counter()
+    for i, question in enumerate(questions):
+        cache.store(question, {"tool_choice": "direct", "final_answer": f"answer {i}"})
+    print(f"Filled {args.entries:,} entries in {time.perf_counter() - start:.1f}s")
+
+    step = max(1, args.entries // args.queries)
+    sources = list(range(0, args.entries, step))[:args.queries]
+    paraphrases = [f"so {questions[i]}" for i in sources]
+    unseen = make_questions(args.queries, seed=1)
+
+    # Paraphrases the threshold says should match (exact cosine, no LSH)
+    originals = cache.embedder.embed([normalize_question(questions[i]) for i in sources])
+    rephrased = cache.embedder.embed([normalize_question(q) for q in paraphrases])
+    expected = (originals * rephrased).sum(axis=1) >= args.threshold
+
+    print(
+        f"{'queries':<12}{'search p50':>12}{'search p99':>12}"
+        f"{'lookup p50':>12}{'lookup p99':>12}{'hit rate':>10}{'recall':>8}"
+    )
+    for name, batch in (("paraphrase", paraphrases), ("unseen", unseen)):
+        vectors = cache.embedder.embed([normalize_question(q) for q in batch])
+        search = []
+        for vector in vectors:
+            t = time.perf_counter()
+            cache._store.search(vector, k=4)
+            search.append(time.perf_counter() - t)
+
+        lookup, hits = [], []
+        for question in batch:
+            t = time.perf_counter()
+            hits.append(cache.lookup(question) is not None)
+            lookup.append(time.perf_counter() - t)
+
+        s50, s99 = percentiles(search)
+        l50, l99 = percentiles(lookup)
+        hits = np.asarray(hits)
+        recall = (
+            f"{hits[expected].mean():>8.1%}" if name == "paraphrase" and expected.any() else f"{'-':>8}"
+        )
+        print(
+            f"{name:<12}{s50:>10.3f}ms{s99:>10.3f}ms{l50:>10.3f}ms{l99:>10.3f}ms"
+            f"{hits.mean():>10.1%}{recall}"
+        )
+
+    print(f"\nCache stats: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
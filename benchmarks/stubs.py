@@ -0,0 +1,186 @@
+"""
+Stub LLM and search backends for offline benchmarks.
+
+StubLLM stands in for the ``ollama.Client`` / ``ollama.AsyncClient`` the LLM
+layer uses (install it with ``llm.set_client`` / ``llm.set_async_client``);
+StubTavily plugs into the ``WebSearchTool(client=..., async_client=...)``
+hook. Both sleep for a configurable latency, so a run measures the agents'
+own overhead on top of known backend time, and both answer like the real
+services: the router gets one of its three words, generations (and the
+last chunk of a stream) carry Ollama's prompt/eval token counts and
+durations.
+
+Latency model for one generate call:
+    latency + prompt_tokens * prefill_per_token + completion_tokens * per_token
+"""
+import asyncio
+import re
+import threading
+import time
+from typing import Iterator, List, Optional
+
+_NUMBER_RE = re.compile(r"\d")
+_SEARCH_WORDS = ("latest", "news", "today", "current", "who won", "this week")
+_QUESTION_RE = re.compile(r'Question: "(.*)"')
+
+
+def _tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class StubLLM:
+    """
+    Ollama client stand-in with canned replies and simulated latency.
+
+    Args:
+        latency: Fixed seconds per call
+        per_token: Extra seconds per generated token
+        prefill_per_token: Extra seconds per prompt token
+        completion_tokens: Tokens in a generated answer
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        per_token: float = 0.0,
+        prefill_per_token: float = 0.0,
+        completion_tokens: int = 48,
+    ):
+        self.latency = latency
+        self.per_token = per_token
+        self.prefill_per_token = prefill_per_token
+        self.completion_tokens = completion_tokens
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def reply(self, prompt: str) -> str:
+        if "Respond with ONLY ONE WORD" in prompt:
+            match = _QUESTION_RE.search(prompt)
+            question = (match.group(1) if match else prompt).lower()
+            if any(word in question for word in _SEARCH_WORDS):
+                return "search"
+            return "calculator" if _NUMBER_RE.search(question) else "direct"
+        if "Extract ONLY the mathematical expression" in prompt:
+            numbers = re.findall(r"\d+(?:\.\d+)?", prompt.rsplit("Question:", 1)[-1])
+            return " + ".join(numbers) or "0"
+        if "numbered question" in prompt:
+            count = len(re.findall(r"^\d+\. ", prompt, re.MULTILINE))
+            return "\n".join(f"{i}: direct" for i in range(1, count + 1))
+        return " ".join(["word"] * self.completion_tokens)
+
+    def _response(self, model: str, prompt: str, text: str) -> dict:
+        prompt_tokens = _tokens(prompt)
+        completion_tokens = _tokens(text)
+        prefill = prompt_tokens * self.prefill_per_token
+        decode = completion_tokens * self.per_token
+        return {
+            "model": model,
+            "response": text,
+            "done": True,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prefill * 1e9),
+            "eval_count": completion_tokens,
+            "eval_duration": int(decode * 1e9),
+            "total_duration": int((self.latency + prefill + decode) * 1e9),
+        }
+
+    def _delay(self, prompt: str, text: str) -> float:
+        return (
+            self.latency
+            + _tokens(prompt) * self.prefill_per_token
+            + _tokens(text) * self.per_token
+        )
+
+    def _count(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def generate(self, model: str, prompt: str = "", options: Optional[dict] = None,
+                 stream: bool = False, **_):
+        self._count()
+        text = self.reply(prompt)
+        time.sleep(self._delay(prompt, text))
+        if stream:
+            return self._chunks(text, self._response(model, prompt, text))
+        return self._response(model, prompt, text)
+
+    def embed(self, model: str, input: List[str], **_):
+        self._count()
+        time.sleep(self.latency)
+        return {"embeddings": [[float(len(text) % 7), 1.0, 0.5] for text in input]}
+
+    def list(self):
+        return {"models": []}
+
+    @staticmethod
+    def _chunks(text: str, final: dict) -> Iterator[dict]:
+        for word in text.split(" "):
+            yield {"response": word + " ", "done": False}
+        # Like Ollama, the last chunk carries the token counts and durations
+        yield {**final, "response": ""}
+
+
+class AsyncStubLLM(StubLLM):
+    """``ollama.AsyncClient`` stand-in; sleeps without blocking the loop."""
+
+    async def generate(self, model: str, prompt: str = "", options: Optional[dict] = None,
+                       stream: bool = False, **_):
+        self._count()
+        text = self.reply(prompt)
+        await asyncio.sleep(self._delay(prompt, text))
+        if stream:
+            return self._achunks(text, self._response(model, prompt, text))
+        return self._response(model, prompt, text)
+
+    async def embed(self, model: str, input: List[str], **_):
+        self._count()
+        await asyncio.sleep(self.latency)
+        return {"embeddings": [[float(len(text) % 7), 1.0, 0.5] for text in input]}
+
+    @staticmethod
+    async def _achunks(text: str, final: dict):
+        for chunk in StubLLM._chunks(text, final):
+            yield chunk
+
+
+class StubTavily:
+    """
+    Tavily client stand-in for ``WebSearchTool(client=...)``.
+
+    Args:
+        latency: Seconds per search
+        results: Results per response (capped by max_results)
+    """
+
+    def __init__(self, latency: float = 0.2, results: int = 3):
+        self.latency = latency
+        self.results = results
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _response(self, query: str, max_results: int) -> dict:
+        with self._lock:
+            self.calls += 1
+        return {
+            "results": [
+                {
+                    "title": f"Result {i} for {query}",
+                    "content": f"Stub content {i} about {query}. " * 8,
+                    "url": f"https://example.com/{i}",
+                }
+                for i in range(1, min(self.results, max_results) + 1)
+            ]
+        }
+
+    def search(self, query: str, max_results: int = 3, search_depth: str = "basic"):
+        time.sleep(self.latency)
+        return self._response(query, max_results)
+
+
+class AsyncStubTavily(StubTavily):
+    """Async Tavily client stand-in for ``WebSearchTool(async_client=...)``."""
+
+    async def search(self, query: str, max_results: int = 3, search_depth: str = "basic"):
+        await asyncio.sleep(self.latency)
+        return self._response(query, max_results)
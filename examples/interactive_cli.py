@@ -59,12 +59,42 @@ def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
 
 
-def format_result(result: dict) -> str:
+def stream_result(agent, question: str) -> tuple:
+    """
+    Run the agent, printing answer tokens as they arrive.
+    
+    Args:
+        agent: Agent created with stream_tokens=True
+        question: User question
+        
+    Returns:
+        (final state, whether any tokens were streamed)
+    """
+    result = {}
+    streamed = False
+    
+    for mode, chunk in agent.stream({"question": question}, stream_mode=["custom", "values"]):
+        if mode == "custom" and "token" in chunk:
+            if not streamed:
+                print(f"\n🤖 ", end="", flush=True)
+                streamed = True
+            print(chunk["token"], end="", flush=True)
+        elif mode == "values":
+            result = chunk
+    
+    if streamed:
+        print()
+    
+    return result, streamed
+
+
+def format_result(result: dict, include_answer: bool = True) -> str:
     """
     Format the agent's result for display.
     
     Args:
         result: Agent result dictionary
+        include_answer: Set False when the answer was already streamed
         
     Returns:
         Formatted string
@@ -80,8 +110,9 @@ def format_result(result: dict) -> str:
     
     output = f"\n{icon} Tool used: {tool}\n"
     output += f"{'─'*70}\n"
-    output += f"{result['final_answer']}\n"
-    output += f"{'─'*70}\n"
+    if include_answer:
+        output += f"{result['final_answer']}\n"
+        output += f"{'─'*70}\n"
     
     return output
 
@@ -95,7 +126,7 @@ def main():
     # Create agent
     print("\n📦 Initializing agent...")
     try:
-        agent = create_multi_tool_agent()
+        agent = create_multi_tool_agent(stream_tokens=True)
         print("✅ Agent ready! Type 'help' for instructions.\n")
     except Exception as e:
         print(f"❌ Error creating agent: {e}")
@@ -132,10 +163,10 @@ def main():
             # Process question with agent
             print(f"\n🤖 Agent: Thinking...")
             
-            result = agent.invoke({"question": user_input})
+            result, streamed = stream_result(agent, user_input)
             
-            # Display result
-            print(format_result(result))
+            # Display result (the answer itself was printed while streaming)
+            print(format_result(result, include_answer=not streamed))
             
             question_count += 1
             
@@ -16,17 +16,22 @@ def main():
     print("=" * 70)
 
     agent = create_conversational_agent()
-    messages = []
+    memory = {"messages": []}
 
     first_question = "Who created LangGraph and what problem does it solve?"
     print(f"\n❓ Q1: {first_question}")
-    first = agent.invoke({"messages": messages, "current_question": first_question})
+    first = agent.invoke({**memory, "current_question": first_question})
     print(f"🤖 A1: {first['answer']}\n")
 
-    messages = first["messages"]
+    # Carry the rolling summary along with the messages
+    memory = {
+        key: first[key]
+        for key in ("messages", "summary", "summarized_count")
+        if key in first
+    }
     follow_up = "What else has that team built recently?"
     print(f"❓ Q2 (follow-up): {follow_up}")
-    second = agent.invoke({"messages": messages, "current_question": follow_up})
+    second = agent.invoke({**memory, "current_question": follow_up})
     print(f"🤖 A2: {second['answer']}\n")
 
     print("📚 Conversation history tracked by the agent:")
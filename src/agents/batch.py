@@ -0,0 +1,209 @@
+"""
+Batched entry point for the multi-tool agent.
+
+For bulk jobs, invoking the graph once per question pays one router LLM
+call per question. ``batch()`` instead:
+1. decides what it can with the rule-based fast path
+2. classifies the rest with ONE multi-question router prompt per chunk
+3. runs the tool branches + synthesizer concurrently (bounded)
+
+Results come back in input order. A failing item carries an 'error' key
+instead of sinking the whole batch.
+"""
+import asyncio
+import re
+from typing import Dict, List, Optional, Sequence
+
+from agents import multi_tool
+from agents.fast_router import fast_route, fast_router
+from utils import llm
+from utils.config import Config
+from utils.profiles import merge_profiles, node_profile, node_request
+from utils.prompts import BATCH_ROUTER_PROMPT, template_prefix
+
+# "3: calculator", "3. search", "3) direct" ...
+_BATCH_LINE_RE = re.compile(
+    r"^\s*(\d+)\s*[:.)\-]\s*\W*(search|calculator|direct)\b",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+_TOOL_NODES = {
+    "search": multi_tool.asearch_node,
+    "calculator": multi_tool.acalculator_node,
+    "direct": multi_tool.adirect_answer_node,
+}
+
+
+def parse_batch_routes(text: str, count: int) -> Dict[int, str]:
+    """
+    Parse a batched router reply into {index: tool}.
+
+    Args:
+        text: Raw LLM reply with one "<number>: <tool>" line per question
+        count: Number of questions in the prompt
+
+    Returns:
+        Mapping of 0-based question index to tool; unparsed items are absent
+    """
+    routes = {}
+    for number, tool in _BATCH_LINE_RE.findall(text):
+        index = int(number) - 1
+        if 0 <= index < count and index not in routes:
+            routes[index] = tool.lower()
+    return routes
+
+
+async def _route_chunk(questions: Sequence[str]) -> List[dict]:
+    """Route a chunk of questions with a single LLM call."""
+    numbered = "\n".join(f"{i}. {q}" for i, q in enumerate(questions, 1))
+    request = node_request(
+        "batch_router",
+        BATCH_ROUTER_PROMPT.format(questions=numbered),
+        {
+            'temperature': 0.1,
+            'num_predict': 8 * len(questions),  # ~one short line per question
+        },
+        reuse_key="template:batch_router",
+        prefix=template_prefix(BATCH_ROUTER_PROMPT),
+    )
+    response = await llm.agenerate(**request)
+    routes = parse_batch_routes(response['response'], len(questions))
+    profile = node_profile(request, "batch_router")
+
+    decisions = []
+    for i in range(len(questions)):
+        tool = routes.get(i)
+        if tool is None:
+            print(f"⚠️  Batch router skipped item {i + 1}, defaulting to 'direct'")
+            tool = 'direct'
+        fast_router.record("llm")
+        decisions.append({"tool_choice": tool, "route_source": "llm", "profiles": profile})
+    return decisions
+
+
+async def _route_chunk_limited(
+    questions: Sequence[str], semaphore: asyncio.Semaphore
+) -> List[dict]:
+    async with semaphore:
+        return await _route_chunk(questions)
+
+
+async def _route_all(
+    questions: Sequence[str], router_batch_size: int, semaphore: asyncio.Semaphore
+) -> List[Optional[dict]]:
+    """
+    Fast-path what we can, then batch-route the remainder.
+
+    Router chunks share the batch's semaphore, so a large batch doesn't send
+    every router prompt to Ollama at once.
+    """
+    decisions: List[Optional[dict]] = []
+    pending = []
+    for i, question in enumerate(questions):
+        fast = fast_route(question) if Config.FAST_ROUTER_ENABLED else None
+        if fast:
+            fast_router.record("rules", fast.tool)
+            decisions.append({"tool_choice": fast.tool, "route_source": "rules"})
+        else:
+            decisions.append(None)
+            pending.append(i)
+
+    chunks = [
+        pending[start:start + router_batch_size]
+        for start in range(0, len(pending), router_batch_size)
+    ]
+    results = await asyncio.gather(
+        *(_route_chunk_limited([questions[i] for i in chunk], semaphore) for chunk in chunks),
+        return_exceptions=True,
+    )
+
+    for chunk, result in zip(chunks, results):
+        if isinstance(result, Exception):
+            # Leave these as None; each item is routed individually instead
+            print(f"⚠️  Batch router failed ({result}), routing items one by one")
+            continue
+        for i, decision in zip(chunk, result):
+            decisions[i] = decision
+
+    return decisions
+
+
+def _apply(state: dict, update: dict) -> None:
+    """state.update() that merges 'profiles' the way the graph reducer does."""
+    if "profiles" in update:
+        update = {**update, "profiles": merge_profiles(state.get("profiles"), update["profiles"])}
+    state.update(update)
+
+
+async def _run_item(
+    question: str, decision: Optional[dict], semaphore: asyncio.Semaphore
+) -> dict:
+    state = {"question": question}
+    async with semaphore:
+        try:
+            if decision is None:
+                decision = await multi_tool.arouter_node(state)
+            _apply(state, decision)
+            _apply(state, await _TOOL_NODES[state["tool_choice"]](state))
+            _apply(state, await multi_tool.asynthesizer_node(state))
+        except Exception as exc:
+            state["error"] = f"{type(exc).__name__}: {exc}"
+    return state
+
+
+async def abatch(
+    questions: Sequence[str],
+    max_concurrency: int = 8,
+    router_batch_size: int = 20,
+) -> List[dict]:
+    """
+    Answer many questions with batched routing and bounded parallelism.
+
+    Args:
+        questions: Questions to answer
+        max_concurrency: Max router chunks, and then tool/synthesis
+            branches, running at once
+        router_batch_size: Max questions per batched router prompt
+
+    Returns:
+        One result state per question, in input order. Failed items have
+        an 'error' key.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    decisions = await _route_all(questions, max(1, router_batch_size), semaphore)
+    return await asyncio.gather(
+        *(_run_item(q, d, semaphore) for q, d in zip(questions, decisions))
+    )
+
+
+def batch(
+    questions: Sequence[str],
+    max_concurrency: int = 8,
+    router_batch_size: int = 20,
+) -> List[dict]:
+    """
+    Sync wrapper around abatch(). Use abatch() inside a running event loop.
+    """
+    return asyncio.run(abatch(questions, max_concurrency, router_batch_size))
+
+
+if __name__ == "__main__":
+    results = batch(
+        [
+            "What is 157 * 23?",
+            "What are the latest developments in LangGraph?",
+            "What is Python?",
+            "Tell me a fun fact about octopuses",
+        ],
+        max_concurrency=4,
+    )
+    for result in results:
+        print(f"\n❓ {result['question']}")
+        if "error" in result:
+            print(f"   ❌ {result['error']}")
+        else:
+            print(f"   🧰 {result['tool_choice']} ({result['route_source']})")
+            print(f"   💬 {result['final_answer']}")
@@ -0,0 +1,58 @@
+"""
+Agent-level request coalescing for the multi-tool agent.
+
+When a question trends, many concurrent requests ask it at once and each
+would run the router, the tool and the synthesizer on its own.
+CoalescedAgent wraps the compiled graph so that concurrent invoke() /
+ainvoke() calls with the same question run the graph once; every caller
+gets its own copy of the result, or the same exception (utils/single_flight.py
+has the cancellation rules).
+
+Only plain ``{"question": ...}`` inputs without a config are coalesced:
+extra state or callbacks could make two runs differ. Streaming calls and
+everything else go straight to the wrapped graph.
+"""
+from typing import Any, Mapping, Optional
+
+from utils.single_flight import SingleFlight
+
+
+def question_key(question: str) -> str:
+    """Case and whitespace don't change the answer."""
+    return " ".join(question.lower().split())
+
+
+class CoalescedAgent:
+    """
+    Compiled agent whose invoke/ainvoke share runs for identical questions.
+
+    Args:
+        agent: Compiled LangGraph agent
+        flight: SingleFlight to coalesce with (a new one by default)
+    """
+
+    def __init__(self, agent, flight: Optional[SingleFlight] = None):
+        self.agent = agent
+        self.flight = flight or SingleFlight()
+
+    @staticmethod
+    def _key(input: Any, config: Optional[Mapping], kwargs: Mapping) -> Optional[str]:
+        if config or kwargs or not isinstance(input, Mapping) or set(input) != {"question"}:
+            return None
+        return question_key(input["question"])
+
+    def invoke(self, input, config=None, **kwargs):
+        key = self._key(input, config, kwargs)
+        if key is None:
+            return self.agent.invoke(input, config, **kwargs)
+        return dict(self.flight.do(key, lambda: self.agent.invoke(input)))
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        key = self._key(input, config, kwargs)
+        if key is None:
+            return await self.agent.ainvoke(input, config, **kwargs)
+        return dict(await self.flight.ado(key, lambda: self.agent.ainvoke(input)))
+
+    def __getattr__(self, name):
+        # stream/astream, get_graph(), ... are the wrapped graph's
+        return getattr(self.agent, name)
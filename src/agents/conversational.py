@@ -1,13 +1,62 @@
 """
 Conversational agent with lightweight memory.
+
+Nodes that call the LLM have async twins, so the compiled graph supports
+both invoke and ainvoke/astream. With token streaming enabled, the answer
+node emits {"node": "answer_question", "token": ...} chunks on LangGraph's
+"custom" stream mode.
+
+Memory modes:
+- "rolling" (default): prompts see a running summary plus the last N turns.
+  When a turn slides out of the window it is folded into the summary, so
+  prompt size stays flat however long the session runs.
+- "full": prompts see the entire transcript every turn.
+- "vector": each finished turn is embedded into a per-session vector index
+  (utils/vector_store.py). retrieve_context pulls the top-k turns most
+  similar to the question, with no LLM call; the answer prompt sees those
+  plus the last N turns. Without a 'session_id' nothing is persisted: the
+  passed-in history is indexed in memory for that call only.
+
+Every node is timed by utils/metrics.py.
 """
-from typing import List
+import asyncio
+from functools import partial
+from typing import Dict, List, Optional, Sequence, Tuple
 
-import ollama
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langgraph.config import get_stream_writer
 from langgraph.graph import END, StateGraph
 
-from utils.prompts import CONVERSATION_ANSWER_PROMPT, MEMORY_SUMMARY_PROMPT
+from utils import llm
+from utils.config import Config
+from utils.messages import Message, MessageList, MessageLog
+from utils.metrics import instrument
+from utils.profiles import get_model_profiles, node_profile, node_request
+from utils.prompts import (
+    CONVERSATION_ANSWER_PROMPT,
+    MEMORY_SUMMARY_PROMPT,
+    MEMORY_UPDATE_PROMPT,
+    template_prefix,
+)
+from utils.session_store import SessionHistory, SessionStore, get_session_store
 from utils.state import ConversationState
+from utils.tokens import (
+    DROP_OLDEST,
+    KEEP,
+    TRUNCATE_TAIL,
+    Section,
+    estimate_tokens,
+    fit_sections,
+    token_budget,
+)
+from utils.vector_store import VectorMemory, get_vector_memory
+
+MEMORY_MODES = ("rolling", "full", "vector")
+
+# Fixed instructions of the answer prompt, counted once against the budget
+_ANSWER_TEMPLATE_TOKENS = estimate_tokens(
+    CONVERSATION_ANSWER_PROMPT.format(history="", context="", question="")
+)
 
 
 def _format_messages(messages: List[dict]) -> str:
@@ -22,79 +71,528 @@ def _format_messages(messages: List[dict]) -> str:
     return "\n".join(lines)
 
 
-def retrieve_context_node(state: ConversationState) -> dict:
+def _memory_parts(
+    state: ConversationState,
+    window_turns: Optional[int],
+    vector_memory: Optional[VectorMemory] = None,
+) -> Tuple[Optional[str], List[dict]]:
     """
-    Summarize prior conversation that is relevant to the new question.
+    The conversation as prompts should see it: (summary, messages).
+
+    Full mode returns the whole transcript. Rolling mode returns the running
+    summary plus the recent window (and any older messages that haven't been
+    folded into the summary yet, e.g. after a failed update). Vector mode
+    returns only the recent window.
     """
-    history = state.get("messages", [])
-    question = state["current_question"]
+    messages = state.get("messages", [])
+    if window_turns is None:
+        return None, messages
+    if vector_memory is not None:
+        # Older turns reach the prompt through retrieved_context instead
+        return None, messages[-2 * window_turns:] if window_turns else []
 
-    if not history:
-        return {"retrieved_context": "No relevant prior conversation."}
+    window_start = max(0, len(messages) - 2 * window_turns)
+    recent = messages[min(state.get("summarized_count", 0), window_start):]
+    return state.get("summary") or None, recent
 
+
+def _render_history(summary: Optional[str], recent: str) -> str:
+    if not summary:
+        return recent or "No previous messages."
+    return f"Summary of earlier conversation:\n{summary}\n\nRecent messages:\n{recent}"
+
+
+def _memory_view(
+    state: ConversationState,
+    window_turns: Optional[int],
+    vector_memory: Optional[VectorMemory] = None,
+) -> str:
+    summary, recent = _memory_parts(state, window_turns, vector_memory)
+    return _render_history(summary, _format_messages(recent))
+
+
+def _session_reuse(state: ConversationState, name: str, template: str, history: str) -> dict:
+    """
+    Context-reuse arguments for a prompt that starts with the transcript.
+
+    The cached prefix is the template head plus the history, so the next
+    turn only prefills what was appended since (until the history is
+    rewritten, e.g. by a summary fold, which invalidates the entry).
+    """
+    session_id = state.get("session_id", "default")
+    return {
+        "reuse_key": f"session:{session_id}:{name}",
+        "prefix": template_prefix(template) + history,
+        "session": session_id,
+    }
+
+
+def _summary_request(state: ConversationState, window_turns: Optional[int]) -> dict:
+    history = _memory_view(state, window_turns)
     prompt = MEMORY_SUMMARY_PROMPT.format(
-        history=_format_messages(history),
-        question=question,
+        history=history,
+        question=state["current_question"],
+    )
+    return node_request(
+        "summarizer",
+        prompt,
+        {"temperature": 0.2, "num_predict": 150},
+        **_session_reuse(state, "summary", MEMORY_SUMMARY_PROMPT, history),
     )
 
-    try:
-        response = ollama.generate(
-            model="mistral",
-            prompt=prompt,
-            options={"temperature": 0.2, "num_predict": 150},
+
+def _answer_request(
+    state: ConversationState,
+    window_turns: Optional[int],
+    vector_memory: Optional[VectorMemory] = None,
+) -> Tuple[dict, Dict[str, object]]:
+    """
+    Answer prompt packed into the model's token budget.
+
+    Priority: question, retrieved context, recent messages (newest first),
+    then the running summary, which retrieved_context already distills.
+    Recent messages already quoted in the retrieved context are dropped.
+
+    Returns:
+        (LLM call arguments, tokens used per section)
+    """
+    model = get_model_profiles().model("answer")
+    context = state.get("retrieved_context") or "No prior context available."
+    summary, recent = _memory_parts(state, window_turns, vector_memory)
+    lines = [
+        line for line in _format_messages(recent).splitlines()
+        if recent and line not in context
+    ]
+
+    fitted, report = fit_sections(
+        [
+            Section("question", [state["current_question"]], priority=0, policy=KEEP),
+            Section("context", [context], priority=1, policy=TRUNCATE_TAIL),
+            Section("history", lines, priority=2, policy=DROP_OLDEST),
+            Section("summary", [summary or ""], priority=3, policy=TRUNCATE_TAIL),
+        ],
+        budget=token_budget(model),
+        reserved=_ANSWER_TEMPLATE_TOKENS,
+    )
+
+    history = _render_history(fitted["summary"], fitted["history"])
+    prompt = CONVERSATION_ANSWER_PROMPT.format(
+        history=history,
+        context=fitted["context"],
+        question=fitted["question"],
+    )
+    request = node_request(
+        "answer",
+        prompt,
+        {"temperature": 0.4},
+        **_session_reuse(state, "answer", CONVERSATION_ANSWER_PROMPT, history),
+    )
+    return request, report
+
+
+def _fold_request(state: ConversationState, to_fold: List[dict]) -> dict:
+    prompt = MEMORY_UPDATE_PROMPT.format(
+        summary=state.get("summary") or "No summary yet.",
+        new_messages=_format_messages(to_fold),
+    )
+    return node_request(
+        "memory_update",
+        prompt,
+        {"temperature": 0.2, "num_predict": 200},
+        session=state.get("session_id", "default"),
+    )
+
+
+def _append_turn(state: ConversationState) -> Tuple[Sequence[dict], Sequence[dict]]:
+    """
+    Add the new turn to the history.
+
+    Returns:
+        (history including the turn, value to emit for 'messages'). For
+        in-memory histories that value is a MessageList of plain dicts, so
+        the graph's output is JSON-ready; the MessageLog behind it makes the
+        append itself O(1). Store-backed histories are written through and
+        emitted as the updated SessionHistory.
+    """
+    new_turn = [
+        Message("user", state["current_question"]),
+        Message("assistant", state.get("answer", "")),
+    ]
+    messages = state.get("messages", ())
+    if isinstance(messages, SessionHistory):
+        history = messages.extend([m.to_dict() for m in new_turn])
+        return history, history
+
+    if isinstance(messages, MessageList):
+        # Passed back from the last result: only the new turn becomes dicts
+        output = messages.extended(new_turn)
+        return output.log, output
+
+    log = messages if isinstance(messages, MessageLog) else MessageLog(messages)
+    history = log.extend(new_turn)
+    return history, history.to_list()
+
+
+def _persist_memory(history: Sequence[dict], update: dict) -> None:
+    if isinstance(history, SessionHistory) and "summarized_count" in update:
+        history.store.save_memory(
+            history.session_id, update.get("summary"), update["summarized_count"]
         )
+
+
+def _messages_to_fold(
+    state: ConversationState,
+    history: List[dict],
+    window_turns: Optional[int],
+    vector_memory: Optional[VectorMemory] = None,
+) -> List[dict]:
+    """Messages that just left the recent window and aren't summarized yet."""
+    if window_turns is None or vector_memory is not None:
+        return []
+    window_start = len(history) - 2 * window_turns
+    return history[state.get("summarized_count", 0):max(0, window_start)]
+
+
+def _retrieve_similar_turns(state: ConversationState, vector_memory: VectorMemory) -> str:
+    """
+    Index any unseen turns, then return the top-k similar ones in order.
+
+    Without a 'session_id' the turns go into a throwaway in-memory index
+    for this call only: a shared fallback id would mix (and persist)
+    unrelated conversations.
+    """
+    session_id = state.get("session_id")
+    if not session_id:
+        vector_memory = VectorMemory(embedder=vector_memory.embedder)
+        session_id = "transient"
+    vector_memory.sync(session_id, state["messages"])
+    hits = vector_memory.search(session_id, state["current_question"], Config.MEMORY_TOP_K)
+    if not hits:
+        return "No relevant prior conversation."
+    return "\n\n".join(hit["text"] for hit in sorted(hits, key=lambda h: h["turn"]))
+
+
+def load_session_node(
+    state: ConversationState, config: RunnableConfig, session_store: SessionStore
+) -> dict:
+    """
+    Attach the stored history and rolling-memory metadata for this session.
+
+    The session id comes from the state's 'session_id', else the LangGraph
+    ``thread_id`` in the invoke config, else "default". Messages are not
+    read here; the returned SessionHistory fetches rows on demand.
+    """
+    session_id = (
+        state.get("session_id")
+        or config.get("configurable", {}).get("thread_id")
+        or "default"
+    )
+    return {
+        "session_id": session_id,
+        "messages": session_store.history(session_id),
+        **session_store.load_memory(session_id),
+    }
+
+
+def retrieve_context_node(
+    state: ConversationState,
+    window_turns: Optional[int] = None,
+    vector_memory: Optional[VectorMemory] = None,
+) -> dict:
+    """
+    Summarize prior conversation that is relevant to the new question.
+
+    In vector mode, returns the most similar earlier turns instead.
+    """
+    if not state.get("messages"):
+        return {"retrieved_context": "No relevant prior conversation."}
+
+    try:
+        if vector_memory is not None:
+            return {"retrieved_context": _retrieve_similar_turns(state, vector_memory)}
+        request = _summary_request(state, window_turns)
+        response = llm.generate(**request)
         summary = response["response"].strip()
     except Exception as exc:
-        summary = f"Memory retrieval unavailable: {exc}"
+        return {"retrieved_context": f"Memory retrieval unavailable: {exc}"}
 
-    return {"retrieved_context": summary}
+    return {"retrieved_context": summary, "profiles": node_profile(request, "summarizer")}
 
 
-def answer_question_node(state: ConversationState) -> dict:
+async def aretrieve_context_node(
+    state: ConversationState,
+    window_turns: Optional[int] = None,
+    vector_memory: Optional[VectorMemory] = None,
+) -> dict:
+    """
+    Async version of retrieve_context_node.
+    """
+    if not state.get("messages"):
+        return {"retrieved_context": "No relevant prior conversation."}
+
+    try:
+        if vector_memory is not None:
+            # Embedding may call a model; keep it off the event loop
+            context = await asyncio.to_thread(_retrieve_similar_turns, state, vector_memory)
+            return {"retrieved_context": context}
+        request = _summary_request(state, window_turns)
+        response = await llm.agenerate(**request)
+        summary = response["response"].strip()
+    except Exception as exc:
+        return {"retrieved_context": f"Memory retrieval unavailable: {exc}"}
+
+    return {"retrieved_context": summary, "profiles": node_profile(request, "summarizer")}
+
+
+def _stream_answer(request: dict) -> str:
+    """Stream the answer to the custom stream; return the full text."""
+    writer = get_stream_writer()
+    chunks = []
+    for token in llm.stream_generate(**request):
+        chunks.append(token)
+        writer({"node": "answer_question", "token": token})
+    return "".join(chunks)
+
+
+async def _astream_answer(request: dict) -> str:
+    """Async version of _stream_answer()."""
+    writer = get_stream_writer()
+    chunks = []
+    async for token in llm.astream_generate(**request):
+        chunks.append(token)
+        writer({"node": "answer_question", "token": token})
+    return "".join(chunks)
+
+
+def answer_question_node(
+    state: ConversationState,
+    window_turns: Optional[int] = None,
+    vector_memory: Optional[VectorMemory] = None,
+    stream: bool = False,
+) -> dict:
     """
     Answer the user's question using any retrieved context.
+
+    The prompt is assembled within the model's token budget; the tokens
+    used per section are returned in 'context_tokens'. When streaming,
+    token chunks go to the graph's custom stream as they arrive.
     """
-    prompt = CONVERSATION_ANSWER_PROMPT.format(
-        history=_format_messages(state.get("messages", [])),
-        context=state.get("retrieved_context") or "No prior context available.",
-        question=state["current_question"],
-    )
+    request, context_tokens = _answer_request(state, window_turns, vector_memory)
+    try:
+        if stream:
+            answer = _stream_answer(request).strip()
+        else:
+            answer = llm.generate(**request)["response"].strip()
+    except Exception as exc:
+        answer = f"Sorry, I could not generate an answer right now: {exc}"
 
+    return {
+        "answer": answer,
+        "context_tokens": context_tokens,
+        "profiles": node_profile(request, "answer"),
+    }
+
+
+async def aanswer_question_node(
+    state: ConversationState,
+    window_turns: Optional[int] = None,
+    vector_memory: Optional[VectorMemory] = None,
+    stream: bool = False,
+) -> dict:
+    """
+    Async version of answer_question_node.
+    """
+    request, context_tokens = _answer_request(state, window_turns, vector_memory)
     try:
-        response = ollama.generate(
-            model="mistral",
-            prompt=prompt,
-            options={"temperature": 0.4},
-        )
-        answer = response["response"].strip()
+        if stream:
+            answer = (await _astream_answer(request)).strip()
+        else:
+            answer = (await llm.agenerate(**request))["response"].strip()
     except Exception as exc:
         answer = f"Sorry, I could not generate an answer right now: {exc}"
 
-    return {"answer": answer}
+    return {
+        "answer": answer,
+        "context_tokens": context_tokens,
+        "profiles": node_profile(request, "answer"),
+    }
 
 
-def update_memory_node(state: ConversationState) -> dict:
+def update_memory_node(
+    state: ConversationState,
+    window_turns: Optional[int] = None,
+    vector_memory: Optional[VectorMemory] = None,
+) -> dict:
     """
     Append the latest turn to the running conversation history.
+
+    In rolling mode, messages that slide out of the recent window are
+    folded into the running summary (only those, never the whole history).
+    In vector mode, the new turn is embedded into the session index.
     """
-    history = list(state.get("messages", []))
-    history.append({"role": "user", "content": state["current_question"]})
-    history.append({"role": "assistant", "content": state.get("answer", "")})
+    history, appended = _append_turn(state)
+    update = {"messages": appended}
+
+    if vector_memory is not None:
+        _index_turns(state, history, vector_memory)
 
-    return {"messages": history}
+    to_fold = _messages_to_fold(state, history, window_turns, vector_memory)
+    if to_fold:
+        try:
+            request = _fold_request(state, to_fold)
+            response = llm.generate(**request)
+            update["summary"] = response["response"].strip()
+            update["summarized_count"] = state.get("summarized_count", 0) + len(to_fold)
+            update["profiles"] = node_profile(request, "memory_update")
+            _persist_memory(history, update)
+        except Exception:
+            # Keep the old summary; the unfolded messages stay visible in
+            # the recent view and are retried next turn
+            pass
 
+    return update
 
-def create_conversational_agent():
+
+async def aupdate_memory_node(
+    state: ConversationState,
+    window_turns: Optional[int] = None,
+    vector_memory: Optional[VectorMemory] = None,
+) -> dict:
+    """
+    Async version of update_memory_node.
+    """
+    history, appended = await asyncio.to_thread(_append_turn, state)
+    update = {"messages": appended}
+
+    if vector_memory is not None:
+        await asyncio.to_thread(_index_turns, state, history, vector_memory)
+
+    to_fold = _messages_to_fold(state, history, window_turns, vector_memory)
+    if to_fold:
+        try:
+            request = _fold_request(state, to_fold)
+            response = await llm.agenerate(**request)
+            update["summary"] = response["response"].strip()
+            update["summarized_count"] = state.get("summarized_count", 0) + len(to_fold)
+            update["profiles"] = node_profile(request, "memory_update")
+            await asyncio.to_thread(_persist_memory, history, update)
+        except Exception:
+            pass
+
+    return update
+
+
+def _index_turns(
+    state: ConversationState, history: List[dict], vector_memory: VectorMemory
+) -> None:
+    if not state.get("session_id"):
+        return  # nothing to keep; retrieval indexes the passed-in history
+    try:
+        vector_memory.sync(state["session_id"], history)
+    except Exception as exc:
+        # Unindexed turns are picked up by the next sync
+        print(f"⚠️  Vector memory indexing failed: {exc}")
+
+
+def _resolve_memory(
+    memory_mode: Optional[str],
+    window_turns: Optional[int],
+    vector_memory: Optional[VectorMemory],
+) -> dict:
+    """Node keyword arguments for a memory mode."""
+    memory_mode = (memory_mode or Config.MEMORY_MODE).lower()
+    if memory_mode not in MEMORY_MODES:
+        raise ValueError(
+            f"Unknown memory mode '{memory_mode}'. Use one of: {', '.join(MEMORY_MODES)}"
+        )
+    if memory_mode == "full":
+        return {"window_turns": None}
+
+    window = Config.MEMORY_WINDOW_TURNS if window_turns is None else window_turns
+    if memory_mode == "rolling":
+        return {"window_turns": window}
+    return {"window_turns": window, "vector_memory": vector_memory or get_vector_memory()}
+
+
+def _node(name: str, func, afunc) -> RunnableLambda:
+    """Graph node from a sync/async pair, both instrumented."""
+    return RunnableLambda(
+        instrument("conversational", name, func),
+        afunc=instrument("conversational", name, afunc),
+    )
+
+
+def create_conversational_agent(
+    memory_mode: Optional[str] = None,
+    window_turns: Optional[int] = None,
+    vector_memory: Optional[VectorMemory] = None,
+    session_store: Optional[SessionStore] = None,
+    stream_tokens: bool = False,
+):
     """
     Create a LangGraph conversational agent with memory.
+
+    Supports invoke/stream as well as ainvoke/astream.
+
+    Args:
+        memory_mode: "rolling", "full" or "vector" (default: Config.MEMORY_MODE)
+        window_turns: Recent turns kept verbatim in rolling/vector mode
+            (default: Config.MEMORY_WINDOW_TURNS)
+        vector_memory: Turn index for vector mode (default: shared
+            VectorMemory from Config)
+        session_store: Durable history store (default: shared SessionStore
+            when SESSION_STORE_ENABLED, otherwise none)
+        stream_tokens: Stream answer tokens on the "custom" stream mode
+
+    With a session store, invoke with just the question and a session:
+    ``agent.invoke({"current_question": q}, {"configurable": {"thread_id": sid}})``
+    (or a 'session_id' key). Without one, pass 'messages' (and, in rolling
+    mode, 'summary' and 'summarized_count') back in on every turn. In vector
+    mode, 'session_id' also selects the turn index.
     """
+    memory = _resolve_memory(memory_mode, window_turns, vector_memory)
+    session_store = session_store or get_session_store()
     workflow = StateGraph(ConversationState)
 
-    workflow.add_node("retrieve_context", retrieve_context_node)
-    workflow.add_node("answer_question", answer_question_node)
-    workflow.add_node("update_memory", update_memory_node)
+    if session_store is not None:
+        workflow.add_node(
+            "load_session",
+            instrument(
+                "conversational", "load_session",
+                partial(load_session_node, session_store=session_store),
+            ),
+        )
+
+    workflow.add_node(
+        "retrieve_context",
+        _node(
+            "retrieve_context",
+            partial(retrieve_context_node, **memory),
+            partial(aretrieve_context_node, **memory),
+        ),
+    )
+    workflow.add_node(
+        "answer_question",
+        _node(
+            "answer_question",
+            partial(answer_question_node, stream=stream_tokens, **memory),
+            partial(aanswer_question_node, stream=stream_tokens, **memory),
+        ),
+    )
+    workflow.add_node(
+        "update_memory",
+        _node(
+            "update_memory",
+            partial(update_memory_node, **memory),
+            partial(aupdate_memory_node, **memory),
+        ),
+    )
 
-    workflow.set_entry_point("retrieve_context")
+    if session_store is not None:
+        workflow.set_entry_point("load_session")
+        workflow.add_edge("load_session", "retrieve_context")
+    else:
+        workflow.set_entry_point("retrieve_context")
     workflow.add_edge("retrieve_context", "answer_question")
     workflow.add_edge("answer_question", "update_memory")
     workflow.add_edge("update_memory", END)
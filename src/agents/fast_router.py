@@ -0,0 +1,221 @@
+"""
+Rule-based fast path in front of the LLM router.
+
+Clear-cut questions are classified with compiled patterns and keyword tables:
+- pure arithmetic ("What is 157 * 23?", "12 times 4") → calculator
+- time-sensitive phrasing ("latest", "today", "news") → search
+- definitional questions ("What is Python?") → direct
+
+Anything ambiguous returns None so the caller falls back to the LLM router.
+"""
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+@dataclass(frozen=True)
+class RouteDecision:
+    """A confident routing decision made without the LLM."""
+
+    tool: str    # "search", "calculator" or "direct"
+    reason: str  # Name of the rule that fired
+
+
+# Polite prefixes stripped before checking for a bare arithmetic expression
+_MATH_PREFIX_RE = re.compile(
+    r"^\s*(?:please\s+)?(?:what\s+is|what's|whats|calculate|compute|evaluate|"
+    r"solve|how\s+much\s+is)\s*:?\s*",
+    re.IGNORECASE,
+)
+
+# Only numbers, operators, parentheses and whitespace
+_PURE_ARITHMETIC_RE = re.compile(r"^[\d\s.+\-*/^()%×÷]+$")
+
+# At least one binary operator between two numbers
+_BINARY_OP_RE = re.compile(r"\d\s*(?:\*\*|[-+*/^%×÷])\s*\(*\s*-?\d")
+
+# Arithmetic spelled out in words ("157 times 23", "2 to the power of 10");
+# binary words need a number on both sides ("in 2020 over the summer" is not math)
+_WORD_MATH_RE = re.compile(
+    r"\d\s*(?:times|plus|minus|multiplied\s+by|divided\s+by|over|"
+    r"to\s+the\s+power\s+of)\s+-?\d"
+    r"|\d\s*(?:squared|cubed)\b"
+    r"|\b\d+(?:\.\d+)?\s*%\s*of\s+\d"
+    r"|\b(?:square\s+root|sqrt)\s+of\s+\d",
+    re.IGNORECASE,
+)
+
+# Aggregates over pasted data or ranges ("mean of: 4, 8, 15", "sum of 1 to 100")
+_AGGREGATE_RE = re.compile(
+    r"\b(?:sum|total|mean|average|std|standard\s+deviation|variance|median|"
+    r"percentile|dot\s+product)\b",
+    re.IGNORECASE,
+)
+_DATA_RE = re.compile(r"(?:-?\d+(?:\.\d+)?[\s,;]+){2,}-?\d|\d\s*(?:to|\.\.)\s*-?\d")
+
+# Math-flavoured words that make a question with numbers worth a calculator guess
+_GUESS_MATH_RE = re.compile(
+    r"\b(?:how\s+many|how\s+much|percent|percentage|divide|multiply|split|"
+    r"each|per|total|average|ratio|convert)\b",
+    re.IGNORECASE,
+)
+
+# Definitional openers that an LLM can answer from general knowledge
+_DIRECT_RE = re.compile(
+    r"^\s*(?:what\s+is\s+(?:a|an|the)?|what\s+are|what's|define|explain|describe|"
+    r"how\s+does|how\s+do|why\s+does|why\s+do|why\s+is|what\s+does)\b",
+    re.IGNORECASE,
+)
+
+# Keyword tables for time-sensitive questions.
+# Strong terms decide on their own; weak terms only block the direct route.
+_STRONG_SEARCH_TERMS = (
+    "latest", "today", "tonight", "yesterday", "this week", "this month",
+    "this year", "right now", "news", "breaking", "headlines", "weather",
+    "forecast", "who won", "live score",
+)
+_WEAK_SEARCH_TERMS = (
+    "current", "currently", "recent", "recently", "now", "price", "stock",
+    "score", "election", "update", "release", "announced", "who is",
+    "trending", "new",
+)
+
+_STRONG_SEARCH_RE = re.compile(
+    r"\b(?:" + "|".join(re.escape(t) for t in _STRONG_SEARCH_TERMS) + r")\b",
+    re.IGNORECASE,
+)
+_WEAK_SEARCH_RE = re.compile(
+    r"\b(?:" + "|".join(re.escape(t) for t in _WEAK_SEARCH_TERMS) + r")\b"
+    r"|\b20\d{2}\b",
+    re.IGNORECASE,
+)
+
+
+class FastRouter:
+    """
+    Deterministic pre-router with hit counters.
+
+    Counters:
+    - "rules": questions decided by a rule (one LLM call saved each)
+    - "llm": questions that fell through to the LLM router
+    - "rules:<tool>": rule decisions per tool
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Counter = Counter()
+
+    def classify(self, question: str) -> Optional[RouteDecision]:
+        """
+        Classify a question if a rule is confident about it.
+
+        Args:
+            question: The user's question
+
+        Returns:
+            RouteDecision, or None when the LLM router should decide
+        """
+        text = question.strip()
+        if not text:
+            return None
+
+        is_math = self._is_arithmetic(text)
+        is_search = bool(_STRONG_SEARCH_RE.search(text))
+
+        # Conflicting signals ("latest 2 + 2 news") are left to the LLM
+        if is_math and is_search:
+            return None
+        if is_math:
+            return RouteDecision("calculator", "arithmetic")
+        if is_search:
+            return RouteDecision("search", "time-sensitive keyword")
+
+        if (
+            _DIRECT_RE.search(text)
+            and not _WEAK_SEARCH_RE.search(text)
+            and not any(c.isdigit() for c in text)
+        ):
+            return RouteDecision("direct", "definitional question")
+
+        return None
+
+    def guess(self, question: str) -> Optional[str]:
+        """
+        Low-confidence best guess for questions classify() leaves to the LLM.
+
+        Used to pick a branch to run speculatively; never final.
+
+        Returns:
+            "search", "calculator", or None when there's no useful hunch
+        """
+        text = question.strip()
+        if _WEAK_SEARCH_RE.search(text):
+            return "search"
+        if any(c.isdigit() for c in text) and (
+            _BINARY_OP_RE.search(text) or _AGGREGATE_RE.search(text) or _GUESS_MATH_RE.search(text)
+        ):
+            return "calculator"
+        return None
+
+    def record(self, source: str, tool: Optional[str] = None) -> None:
+        """Count which path ("rules" or "llm") decided a question."""
+        with self._lock:
+            self.counters[source] += 1
+            if tool and source == "rules":
+                self.counters[f"rules:{tool}"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Snapshot of the counters plus the share of LLM calls saved.
+        """
+        with self._lock:
+            snapshot = dict(self.counters)
+        total = snapshot.get("rules", 0) + snapshot.get("llm", 0)
+        snapshot["total"] = total
+        snapshot["hit_rate"] = snapshot.get("rules", 0) / total if total else 0.0
+        return snapshot
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+
+    @staticmethod
+    def _is_arithmetic(text: str) -> bool:
+        if _WORD_MATH_RE.search(text):
+            return True
+        if _AGGREGATE_RE.search(text) and _DATA_RE.search(text):
+            return True
+
+        expression = _MATH_PREFIX_RE.sub("", text).rstrip(" ?.!=")
+        return bool(
+            expression
+            and _PURE_ARITHMETIC_RE.match(expression)
+            and _BINARY_OP_RE.search(expression)
+        )
+
+
+# Create singleton
+fast_router = FastRouter()
+
+
+def fast_route(question: str) -> Optional[RouteDecision]:
+    """
+    Convenience function for the router node.
+    """
+    return fast_router.classify(question)
+
+
+if __name__ == "__main__":
+    for q in [
+        "What is 157 * 23?",
+        "What is 2 to the power of 10?",
+        "Mean and std of: 4, 8, 15, 16, 23, 42",
+        "Latest AI news",
+        "What happened today in tech?",
+        "What is Python?",
+        "Who is the CEO of OpenAI?",
+        "Tell me something interesting",
+    ]:
+        print(f"{q!r:45} -> {fast_route(q)}")
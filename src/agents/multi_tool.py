@@ -5,60 +5,211 @@ This agent can:
 1. Decide which tool to use (router)
 2. Execute the chosen tool
 3. Synthesize the final answer
+
+Every node has an async twin (a-prefixed) so the compiled graph supports
+both invoke/stream and ainvoke/astream natively.
+
+With token streaming enabled, the direct-answer and synthesizer nodes emit
+{"node": ..., "token": ...} chunks on LangGraph's "custom" stream mode.
+
+With a semantic cache (utils/semantic_cache.py), near-duplicate questions
+are answered by a lookup node before the router and never run the graph.
+With coalescing (agents/coalescing.py), concurrent identical questions
+share one graph run. Every node is timed by utils/metrics.py.
 """
+from functools import partial
+
+from langchain_core.runnables import RunnableLambda
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph, END
-from typing import Literal
-import ollama
+from typing import Dict, Literal, Optional
 
+from utils import llm
+from utils.config import Config
+from utils.metrics import instrument
 from utils.state import MultiToolState
-from utils.prompts import ROUTER_PROMPT, SYNTHESIZER_PROMPT, DIRECT_ANSWER_PROMPT
-from tools.search import search_web
-from tools.calculator import calculate
+from utils.profiles import node_profile, node_request
+from utils.prompts import ROUTER_PROMPT, DIRECT_ANSWER_PROMPT, template_prefix
+from utils.semantic_cache import SemanticCache, get_semantic_cache
+from tools.search import asearch_web, search_web
+from tools.calculator import calculate, calculate_bulk
+from tools.expression_parser import expression_extractor, extract_expression
+from agents.coalescing import CoalescedAgent
+from agents.fast_router import fast_route, fast_router
+from agents.speculation import speculator
+from agents.synthesis import (
+    LLM_STRATEGIES,
+    render_without_llm,
+    resolve_strategy,
+    synthesis_request,
+)
+
+
+# ====================
+# LLM HELPERS
+# ====================
+
+def _complete(request: dict, node: str, stream: bool = False) -> str:
+    """
+    Run an LLM call and return the stripped text.
+    
+    When streaming, token chunks are pushed to the graph's custom stream
+    as they arrive; the full text is still returned for the state.
+    """
+    if not stream:
+        return llm.generate(**request)['response'].strip()
+    
+    writer = get_stream_writer()
+    chunks = []
+    for token in llm.stream_generate(**request):
+        chunks.append(token)
+        writer({"node": node, "token": token})
+    return "".join(chunks).strip()
+
+
+async def _acomplete(request: dict, node: str, stream: bool = False) -> str:
+    """Async version of _complete()."""
+    if not stream:
+        return (await llm.agenerate(**request))['response'].strip()
+    
+    writer = get_stream_writer()
+    chunks = []
+    async for token in llm.astream_generate(**request):
+        chunks.append(token)
+        writer({"node": node, "token": token})
+    return "".join(chunks).strip()
 
 
 # ====================
 # NODE 1: ROUTER
 # ====================
 
-def router_node(state: MultiToolState) -> dict:
+def _fast_path_route(question: str) -> Optional[dict]:
+    """Route with the deterministic fast path, or None to ask the LLM."""
+    if not Config.FAST_ROUTER_ENABLED:
+        return None
+    
+    decision = fast_route(question)
+    if not decision:
+        return None
+    
+    fast_router.record("rules", decision.tool)
+    print(f"⚡ Fast path chose: {decision.tool} ({decision.reason})")
+    return {"tool_choice": decision.tool, "route_source": "rules"}
+
+
+_ROUTER_PREFIX = template_prefix(ROUTER_PROMPT)
+
+
+def _router_request(question: str) -> dict:
+    """LLM call arguments for classifying a question."""
+    return node_request(
+        "router",
+        ROUTER_PROMPT.format(question=question),
+        {
+            'temperature': 0.1,  # Low temperature = more deterministic
+            'num_predict': 10,   # We only need one word, so limit tokens
+        },
+        # The static instructions are prefilled once and reused
+        reuse_key="template:router",
+        prefix=_ROUTER_PREFIX,
+    )
+
+
+def _parse_tool_choice(response, request: dict) -> dict:
+    """Turn the router LLM's reply into a validated tool choice."""
+    # Extract the tool choice
+    tool_choice = response['response'].strip().lower()
+    
+    # Validate it's one of our tools
+    if tool_choice not in ['search', 'calculator', 'direct']:
+        print(f"⚠️  Invalid tool '{tool_choice}', defaulting to 'direct'")
+        tool_choice = 'direct'
+    
+    fast_router.record("llm")
+    print(f"✅ Router chose: {tool_choice}")
+    
+    return {
+        "tool_choice": tool_choice,
+        "route_source": "llm",
+        "profiles": node_profile(request, "router"),
+    }
+
+
+def _speculation_guess(question: str, speculate: bool) -> Optional[str]:
+    if not speculate:
+        return None
+    guess = fast_router.guess(question)
+    return guess if guess in Config.SPECULATION_TOOLS.split(",") else None
+
+
+def _with_speculation(decision: dict, update: Optional[dict], outcome: str) -> dict:
+    print(f"🔮 Speculation {outcome}" + (" (tool output ready)" if update else ""))
+    return {**decision, **(update or {}), "speculation": outcome}
+
+
+def router_node(state: MultiToolState, speculate: bool = False) -> dict:
     """
     Decides which tool to use based on the question.
     
     This is the "brain" - it analyzes the question and picks a tool.
+    Clear-cut questions are decided by the rule-based fast path;
+    everything else goes to the LLM.
+    
+    With speculate=True, the likely branch (search, or a local calculator
+    parse) runs concurrently with the LLM router call; on a hit its output
+    is returned here and the tool node is skipped.
     
     Args:
         state: Current state with 'question'
+        speculate: Run the guessed branch alongside the router
         
     Returns:
-        Updated state with 'tool_choice'
+        Updated state with 'tool_choice' and 'route_source'
+        (plus 'speculation' and the tool output when speculating)
     """
     question = state['question']
     
     print(f"\n🧠 Router analyzing: '{question}'")
     
+    # Try the deterministic fast path first (no LLM round trip)
+    fast = _fast_path_route(question)
+    if fast:
+        return fast
+    
     # Ask LLM to classify the question
-    prompt = ROUTER_PROMPT.format(question=question)
+    def route():
+        request = _router_request(question)
+        return _parse_tool_choice(llm.generate(**request), request)
     
-    response = ollama.generate(
-        model='mistral',
-        prompt=prompt,
-        options={
-            'temperature': 0.1,  # Low temperature = more deterministic
-            'num_predict': 10,   # We only need one word, so limit tokens
-        }
-    )
+    guess = _speculation_guess(question, speculate)
+    if guess is None:
+        return route()
     
-    # Extract the tool choice
-    tool_choice = response['response'].strip().lower()
+    branch = _SPECULATIVE_BRANCHES[guess]
+    return _with_speculation(*speculator.run(guess, route, lambda: branch(state)))
+
+
+async def arouter_node(state: MultiToolState, speculate: bool = False) -> dict:
+    """Async version of router_node."""
+    question = state['question']
     
-    # Validate it's one of our tools
-    if tool_choice not in ['search', 'calculator', 'direct']:
-        print(f"⚠️  Invalid tool '{tool_choice}', defaulting to 'direct'")
-        tool_choice = 'direct'
+    print(f"\n🧠 Router analyzing: '{question}'")
     
-    print(f"✅ Router chose: {tool_choice}")
+    fast = _fast_path_route(question)
+    if fast:
+        return fast
+    
+    async def route():
+        request = _router_request(question)
+        return _parse_tool_choice(await llm.agenerate(**request), request)
+    
+    guess = _speculation_guess(question, speculate)
+    if guess is None:
+        return await route()
     
-    return {"tool_choice": tool_choice}
+    branch = _ASYNC_SPECULATIVE_BRANCHES[guess]
+    return _with_speculation(*await speculator.arun(guess, route, lambda: branch(state)))
 
 
 # ====================
@@ -87,59 +238,168 @@ def search_node(state: MultiToolState) -> dict:
     return {"tool_output": results}
 
 
+async def asearch_node(state: MultiToolState) -> dict:
+    """Async version of search_node."""
+    question = state['question']
+    
+    print(f"\n🔍 Searching web for: '{question}'")
+    
+    results = await asearch_web(question)
+    
+    print(f"✅ Search complete, got {len(results)} characters of results")
+    
+    return {"tool_output": results}
+
+
 # ====================
 # NODE 3: CALCULATOR TOOL
 # ====================
 
+_EXTRACTION_PREFIX = """Extract ONLY the mathematical expression from this question. Return just the numbers and operators, nothing else.
+
+"""
+
+
+def _extraction_request(question: str) -> dict:
+    """LLM call arguments for pulling the math expression out of a question."""
+    extract_prompt = _EXTRACTION_PREFIX + f"""Question: {question}
+
+Mathematical expression:"""
+    
+    return node_request(
+        "extractor",
+        extract_prompt,
+        {'temperature': 0.1},
+        reuse_key="template:extraction",
+        prefix=_EXTRACTION_PREFIX,
+    )
+
+
+def _bulk_calculation(question: str) -> Optional[dict]:
+    """Vectorized aggregates over pasted lists/ranges, or None if not bulk."""
+    result = calculate_bulk(question)
+    if result is None:
+        return None
+    
+    print(f"   📊 Bulk math mode")
+    print(f"✅ Result: {result}")
+    
+    return {"tool_input": "bulk", "tool_output": f"Calculation: {result}"}
+
+
+def _local_expression(question: str) -> Optional[str]:
+    """Parse the expression without an LLM, or None to fall back."""
+    expression = extract_expression(question)
+    if expression:
+        expression_extractor.record("parsed")
+        print(f"   ⚡ Parsed expression locally")
+    return expression
+
+
+def _run_calculation(expression: str) -> dict:
+    """Evaluate the extracted expression and format the tool output."""
+    print(f"   Extracted expression: {expression}")
+    
+    # Calculate
+    result = calculate(expression)
+    
+    print(f"✅ Result: {result}")
+    
+    return {"tool_input": expression, "tool_output": f"Calculation: {expression} = {result}"}
+
+
+def _speculative_calculation(state: MultiToolState) -> Optional[dict]:
+    """Calculator branch for speculation: local parsing only, never the LLM."""
+    question = state['question']
+    bulk = _bulk_calculation(question)
+    if bulk:
+        return bulk
+    # Don't count speculative parses in the extractor stats
+    expression = extract_expression(question)
+    return _run_calculation(expression) if expression else None
+
+
+async def _aspeculative_calculation(state: MultiToolState) -> Optional[dict]:
+    return _speculative_calculation(state)
+
+
 def calculator_node(state: MultiToolState) -> dict:
     """
     Executes calculation.
     
+    Aggregates over long lists and ranges go to the NumPy bulk mode.
+    Otherwise the expression is parsed locally when possible; the LLM
+    extraction prompt is only used when the parser gives up.
+    
     Args:
         state: Current state with 'question'
         
     Returns:
-        Updated state with 'tool_output'
+        Updated state with 'tool_input' and 'tool_output'
     """
     question = state['question']
     
     print(f"\n🔢 Calculating: '{question}'")
     
-    # First, extract just the math expression from the question
-    # We'll ask the LLM to help us extract it
-    extract_prompt = f"""Extract ONLY the mathematical expression from this question. Return just the numbers and operators, nothing else.
+    bulk = _bulk_calculation(question)
+    if bulk:
+        return bulk
+    
+    expression = _local_expression(question)
+    if expression is not None:
+        return _run_calculation(expression)
+    
+    # Fall back to asking the LLM to extract the expression
+    request = _extraction_request(question)
+    response = llm.generate(**request)
+    expression_extractor.record("llm")
+    expression = response['response'].strip()
+    
+    return {**_run_calculation(expression), "profiles": node_profile(request, "extractor")}
 
-Question: {question}
 
-Mathematical expression:"""
+async def acalculator_node(state: MultiToolState) -> dict:
+    """Async version of calculator_node."""
+    question = state['question']
     
-    response = ollama.generate(
-        model='mistral',
-        prompt=extract_prompt,
-        options={'temperature': 0.1}
-    )
+    print(f"\n🔢 Calculating: '{question}'")
     
-    expression = response['response'].strip()
-    print(f"   Extracted expression: {expression}")
+    bulk = _bulk_calculation(question)
+    if bulk:
+        return bulk
     
-    # Calculate
-    result = calculate(expression)
+    expression = _local_expression(question)
+    if expression is not None:
+        return _run_calculation(expression)
     
-    print(f"✅ Result: {result}")
+    request = _extraction_request(question)
+    response = await llm.agenerate(**request)
+    expression_extractor.record("llm")
+    expression = response['response'].strip()
     
-    return {"tool_output": f"Calculation: {expression} = {result}"}
+    return {**_run_calculation(expression), "profiles": node_profile(request, "extractor")}
 
 
 # ====================
 # NODE 4: DIRECT ANSWER
 # ====================
 
-def direct_answer_node(state: MultiToolState) -> dict:
+def _direct_request(question: str) -> dict:
+    """LLM call arguments for answering from general knowledge."""
+    return node_request(
+        "direct",
+        DIRECT_ANSWER_PROMPT.format(question=question),
+        {'temperature': 0.7},  # Bit higher for natural language
+    )
+
+
+def direct_answer_node(state: MultiToolState, stream: bool = False) -> dict:
     """
     Answers directly without tools.
     
     Args:
         state: Current state with 'question'
+        stream: Emit token chunks on the graph's custom stream
         
     Returns:
         Updated state with 'tool_output'
@@ -148,34 +408,63 @@ def direct_answer_node(state: MultiToolState) -> dict:
     
     print(f"\n💭 Answering directly: '{question}'")
     
-    prompt = DIRECT_ANSWER_PROMPT.format(question=question)
+    request = _direct_request(question)
+    answer = _complete(request, "direct", stream)
     
-    response = ollama.generate(
-        model='mistral',
-        prompt=prompt,
-        options={'temperature': 0.7}  # Bit higher for natural language
-    )
+    print(f"✅ Direct answer generated")
     
-    answer = response['response'].strip()
+    return {"tool_output": answer, "profiles": node_profile(request, "direct")}
+
+
+async def adirect_answer_node(state: MultiToolState, stream: bool = False) -> dict:
+    """Async version of direct_answer_node."""
+    question = state['question']
+    
+    print(f"\n💭 Answering directly: '{question}'")
+    
+    request = _direct_request(question)
+    answer = await _acomplete(request, "direct", stream)
     
     print(f"✅ Direct answer generated")
     
-    return {"tool_output": answer}
+    return {"tool_output": answer, "profiles": node_profile(request, "direct")}
 
 
 # ====================
 # NODE 5: SYNTHESIZER
 # ====================
 
-def synthesizer_node(state: MultiToolState) -> dict:
+def _synthesize_without_llm(state: MultiToolState, strategy: str, stream: bool) -> dict:
+    """Template/extractive synthesis; streamed as a single chunk."""
+    final_answer = render_without_llm(
+        state['tool_choice'], state['question'], state['tool_output'], strategy
+    )
+    if stream:
+        get_stream_writer()({"node": "synthesizer", "token": final_answer})
+    
+    print(f"✅ Final answer ready (no LLM call)")
+    
+    return {"final_answer": final_answer, "synthesis_strategy": strategy}
+
+
+def synthesizer_node(
+    state: MultiToolState,
+    stream: bool = False,
+    strategies: Optional[Dict[str, str]] = None,
+) -> dict:
     """
     Creates final answer from tool output.
     
+    The strategy per tool (template, extractive, llm, llm_capped) decides
+    whether a second LLM call is needed at all.
+    
     Args:
         state: Current state with 'question' and 'tool_output'
+        stream: Emit token chunks on the graph's custom stream
+        strategies: Per-tool strategy overrides (defaults from Config)
         
     Returns:
-        Updated state with 'final_answer'
+        Updated state with 'final_answer' and 'synthesis_strategy'
     """
     question = state['question']
     tool_output = state['tool_output']
@@ -184,32 +473,150 @@ def synthesizer_node(state: MultiToolState) -> dict:
     
     # If it was a direct answer, we can just use it
     if state['tool_choice'] == 'direct':
-        return {"final_answer": tool_output}
+        return {"final_answer": tool_output, "synthesis_strategy": "passthrough"}
+    
+    strategy = resolve_strategy(state['tool_choice'], strategies)
+    print(f"   Strategy: {strategy}")
+    
+    if strategy not in LLM_STRATEGIES:
+        return _synthesize_without_llm(state, strategy, stream)
     
     # Otherwise, synthesize from tool output
-    prompt = SYNTHESIZER_PROMPT.format(
-        question=question,
-        tool_output=tool_output
-    )
+    request = synthesis_request(question, tool_output, strategy)
+    final_answer = _complete(request, "synthesizer", stream)
     
-    response = ollama.generate(
-        model='mistral',
-        prompt=prompt,
-        options={'temperature': 0.5}
-    )
+    print(f"✅ Final answer ready")
+    
+    return {
+        "final_answer": final_answer,
+        "synthesis_strategy": strategy,
+        "profiles": node_profile(request, "synthesizer"),
+    }
+
+
+async def asynthesizer_node(
+    state: MultiToolState,
+    stream: bool = False,
+    strategies: Optional[Dict[str, str]] = None,
+) -> dict:
+    """Async version of synthesizer_node."""
+    question = state['question']
+    tool_output = state['tool_output']
+    
+    print(f"\n✨ Synthesizing final answer...")
+    
+    if state['tool_choice'] == 'direct':
+        return {"final_answer": tool_output, "synthesis_strategy": "passthrough"}
     
-    final_answer = response['response'].strip()
+    strategy = resolve_strategy(state['tool_choice'], strategies)
+    print(f"   Strategy: {strategy}")
+    
+    if strategy not in LLM_STRATEGIES:
+        return _synthesize_without_llm(state, strategy, stream)
+    
+    request = synthesis_request(question, tool_output, strategy)
+    final_answer = await _acomplete(request, "synthesizer", stream)
     
     print(f"✅ Final answer ready")
     
-    return {"final_answer": final_answer}
+    return {
+        "final_answer": final_answer,
+        "synthesis_strategy": strategy,
+        "profiles": node_profile(request, "synthesizer"),
+    }
+
+
+# ====================
+# SEMANTIC CACHE (optional first and last nodes)
+# ====================
+
+def cache_lookup_node(state: MultiToolState, cache: SemanticCache, stream: bool = False) -> dict:
+    """
+    Answers near-duplicate questions from the semantic cache.
+    
+    A sampled fraction of hits is marked for audit instead: the graph
+    runs normally and cache_store_node compares the fresh answer.
+    
+    Args:
+        state: Current state with 'question'
+        cache: Semantic answer cache
+        stream: Emit a cached answer as one chunk on the custom stream
+        
+    Returns:
+        Updated state with 'semantic_cache' (plus the cached answer on a hit)
+    """
+    question = state['question']
+    
+    match = cache.lookup(question)
+    if match is None:
+        return {"semantic_cache": "miss"}
+    
+    cache.log_hit(question, match)
+    if cache.should_audit():
+        print(f"🔎 Cache hit sampled for audit (score {match['score']:.2f})")
+        return {"semantic_cache": "audit", "cache_match": match}
+    
+    print(f"💾 Cache hit ({match['match']}, score {match['score']:.2f}): '{match['question']}'")
+    if stream:
+        get_stream_writer()({"node": "cache_lookup", "token": match["final_answer"]})
+    
+    return {
+        "semantic_cache": "hit",
+        "route_source": "cache",
+        "tool_choice": match["tool_choice"],
+        "tool_output": match["tool_output"],
+        "final_answer": match["final_answer"],
+        "synthesis_strategy": match["synthesis_strategy"],
+    }
+
+
+async def acache_lookup_node(
+    state: MultiToolState, cache: SemanticCache, stream: bool = False
+) -> dict:
+    return cache_lookup_node(state, cache, stream)
+
+
+def cache_store_node(state: MultiToolState, cache: SemanticCache) -> dict:
+    """
+    Caches the finished answer (and checks an audited hit against it).
+    
+    Args:
+        state: Final state with 'question', 'tool_choice' and 'final_answer'
+        cache: Semantic answer cache
+        
+    Returns:
+        Empty update
+    """
+    question = state['question']
+    
+    if state.get('semantic_cache') == 'audit':
+        if cache.verify(question, state['cache_match'], state):
+            print("🔎 Audited cache hit held up")
+        else:
+            print(f"⚠️  False cache hit for '{question}', entry evicted")
+    
+    if cache.store(question, state):
+        print("💾 Answer cached")
+    
+    return {}
+
+
+async def acache_store_node(state: MultiToolState, cache: SemanticCache) -> dict:
+    return cache_store_node(state, cache)
+
+
+def route_after_cache(state: MultiToolState) -> Literal["router", "__end__"]:
+    """Cache hits are finished; everything else goes to the router."""
+    return END if state.get('semantic_cache') == 'hit' else 'router'
 
 
 # ====================
 # ROUTING FUNCTION
 # ====================
 
-def route_to_tool(state: MultiToolState) -> Literal["search", "calculator", "direct"]:
+def route_to_tool(
+    state: MultiToolState,
+) -> Literal["search", "calculator", "direct", "synthesizer"]:
     """
     This function tells LangGraph which node to go to next.
     
@@ -221,21 +628,45 @@ def route_to_tool(state: MultiToolState) -> Literal["search", "calculator", "dir
     Returns:
         Name of the next node to execute
     """
+    # A speculative branch that already produced the output skips the tool
+    if state.get('speculation') == 'hit' and 'tool_output' in state:
+        return 'synthesizer'
+    
     # Simply return the tool choice - LangGraph will route to that node
     return state['tool_choice']
 
 
+# Branches the router may start speculatively (tool name -> node)
+_SPECULATIVE_BRANCHES = {"search": search_node, "calculator": _speculative_calculation}
+_ASYNC_SPECULATIVE_BRANCHES = {"search": asearch_node, "calculator": _aspeculative_calculation}
+
+
 # ====================
 # CREATE THE AGENT
 # ====================
 
-def create_multi_tool_agent():
+def _node(name: str, func, afunc) -> RunnableLambda:
+    """Graph node from a sync/async pair, both instrumented."""
+    return RunnableLambda(
+        instrument("multi_tool", name, func), afunc=instrument("multi_tool", name, afunc)
+    )
+
+
+def create_multi_tool_agent(
+    stream_tokens: bool = False,
+    synthesis_strategies: Optional[Dict[str, str]] = None,
+    speculate: Optional[bool] = None,
+    semantic_cache: Optional[SemanticCache] = None,
+    coalesce: Optional[bool] = None,
+):
     """
     Creates and compiles the multi-tool agent.
     
     Graph structure:
         START
           ↓
+        [cache_lookup → END on a semantic cache hit]
+          ↓
         router (decides: search/calculator/direct)
           ↓
         [conditional edges]
@@ -244,23 +675,75 @@ def create_multi_tool_agent():
           ↓
         synthesizer
           ↓
+        [cache_store]
+          ↓
         END
     
+    Each node pairs a sync and an async implementation, so the agent
+    works with invoke/stream as well as ainvoke/astream.
+    
+    Args:
+        stream_tokens: Generate answers with Ollama streaming and emit
+            token chunks; read them with stream_mode="custom"
+        synthesis_strategies: Per-tool synthesis strategy overrides, e.g.
+            {"search": "extractive"} (defaults from Config)
+        speculate: Run the likely tool branch alongside the LLM router
+            (default: Config.SPECULATION_ENABLED)
+        semantic_cache: Answer cache checked before routing (default: the
+            shared cache when Config.SEMANTIC_CACHE_ENABLED)
+        coalesce: Share one run between concurrent invocations with the
+            same question (default: Config.COALESCE_ENABLED)
+    
     Returns:
-        Compiled LangGraph agent
+        Compiled LangGraph agent (wrapped in a CoalescedAgent when coalescing)
     """
+    if speculate is None:
+        speculate = Config.SPECULATION_ENABLED
+    if semantic_cache is None:
+        semantic_cache = get_semantic_cache()
+    if coalesce is None:
+        coalesce = Config.COALESCE_ENABLED
+    
     # Create the graph
     workflow = StateGraph(MultiToolState)
     
-    # Add all nodes
-    workflow.add_node("router", router_node)
-    workflow.add_node("search", search_node)
-    workflow.add_node("calculator", calculator_node)
-    workflow.add_node("direct", direct_answer_node)
-    workflow.add_node("synthesizer", synthesizer_node)
-    
-    # Set entry point
-    workflow.set_entry_point("router")
+    # Add all nodes (sync + async implementations)
+    workflow.add_node("router", _node(
+        "router",
+        partial(router_node, speculate=speculate),
+        partial(arouter_node, speculate=speculate),
+    ))
+    workflow.add_node("search", _node("search", search_node, asearch_node))
+    workflow.add_node("calculator", _node("calculator", calculator_node, acalculator_node))
+    workflow.add_node("direct", _node(
+        "direct",
+        partial(direct_answer_node, stream=stream_tokens),
+        partial(adirect_answer_node, stream=stream_tokens),
+    ))
+    workflow.add_node("synthesizer", _node(
+        "synthesizer",
+        partial(synthesizer_node, stream=stream_tokens, strategies=synthesis_strategies),
+        partial(asynthesizer_node, stream=stream_tokens, strategies=synthesis_strategies),
+    ))
+    
+    # Set entry point (the cache lookup, when there is a cache)
+    if semantic_cache is not None:
+        workflow.add_node("cache_lookup", _node(
+            "cache_lookup",
+            partial(cache_lookup_node, cache=semantic_cache, stream=stream_tokens),
+            partial(acache_lookup_node, cache=semantic_cache, stream=stream_tokens),
+        ))
+        workflow.add_node("cache_store", _node(
+            "cache_store",
+            partial(cache_store_node, cache=semantic_cache),
+            partial(acache_store_node, cache=semantic_cache),
+        ))
+        workflow.set_entry_point("cache_lookup")
+        workflow.add_conditional_edges(
+            "cache_lookup", route_after_cache, {"router": "router", END: END}
+        )
+    else:
+        workflow.set_entry_point("router")
     
     # Add conditional edges from router to tools
     # This is the magic - based on router's decision, go to different nodes
@@ -270,7 +753,8 @@ def create_multi_tool_agent():
         {
             "search": "search",        # If returns "search", go to search node
             "calculator": "calculator",  # If returns "calculator", go to calculator node
-            "direct": "direct"         # If returns "direct", go to direct node
+            "direct": "direct",        # If returns "direct", go to direct node
+            "synthesizer": "synthesizer",  # Speculative branch already ran the tool
         }
     )
     
@@ -279,11 +763,16 @@ def create_multi_tool_agent():
     workflow.add_edge("calculator", "synthesizer")
     workflow.add_edge("direct", "synthesizer")
     
-    # Synthesizer connects to END
-    workflow.add_edge("synthesizer", END)
+    # Synthesizer connects to END (through the cache store, if any)
+    if semantic_cache is not None:
+        workflow.add_edge("synthesizer", "cache_store")
+        workflow.add_edge("cache_store", END)
+    else:
+        workflow.add_edge("synthesizer", END)
     
     # Compile the graph
-    return workflow.compile()
+    agent = workflow.compile()
+    return CoalescedAgent(agent) if coalesce else agent
 
 
 # ====================
@@ -315,6 +804,10 @@ if __name__ == "__main__":
         
         print("\n" + "-"*70)
         print(f"📊 RESULT:")
-        print(f"   Tool used: {result['tool_choice']}")
+        print(f"   Tool used: {result['tool_choice']} (decided by {result['route_source']})")
+        print(f"   Synthesis: {result['synthesis_strategy']}")
         print(f"   Final answer: {result['final_answer']}")
-        print("-"*70)
\ No newline at end of file
+        print("-"*70)
+    
+    print(f"\n⚡ Fast-path router stats: {fast_router.stats()}")
+    print(f"⚡ Expression extractor stats: {expression_extractor.stats()}")
\ No newline at end of file
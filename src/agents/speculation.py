@@ -0,0 +1,188 @@
+"""
+Speculative tool execution for the multi-tool agent.
+
+When the rule-based fast path can't decide, the router has to ask the LLM,
+and the tool only starts after it answers. In speculative mode the router
+node starts its best-guess branch (web search, or a local calculator parse)
+at the same time as the LLM router call:
+
+- router agrees   → the branch result is used and the tool node is skipped
+- router disagrees → the branch is cancelled (async) or its result is
+  discarded (sync threads can't be interrupted)
+
+Speculation is bounded by ``max_inflight`` concurrent branches; when the
+budget is exhausted the question is routed normally.
+
+Counters:
+- "started" / "skipped_budget": speculation attempts and budget refusals
+- "hits" / "misses": router agreed / disagreed with the guess
+- "cancelled": missed branches stopped before finishing
+- "errors": branches that raised (the tool node then runs normally)
+- "saved_ms": branch time overlapped with the router call on hits
+- "wasted_ms": branch time spent on misses
+"""
+import asyncio
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from utils.config import Config
+
+HIT = "hit"
+MISS = "miss"
+SKIPPED = "skipped"
+
+
+class Speculator:
+    """Runs a guessed branch concurrently with the router, within a budget."""
+
+    def __init__(self, max_inflight: int = 4):
+        self.max_inflight = max_inflight
+        self.counters: Counter = Counter()
+        self._inflight = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _acquire(self) -> bool:
+        with self._lock:
+            if self._inflight >= self.max_inflight:
+                self.counters["skipped_budget"] += 1
+                return False
+            self._inflight += 1
+            self.counters["started"] += 1
+            return True
+
+    def _release(self) -> None:
+        with self._lock:
+            self._inflight -= 1
+
+    def _add(self, key: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[key] += value
+
+    @staticmethod
+    def _timed(branch: Callable[[], Optional[dict]]) -> Tuple[Optional[dict], float]:
+        start = time.perf_counter()
+        result = branch()
+        return result, time.perf_counter() - start
+
+    def _settle_miss(self, elapsed: float) -> None:
+        self._add("wasted_ms", elapsed * 1000)
+
+    def run(
+        self,
+        guess: str,
+        route: Callable[[], dict],
+        branch: Callable[[], Optional[dict]],
+    ) -> Tuple[dict, Optional[dict], str]:
+        """
+        Route and speculatively run the guessed branch in a worker thread.
+
+        Returns:
+            (routing decision, branch update or None, HIT/MISS/SKIPPED)
+        """
+        if not self._acquire():
+            return route(), None, SKIPPED
+
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_inflight, thread_name_prefix="speculate"
+                    )
+        future = self._executor.submit(self._timed, branch)
+        future.add_done_callback(lambda _: self._release())
+
+        route_start = time.perf_counter()
+        try:
+            decision = route()
+        except BaseException:
+            future.cancel()
+            raise
+        route_elapsed = time.perf_counter() - route_start
+
+        if decision.get("tool_choice") != guess:
+            self._add("misses")
+            if future.cancel():
+                self._add("cancelled")
+            else:
+                future.add_done_callback(
+                    lambda f: f.exception() is None and self._settle_miss(f.result()[1])
+                )
+            return decision, None, MISS
+
+        self._add("hits")
+        try:
+            update, elapsed = future.result()
+        except Exception:
+            self._add("errors")
+            return decision, None, HIT
+        self._add("saved_ms", min(elapsed, route_elapsed) * 1000)
+        return decision, update, HIT
+
+    async def arun(
+        self,
+        guess: str,
+        route: Callable[[], Awaitable[dict]],
+        branch: Callable[[], Awaitable[Optional[dict]]],
+    ) -> Tuple[dict, Optional[dict], str]:
+        """Async version of run(); missed branches are cancelled for real."""
+        if not self._acquire():
+            return await route(), None, SKIPPED
+
+        async def timed():
+            start = time.perf_counter()
+            try:
+                return await branch(), time.perf_counter() - start
+            except asyncio.CancelledError:
+                self._add("wasted_ms", (time.perf_counter() - start) * 1000)
+                raise
+
+        task = asyncio.ensure_future(timed())
+        task.add_done_callback(lambda _: self._release())
+
+        route_start = time.perf_counter()
+        try:
+            decision = await route()
+        except BaseException:
+            task.cancel()
+            raise
+        route_elapsed = time.perf_counter() - route_start
+
+        if decision.get("tool_choice") != guess:
+            self._add("misses")
+            if task.done():
+                if not task.cancelled() and task.exception() is None:
+                    self._settle_miss(task.result()[1])
+            else:
+                task.cancel()
+                self._add("cancelled")
+            return decision, None, MISS
+
+        self._add("hits")
+        try:
+            update, elapsed = await task
+        except Exception:
+            self._add("errors")
+            return decision, None, HIT
+        self._add("saved_ms", min(elapsed, route_elapsed) * 1000)
+        return decision, update, HIT
+
+    def stats(self) -> Dict[str, float]:
+        """Snapshot of the counters plus hit rate and in-flight branches."""
+        with self._lock:
+            snapshot = dict(self.counters)
+            snapshot["inflight"] = self._inflight
+        decided = snapshot.get("hits", 0) + snapshot.get("misses", 0)
+        snapshot["hit_rate"] = snapshot.get("hits", 0) / decided if decided else 0.0
+        return snapshot
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+
+
+# Create singleton
+speculator = Speculator(max_inflight=Config.SPECULATION_MAX_INFLIGHT)
@@ -0,0 +1,135 @@
+"""
+Per-tool synthesis strategies for the multi-tool agent.
+
+The synthesizer doesn't always need a second LLM call. Each tool gets one
+of these strategies:
+- "template":   fill a fixed template from the tool output (no LLM)
+- "extractive": pick the most relevant sentences from the tool output (no LLM)
+- "llm":        full SYNTHESIZER_PROMPT call
+- "llm_capped": LLM call with truncated tool output and a token cap
+
+Defaults come from Config.SYNTHESIS_STRATEGIES and can be overridden per
+agent via create_multi_tool_agent(synthesis_strategies=...).
+"""
+import re
+from typing import Dict, Mapping, Optional
+
+from utils.config import Config
+from utils.profiles import node_request
+from utils.prompts import SYNTHESIZER_PROMPT
+
+TEMPLATE = "template"
+EXTRACTIVE = "extractive"
+LLM = "llm"
+LLM_CAPPED = "llm_capped"
+
+STRATEGIES = (TEMPLATE, EXTRACTIVE, LLM, LLM_CAPPED)
+LLM_STRATEGIES = (LLM, LLM_CAPPED)
+
+_CALCULATION_RE = re.compile(r"^Calculation:\s*(?P<expression>.*?)\s*=\s*(?P<result>.*)$", re.S)
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by did do does for from has have how i in is it "
+    "its me of on or tell that the this to was what when where which who why "
+    "will with you about latest new news".split()
+)
+
+
+def parse_strategy_spec(spec: str) -> Dict[str, str]:
+    """
+    Parse "calculator=template,search=llm" into a dict.
+
+    Raises:
+        ValueError: If a strategy name is unknown
+    """
+    strategies = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        tool, _, strategy = item.partition("=")
+        strategy = strategy.strip().lower()
+        if strategy not in STRATEGIES:
+            raise ValueError(
+                f"Unknown synthesis strategy '{strategy}' for '{tool.strip()}'. "
+                f"Choose one of: {', '.join(STRATEGIES)}"
+            )
+        strategies[tool.strip().lower()] = strategy
+    return strategies
+
+
+def resolve_strategy(tool: str, overrides: Optional[Mapping[str, str]] = None) -> str:
+    """Strategy for a tool: per-agent override, then Config, then "llm"."""
+    if overrides and tool in overrides:
+        return overrides[tool]
+    return parse_strategy_spec(Config.SYNTHESIS_STRATEGIES).get(tool, LLM)
+
+
+def template_answer(tool: str, tool_output: str) -> str:
+    """Render the tool output with a fixed template, no LLM."""
+    if tool == "calculator":
+        match = _CALCULATION_RE.match(tool_output.strip())
+        if match:
+            result = match.group("result").strip()
+            if result.startswith("Error"):
+                return f"I couldn't calculate that. {result}"
+            return f"{match.group('expression')} = {result}"
+    return tool_output.strip()
+
+
+def extractive_answer(question: str, tool_output: str, max_sentences: int = 3) -> str:
+    """
+    Answer with the tool-output sentences that best overlap the question.
+
+    For search results, sentences come from the 'Content:' lines and the
+    URL of the best result is cited.
+    """
+    contents, urls = [], []
+    for line in tool_output.splitlines():
+        if line.startswith("Content:"):
+            contents.append(line[len("Content:"):].strip())
+        elif line.startswith("URL:"):
+            urls.append(line[len("URL:"):].strip())
+    if not contents:
+        contents = [tool_output.strip()]
+
+    keywords = set(_WORD_RE.findall(question.lower())) - _STOPWORDS
+
+    scored = []  # (score, result index, sentence position, sentence)
+    for result_index, content in enumerate(contents):
+        for position, sentence in enumerate(_SENTENCE_RE.split(content)):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            overlap = len(keywords & set(_WORD_RE.findall(sentence.lower())))
+            scored.append((overlap, result_index, position, sentence))
+
+    if not scored:
+        return tool_output.strip()
+
+    best = sorted(scored, key=lambda s: (-s[0], s[1], s[2]))[:max_sentences]
+    top_result = best[0][1]
+    best.sort(key=lambda s: (s[1], s[2]))  # keep reading order
+    answer = " ".join(s[3] for s in best)
+
+    if top_result < len(urls) and urls[top_result] not in ("", "N/A"):
+        answer += f"\n\nSource: {urls[top_result]}"
+    return answer
+
+
+def synthesis_request(question: str, tool_output: str, strategy: str) -> dict:
+    """LLM call arguments for the "llm" and "llm_capped" strategies."""
+    options = {'temperature': 0.5}
+    if strategy == LLM_CAPPED:
+        tool_output = tool_output[:Config.SYNTHESIS_MAX_INPUT_CHARS]
+        options['num_predict'] = Config.SYNTHESIS_MAX_TOKENS
+
+    prompt = SYNTHESIZER_PROMPT.format(question=question, tool_output=tool_output)
+    return node_request("synthesizer", prompt, options)
+
+
+def render_without_llm(tool: str, question: str, tool_output: str, strategy: str) -> str:
+    """Answer for the non-LLM strategies."""
+    if strategy == EXTRACTIVE:
+        return extractive_answer(question, tool_output)
+    return template_answer(tool, tool_output)
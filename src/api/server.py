@@ -0,0 +1,365 @@
+"""
+HTTP API server for the multi-tool and conversational agents.
+
+Needs the ``api`` extra (``pip install -e ".[api]"``). Run it with:
+
+    python -m api.server --port 8000        (from src/)
+    uvicorn api.server:app --app-dir src
+
+Endpoints:
+- POST /v1/ask    {"question", "stream"}                 multi-tool agent
+- POST /v1/chat   {"question", "session_id", "stream"}   conversational agent
+                  (no session_id: a new session, whose id is returned)
+- GET  /healthz   liveness: the process is serving
+- GET  /readyz    readiness: graphs built and Config.check_ollama() passes
+- GET  /metrics   per-node metrics in the Prometheus text format (utils/metrics.py)
+
+The compiled graphs are built once at startup and shared by all requests.
+With "stream": true the reply is Server-Sent Events: "token" events
+({"node", "token"}) as the answer is generated, on /v1/chat also a "node"
+event as each step finishes, then one "result" event (or an "error" event).
+
+Backpressure: at most API_MAX_CONCURRENCY requests run at once and up to
+API_MAX_QUEUE more wait for a slot. Anything beyond that is shed with 429
+and Retry-After rather than queued without bound. Non-streaming requests
+that take longer than API_REQUEST_TIMEOUT (queue wait included) get 504.
+Calls to each Ollama backend are capped separately by OLLAMA_MAX_OUTSTANDING
+(utils/backends.py). Chat sessions live in the session store
+(SESSION_STORE_PATH), so any worker can serve any session.
+"""
+import asyncio
+import json
+import uuid
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+try:
+    from fastapi import FastAPI, HTTPException
+    from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+    from pydantic import BaseModel, Field
+except ImportError as exc:  # pragma: no cover - depends on the installed extras
+    raise ImportError('The API server needs the "api" extra: pip install -e ".[api]"') from exc
+
+from agents.conversational import create_conversational_agent
+from agents.multi_tool import create_multi_tool_agent
+from utils.config import Config
+from utils.metrics import metrics
+from utils.session_store import SessionStore, get_session_store
+
+# Result keys returned by /v1/ask (the rest of the state is internal)
+ASK_FIELDS = (
+    "question",
+    "tool_choice",
+    "route_source",
+    "tool_output",
+    "final_answer",
+    "synthesis_strategy",
+    "speculation",
+    "semantic_cache",
+    "profiles",
+)
+CHAT_FIELDS = ("session_id", "answer", "context_tokens", "profiles")
+
+
+class AskRequest(BaseModel):
+    question: str = Field(..., min_length=1)
+    stream: bool = False
+
+
+class ChatRequest(BaseModel):
+    question: str = Field(..., min_length=1)
+    # Never a shared default: that would hand one client's history to another
+    session_id: str = Field(default_factory=lambda: uuid.uuid4().hex, min_length=1)
+    stream: bool = False
+
+
+class AdmissionControl:
+    """
+    Bounded request queue: a fixed number of run slots plus a waiting room.
+
+    Counters:
+    - "admitted" / "rejected": requests let in / shed with 429
+    - "completed" / "failed" / "cancelled": how admitted requests ended
+      (timeouts and requests dropped while queued count as cancelled)
+
+    Every admitted request must either enter slot() or be abandon()ed,
+    otherwise its place in the queue is never given back.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.counters: Counter = Counter()
+        self.running = 0
+        self.waiting = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def admit(self) -> bool:
+        """Reserve a place in the queue; False when the server is full."""
+        if self.running + self.waiting >= self.max_concurrency + self.max_queue:
+            self.counters["rejected"] += 1
+            return False
+        self.waiting += 1
+        self.counters["admitted"] += 1
+        return True
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Wait for a run slot for an admitted request and hold it."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        try:
+            await self._slots.acquire()
+        except asyncio.CancelledError:
+            self.counters["cancelled"] += 1
+            raise
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            yield
+            self.counters["completed"] += 1
+        except asyncio.CancelledError:
+            self.counters["cancelled"] += 1
+            raise
+        except Exception:
+            self.counters["failed"] += 1
+            raise
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+    def abandon(self) -> None:
+        """Give back the place of an admitted request that never reached slot()."""
+        self.waiting -= 1
+        self.counters["cancelled"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            **self.counters,
+            "running": self.running,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that holds a run slot for as long as it is being sent.
+
+    The slot is taken when the server starts sending the response, not in
+    the body generator: a client that disconnects before the first event
+    (so the body never starts) still gives its place back.
+    """
+
+    def __init__(self, content, admission: AdmissionControl, **kwargs):
+        super().__init__(content, **kwargs)
+        self.admission = admission
+
+    async def __call__(self, scope, receive, send):
+        async with self.admission.slot():
+            await super().__call__(scope, receive, send)
+
+
+def _pick(result: dict, fields: Tuple[str, ...]) -> dict:
+    return {key: result[key] for key in fields if key in result}
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _ask_events(agent, question: str) -> AsyncIterator[Tuple[str, dict]]:
+    result = {}
+    async for mode, chunk in agent.astream(
+        {"question": question}, stream_mode=["custom", "values"]
+    ):
+        if mode == "custom" and "token" in chunk:
+            yield "token", chunk
+        elif mode == "values":
+            result = chunk
+    yield "result", _pick(result, ASK_FIELDS)
+
+
+async def _chat_events(agent, request: ChatRequest) -> AsyncIterator[Tuple[str, dict]]:
+    result = {}
+    async for mode, chunk in agent.astream(
+        {"current_question": request.question, "session_id": request.session_id},
+        stream_mode=["custom", "updates", "values"],
+    ):
+        if mode == "custom" and "token" in chunk:
+            yield "token", chunk
+        elif mode == "updates":
+            for node in chunk:
+                yield "node", {"node": node}
+        elif mode == "values":
+            result = chunk
+    yield "result", _pick(result, CHAT_FIELDS)
+
+
+def create_app(
+    multi_tool_agent=None,
+    streaming_agent=None,
+    conversational_agent=None,
+    streaming_conversational_agent=None,
+    max_concurrency: Optional[int] = None,
+    max_queue: Optional[int] = None,
+    request_timeout: Optional[float] = None,
+) -> FastAPI:
+    """
+    Build the FastAPI app.
+
+    Args:
+        multi_tool_agent: Graph for /v1/ask (default: built at startup)
+        streaming_agent: Token-streaming graph for /v1/ask with "stream"
+            (default: built at startup with stream_tokens=True)
+        conversational_agent: Graph for /v1/chat (default: built at startup
+            on the shared session store, or one at SESSION_STORE_PATH)
+        streaming_conversational_agent: Token-streaming graph for /v1/chat
+            with "stream" (default: built at startup with stream_tokens=True
+            on the same store; conversational_agent if only that is given)
+        max_concurrency: Requests run at once (default: API_MAX_CONCURRENCY)
+        max_queue: Requests allowed to wait (default: API_MAX_QUEUE)
+        request_timeout: Seconds before a non-streaming request gets 504
+            (default: API_REQUEST_TIMEOUT)
+    """
+    admission = AdmissionControl(
+        Config.API_MAX_CONCURRENCY if max_concurrency is None else max_concurrency,
+        Config.API_MAX_QUEUE if max_queue is None else max_queue,
+    )
+    timeout = Config.API_REQUEST_TIMEOUT if request_timeout is None else request_timeout
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Compile each graph once; every request reuses them
+        print("📦 Building agent graphs...")
+        app.state.multi_tool = multi_tool_agent or create_multi_tool_agent()
+        app.state.streaming = streaming_agent or create_multi_tool_agent(stream_tokens=True)
+        if conversational_agent is None:
+            store = get_session_store() or SessionStore(Config.SESSION_STORE_PATH)
+            app.state.conversational = create_conversational_agent(session_store=store)
+            app.state.streaming_conversational = (
+                streaming_conversational_agent
+                or create_conversational_agent(session_store=store, stream_tokens=True)
+            )
+        else:
+            app.state.conversational = conversational_agent
+            app.state.streaming_conversational = (
+                streaming_conversational_agent or conversational_agent
+            )
+        app.state.ready = True
+        print("✅ API server ready")
+        yield
+        app.state.ready = False
+
+    app = FastAPI(title="LangGraph Multi-Agent API", lifespan=lifespan)
+    app.state.admission = admission
+    app.state.ready = False
+
+    def admit() -> None:
+        if not admission.admit():
+            raise HTTPException(
+                status_code=429,
+                detail="Server busy: request queue is full",
+                headers={"Retry-After": "1"},
+            )
+
+    async def run(coro):
+        entered = False
+
+        async def guarded():
+            nonlocal entered
+            entered = True
+            async with admission.slot():
+                return await coro
+
+        try:
+            return await asyncio.wait_for(guarded(), timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Request timed out")
+        finally:
+            # Cancelled before guarded() ever ran: release the reservation
+            if not entered:
+                coro.close()
+                admission.abandon()
+
+    def stream(events: AsyncIterator[Tuple[str, dict]]) -> StreamingResponse:
+        async def body():
+            try:
+                async for event, data in events:
+                    yield _sse(event, data)
+            except Exception as exc:
+                yield _sse("error", {"error": str(exc)})
+
+        return AdmittedStreamingResponse(
+            body(),
+            admission,
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.post("/v1/ask")
+    async def ask(request: AskRequest):
+        admit()
+        if request.stream:
+            return stream(_ask_events(app.state.streaming, request.question))
+        result = await run(app.state.multi_tool.ainvoke({"question": request.question}))
+        return _pick(result, ASK_FIELDS)
+
+    @app.post("/v1/chat")
+    async def chat(request: ChatRequest):
+        admit()
+        if request.stream:
+            return stream(_chat_events(app.state.streaming_conversational, request))
+        result = await run(
+            app.state.conversational.ainvoke(
+                {"current_question": request.question, "session_id": request.session_id}
+            )
+        )
+        return _pick(result, CHAT_FIELDS)
+
+    @app.get("/healthz")
+    async def healthz():
+        return {"status": "ok"}
+
+    @app.get("/readyz")
+    async def readyz():
+        ollama_ok = app.state.ready and await asyncio.to_thread(Config.check_ollama)
+        body = {
+            "status": "ready" if ollama_ok else "unavailable",
+            "graphs": app.state.ready,
+            "ollama": bool(ollama_ok),
+            "queue": admission.stats(),
+        }
+        return JSONResponse(body, status_code=200 if ollama_ok else 503)
+
+    @app.get("/metrics")
+    async def prometheus_metrics():
+        return PlainTextResponse(
+            metrics.to_prometheus(), media_type="text/plain; version=0.0.4"
+        )
+
+    return app
+
+
+app = create_app()
+
+
+def main():
+    """Run the server with uvicorn."""
+    import argparse
+
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Multi-agent HTTP API server")
+    parser.add_argument("--host", default=Config.API_HOST)
+    parser.add_argument("--port", type=int, default=Config.API_PORT)
+    args = parser.parse_args()
+
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -39,13 +39,15 @@ def main():
     else:
         # Single question mode
         from src.agents.multi_tool import create_multi_tool_agent
+        from examples.interactive_cli import stream_result
         
         print(f"\n❓ Question: {args.question}\n")
         
-        agent = create_multi_tool_agent()
-        result = agent.invoke({"question": args.question})
+        agent = create_multi_tool_agent(stream_tokens=True)
+        result, streamed = stream_result(agent, args.question)
         
-        print(f"🤖 Answer: {result['final_answer']}")
+        if not streamed:
+            print(f"🤖 Answer: {result['final_answer']}")
         print(f"\n(Used tool: {result['tool_choice']})\n")
 
 
@@ -1,69 +1,461 @@
 """
 Calculator tool for mathematical operations.
 
-Uses Python's eval() but with safety restrictions.
-In production, you'd use a proper math parser like 'simpleeval'.
+Expressions are parsed into a Python AST, validated against a whitelist of
+node types and evaluated by a small interpreter - never eval(). Parsed
+expressions are cached, and resource guards (exponent size, result
+magnitude, operand count, nesting depth, evaluation time) reject
+pathological inputs like 9**9**9**9 in microseconds.
+
+BulkMathTool adds a NumPy-backed mode for aggregates (sum, mean, std,
+percentiles, dot products, ...) over long pasted lists; integer ranges use
+exact closed-form formulas instead.
 """
+import ast
+import itertools
+import math
+import operator
 import re
-from typing import Union
+import time
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+Number = Union[int, float]
+
+
+class CalculationError(ValueError):
+    """Raised when an expression is invalid or exceeds a resource limit."""
 
 
 class CalculatorTool:
     """
     Safe calculator for basic math operations.
-    
+
     Use cases:
     - "What is 15 * 24 + 50?"
     - "Calculate 2^10"
     - "What's 100 / 7?"
+    - "max(3, 7) * abs(-2)"
     """
-    
+
     # Allowed operations (whitelist approach for safety)
-    ALLOWED_OPERATORS = {'+', '-', '*', '/', '**', '(', ')', '.'}
+    ALLOWED_OPERATORS = {'+', '-', '*', '/', '//', '%', '**', '^', '(', ')', '.'}
     ALLOWED_FUNCTIONS = {'abs', 'round', 'min', 'max', 'sum'}
-    
+
+    # Resource guards
+    MAX_EXPRESSION_LENGTH = 1000
+    MAX_OPERANDS = 200
+    MAX_DEPTH = 50
+    MAX_EXPONENT = 10_000
+    MAX_ROUND_DIGITS = 100
+    MAX_RESULT_DIGITS = 300       # |result| must stay below 10**300
+    MAX_EVAL_SECONDS = 0.05
+
+    _BINARY_OPERATORS: Dict[type, Callable[[Number, Number], Number]] = {
+        ast.Add: operator.add,
+        ast.Sub: operator.sub,
+        ast.Mult: operator.mul,
+        ast.Div: operator.truediv,
+        ast.FloorDiv: operator.floordiv,
+        ast.Mod: operator.mod,
+        ast.Pow: operator.pow,
+    }
+    _UNARY_OPERATORS: Dict[type, Callable[[Number], Number]] = {
+        ast.UAdd: operator.pos,
+        ast.USub: operator.neg,
+    }
+    _FUNCTIONS: Dict[str, Callable] = {
+        'abs': abs,
+        'round': round,
+        'min': min,
+        'max': max,
+        'sum': lambda *args: sum(args[0]) if len(args) == 1 else sum(args),
+    }
+
     def calculate(self, expression: str) -> str:
         """
         Evaluate a mathematical expression safely.
-        
+
         Args:
             expression: Math expression as string (e.g., "2 + 2")
-            
+
         Returns:
             Result as string, or error message
         """
         try:
-            # Clean the expression
-            expression = expression.strip()
-            
-            # Basic safety check: only allow numbers, operators, and spaces
-            # This prevents malicious code injection
-            allowed_chars = set('0123456789.+-*/() ')
-            if not all(c in allowed_chars for c in expression):
-                return f"Error: Expression contains invalid characters. Only numbers and +, -, *, /, (), . allowed."
-            
-            # Evaluate (still use with caution in production!)
-            result = eval(expression)
-            
-            # Format result nicely
-            if isinstance(result, float):
-                # Round to 2 decimal places for readability
-                if result.is_integer():
-                    return str(int(result))
-                else:
-                    return f"{result:.2f}"
-            return str(result)
-        
+            return format_number(self.evaluate(expression))
+
         except ZeroDivisionError:
             return "Error: Division by zero"
         except SyntaxError:
             return f"Error: Invalid mathematical expression"
+        except CalculationError as e:
+            return f"Error: {e}"
         except Exception as e:
             return f"Error: {str(e)}"
 
+    def evaluate(self, expression: str) -> Number:
+        """
+        Evaluate an expression and return the raw number.
+
+        Raises:
+            SyntaxError: If the expression can't be parsed
+            CalculationError: If it uses disallowed syntax or exceeds a limit
+            ZeroDivisionError: On division by zero
+        """
+        expression = expression.strip()
+        if len(expression) > self.MAX_EXPRESSION_LENGTH:
+            raise CalculationError(
+                f"Expression is too long (max {self.MAX_EXPRESSION_LENGTH} characters)"
+            )
+
+        # "2^10" means power; rewriting the text (not the AST node) gives ^
+        # the precedence of ** instead of XOR's, so "3*2^2" is 12
+        expression = expression.replace("^", "**")
+        tree = _parse(expression, self.MAX_OPERANDS, self.MAX_DEPTH)
+        deadline = time.perf_counter() + self.MAX_EVAL_SECONDS
+        return self._eval(tree, deadline)
+
+    def _eval(self, node: ast.AST, deadline: float) -> Number:
+        if time.perf_counter() > deadline:
+            raise CalculationError("Evaluation took too long")
+
+        if isinstance(node, ast.Constant):
+            return self._check_magnitude(node.value)
+
+        if isinstance(node, ast.UnaryOp):
+            return self._UNARY_OPERATORS[type(node.op)](self._eval(node.operand, deadline))
+
+        if isinstance(node, ast.BinOp):
+            left = self._eval(node.left, deadline)
+            right = self._eval(node.right, deadline)
+            if isinstance(node.op, ast.Pow):
+                self._check_power(left, right)
+            return self._check_magnitude(self._BINARY_OPERATORS[type(node.op)](left, right))
+
+        if isinstance(node, ast.Call):
+            args = [self._eval(arg, deadline) for arg in node.args]
+            if node.func.id == "round":
+                self._check_round(args)
+            return self._check_magnitude(self._FUNCTIONS[node.func.id](*args))
+
+        if isinstance(node, (ast.List, ast.Tuple)):
+            return [self._eval(element, deadline) for element in node.elts]
+
+        # _parse() only lets the node types above through
+        raise CalculationError(f"Unsupported syntax: {type(node).__name__}")
+
+    def _check_round(self, args: List[Number]) -> None:
+        """Reject round() digit counts that would take seconds of CPU."""
+        if len(args) > 1 and isinstance(args[1], (int, float)):
+            if abs(args[1]) > self.MAX_ROUND_DIGITS:
+                raise CalculationError(f"round() digits are too large (max {self.MAX_ROUND_DIGITS})")
+
+    def _check_power(self, base: Number, exponent: Number) -> None:
+        """Reject powers whose result would be huge before computing them."""
+        if isinstance(base, list) or isinstance(exponent, list):
+            raise CalculationError("Lists can only be used as function arguments")
+        if abs(exponent) > self.MAX_EXPONENT:
+            raise CalculationError(f"Exponent is too large (max {self.MAX_EXPONENT})")
+        if abs(base) > 1 and exponent > 0:
+            if exponent * math.log10(abs(base)) > self.MAX_RESULT_DIGITS:
+                raise CalculationError("Result is too large")
+
+    def _check_magnitude(self, result: Number) -> Number:
+        if isinstance(result, complex):
+            raise CalculationError("Result is not a real number")
+        if isinstance(result, float) and not math.isfinite(result):
+            raise CalculationError("Result is too large")
+        if isinstance(result, (int, float)) and abs(result) >= 10 ** self.MAX_RESULT_DIGITS:
+            raise CalculationError("Result is too large")
+        return result
+
+
+def format_number(result: Number) -> str:
+    """Format a result nicely: integers as-is, other floats to 2 decimals."""
+    if isinstance(result, float):
+        # Round to 2 decimal places for readability
+        if result.is_integer():
+            return str(int(result))
+        else:
+            return f"{result:.2f}"
+    return str(result)
+
+
+# Operators that chain at the same precedence level ("**" nests to the right)
+_PRECEDENCE = {
+    ast.Add: "additive",
+    ast.Sub: "additive",
+    ast.Mult: "multiplicative",
+    ast.Div: "multiplicative",
+    ast.FloorDiv: "multiplicative",
+    ast.Mod: "multiplicative",
+}
+
+
+@lru_cache(maxsize=1024)
+def _parse(expression: str, max_operands: int, max_depth: int) -> ast.AST:
+    """
+    Parse and validate an expression once; repeats hit the cache.
+
+    Raises:
+        SyntaxError: If the expression can't be parsed
+        CalculationError: If it uses anything outside the whitelist
+    """
+    tree = ast.parse(expression, mode="eval").body
+
+    operands = 0
+    stack = [(tree, 1, False)]
+    while stack:
+        node, depth, in_call = stack.pop()
+        if depth > max_depth:
+            raise CalculationError(f"Expression is nested too deeply (max {max_depth})")
+
+        if isinstance(node, ast.Constant):
+            # bool is an int subclass; reject it along with strings etc.
+            if type(node.value) not in (int, float):
+                raise CalculationError("Only numbers are allowed")
+            operands += 1
+            if operands > max_operands:
+                raise CalculationError(f"Too many operands (max {max_operands})")
+            continue
+
+        if isinstance(node, ast.BinOp) and type(node.op) in CalculatorTool._BINARY_OPERATORS:
+            # "1 + 2 - 3 + ..." is one flat chain, not 50 levels of nesting;
+            # MAX_OPERANDS bounds its length
+            family = _PRECEDENCE.get(type(node.op))
+            for child in (node.left, node.right):
+                same_chain = (
+                    family is not None
+                    and isinstance(child, ast.BinOp)
+                    and _PRECEDENCE.get(type(child.op)) == family
+                )
+                stack.append((child, depth if same_chain else depth + 1, False))
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in CalculatorTool._UNARY_OPERATORS:
+            stack.append((node.operand, depth + 1, False))
+        elif (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Name)
+            and node.func.id in CalculatorTool.ALLOWED_FUNCTIONS
+            and not node.keywords
+        ):
+            stack.extend((arg, depth + 1, True) for arg in node.args)
+        elif isinstance(node, (ast.List, ast.Tuple)) and in_call:
+            stack.extend((element, depth + 1, False) for element in node.elts)
+        else:
+            raise CalculationError(
+                f"Expression contains unsupported syntax. Only numbers, "
+                f"{', '.join(sorted(CalculatorTool.ALLOWED_OPERATORS))} and "
+                f"{', '.join(sorted(CalculatorTool.ALLOWED_FUNCTIONS))}() are allowed."
+            )
+
+    return tree
+
+
+class BulkMathTool:
+    """
+    Vectorized aggregates over large numeric lists and ranges (NumPy).
 
-# Create singleton
+    Use cases:
+    - "Mean and std of these numbers: 4, 8, 15, 16, 23, 42, ..."
+    - "Sum of the numbers from 1 to 1,000,000"
+    - "95th percentile of: 12 30 7 ..."
+    - "Dot product of [1, 2, 3] and [4, 5, 6]"
+
+    Memory stays bounded: pasted lists are capped at MAX_VALUES, and ranges
+    are never materialized.
+    """
+
+    MAX_VALUES = 1_000_000
+    MAX_RANGE_LENGTH = 100_000_000
+    # Plain sum/mean/min/max over short lists stay on the scalar path
+    MIN_BULK_LIST = 20
+    SCALAR_OPERATIONS = {"sum", "mean", "min", "max"}
+
+    _OPERATIONS = [
+        ("sum", re.compile(r"\b(?:sum|total)\b")),
+        ("mean", re.compile(r"\b(?:mean|average|avg)\b")),
+        ("std", re.compile(r"\b(?:std|stdev|standard\s+deviation)\b")),
+        ("var", re.compile(r"\b(?:var|variance)\b")),
+        ("min", re.compile(r"\b(?:min|minimum|smallest)\b")),
+        ("max", re.compile(r"\b(?:max|maximum|largest)\b")),
+        ("median", re.compile(r"\bmedian\b")),
+        ("count", re.compile(r"\bcount\b")),
+    ]
+    _PERCENTILE_RE = re.compile(
+        r"\b(\d{1,2}(?:\.\d+)?)(?:st|nd|rd|th)?\s+percentile\b"
+        r"|\bpercentile\s+(\d{1,2}(?:\.\d+)?)\b"
+        r"|\bp(\d{1,2})\b"
+    )
+    _DOT_RE = re.compile(r"\bdot\s+product\b")
+    _VECTOR_RE = re.compile(r"\[([^\]]*)\]")
+    # Bounds are whole numbers: "1.5 to 3.5" must not read as 5..3
+    _BOUND = r"(?<!\d)(?<!\d\.)(-?\d[\d,]*(?:\.\d+)?)(?!\d|\.\d)"
+    _RANGE_RE = re.compile(
+        rf"\bbetween\s+{_BOUND}\s+and\s+{_BOUND}"
+        rf"|(?:\bfrom\s+|\brange\s+)?{_BOUND}\s*(?:\bto\b|\bthrough\b|\.\.)\s*{_BOUND}"
+    )
+    _NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?(?:e[-+]?\d+)?")
+    _THOUSANDS_RE = re.compile(r"(?<=\d),(?=\d{3}(?!\d))")
+
+    def calculate(self, question: str) -> Optional[str]:
+        """
+        Run a bulk aggregate request.
+
+        Args:
+            question: Natural-language request containing the data
+
+        Returns:
+            "op(N values) = result; ..." string, an "Error: ..." string, or
+            None if this isn't a bulk request (use the scalar calculator)
+        """
+        text = question.lower()
+        operations = self._operations(text)
+        is_dot = bool(self._DOT_RE.search(text))
+        if not operations and not is_dot:
+            return None
+
+        try:
+            if is_dot:
+                return self._dot(_import_numpy(), text)
+
+            # Data after a colon wins over a range in the description
+            _, colon, data = text.rpartition(":")
+            if not colon:
+                bounds = self._range(text)
+                if bounds:
+                    return self._aggregate_range(*bounds, operations)
+                data = text.split(" of ", 1)[-1]
+
+            np = _import_numpy()
+            values = self._parse_values(np, data)
+            if values.size < 2:
+                return None
+            scalar_only = all(op in self.SCALAR_OPERATIONS for op in operations)
+            if scalar_only and values.size < self.MIN_BULK_LIST:
+                return None
+
+            return self._aggregate_array(np, values, operations)
+
+        except CalculationError as e:
+            return f"Error: {e}"
+        except OverflowError:
+            return "Error: Result is too large"
+
+    def _operations(self, text: str) -> List[str]:
+        operations = [name for name, pattern in self._OPERATIONS if pattern.search(text)]
+        for match in self._PERCENTILE_RE.finditer(text):
+            q = next(group for group in match.groups() if group)
+            operations.append(f"p{q}")
+        return operations
+
+    def _range(self, text: str) -> Optional[Tuple[int, int]]:
+        match = self._RANGE_RE.search(text)
+        if not match:
+            return None
+        start, stop = [g for g in match.groups() if g is not None]
+        if "." in start or "." in stop:
+            raise CalculationError("Range bounds must be whole numbers")
+        return int(start.replace(",", "")), int(stop.replace(",", ""))
+
+    def _parse_values(self, np, data: str):
+        """Stream numbers out of the text into a float64 array, capped."""
+        data = self._THOUSANDS_RE.sub("", data)  # "1,000, 2,000" is two values
+        numbers = (m.group() for m in self._NUMBER_RE.finditer(data))
+        values = np.fromiter(
+            itertools.islice(numbers, self.MAX_VALUES + 1), dtype=np.float64
+        )
+        if values.size > self.MAX_VALUES:
+            raise CalculationError(f"Too many values (max {self.MAX_VALUES:,})")
+        return values
+
+    def _aggregate_array(self, np, values, operations: List[str]) -> str:
+        label = f"{values.size} values"
+        results = []
+        for op in operations:
+            if op == "sum":
+                result = values.sum()
+            elif op == "mean":
+                result = values.mean()
+            elif op == "std":
+                result = values.std()
+            elif op == "var":
+                result = values.var()
+            elif op == "min":
+                result = values.min()
+            elif op == "max":
+                result = values.max()
+            elif op == "median":
+                result = np.median(values)
+            elif op == "count":
+                result = values.size
+            else:  # pNN
+                result = np.percentile(values, float(op[1:]))
+            results.append(f"{op}({label}) = {format_number(float(result))}")
+        return "; ".join(results)
+
+    def _aggregate_range(self, start: int, stop: int, operations: List[str]) -> str:
+        """
+        Aggregate an inclusive integer range with closed-form formulas.
+
+        Python ints keep sum, count and bounds exact at any magnitude (int64
+        arrays would silently wrap), and nothing is materialized.
+        """
+        count = abs(stop - start) + 1
+        if count > self.MAX_RANGE_LENGTH:
+            raise CalculationError(f"Range is too long (max {self.MAX_RANGE_LENGTH:,} values)")
+
+        ends = start + stop
+        var = (count * count - 1) / 12  # consecutive integers
+
+        low, high = min(start, stop), max(start, stop)
+        label = f"{start}..{stop}"
+        results = []
+        for op in operations:
+            if op == "sum":
+                result = count * ends // 2  # count * ends is always even
+            elif op == "mean":
+                result = ends // 2 if ends % 2 == 0 else ends / 2
+            elif op == "std":
+                result = math.sqrt(var)
+            elif op == "var":
+                result = var
+            elif op == "min":
+                result = low
+            elif op == "max":
+                result = high
+            elif op == "count":
+                result = count
+            else:
+                # Evenly spaced values: linear-interpolated percentiles are exact
+                q = 50.0 if op == "median" else float(op[1:])
+                result = low + (high - low) * q / 100
+            results.append(f"{op}({label}) = {format_number(result)}")
+        return "; ".join(results)
+
+    def _dot(self, np, text: str) -> Optional[str]:
+        vectors = self._VECTOR_RE.findall(text)
+        if len(vectors) != 2:
+            return None
+        a, b = (self._parse_values(np, v) for v in vectors)
+        if a.size != b.size:
+            raise CalculationError(
+                f"Vectors must have the same length ({a.size} vs {b.size})"
+            )
+        return f"dot({a.size}-vectors) = {format_number(float(np.dot(a, b)))}"
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise CalculationError("Bulk math needs numpy (pip install numpy)")
+    return numpy
+
+
+# Create singletons
 calculator_tool = CalculatorTool()
+bulk_math_tool = BulkMathTool()
 
 
 def calculate(expression: str) -> str:
@@ -74,6 +466,14 @@ def calculate(expression: str) -> str:
     return calculator_tool.calculate(expression)
 
 
+def calculate_bulk(question: str) -> Optional[str]:
+    """
+    Convenience function for bulk aggregates.
+    Returns None when the question isn't a bulk request.
+    """
+    return bulk_math_tool.calculate(question)
+
+
 # Test it
 if __name__ == "__main__":
     # Test cases
@@ -82,9 +482,23 @@ if __name__ == "__main__":
         "15 * 24 + 50",
         "100 / 3",
         "2 ** 10",
+        "2^10",
+        "max(3, 7) * abs(-2)",
+        "sum(1, 2, 3)",
         "10 / 0",  # Should handle error
         "import os",  # Should reject (security)
+        "__import__('os')",  # Should reject (security)
+        "9**9**9**9",  # Should reject quickly (resource guard)
     ]
-    
+
     for expr in test_cases:
-        print(f"{expr} = {calculate(expr)}")
\ No newline at end of file
+        print(f"{expr} = {calculate(expr)}")
+
+    bulk_cases = [
+        "Mean and std of these numbers: " + ", ".join(str(i) for i in range(5000)),
+        "Sum of the numbers from 1 to 1,000,000",
+        "95th percentile of: 12 30 7 4 19 22 8 15 3 11 9 14 2 6 1 5 10 13 16 17 18",
+        "Dot product of [1, 2, 3] and [4, 5, 6]",
+    ]
+    for question in bulk_cases:
+        print(f"{question[:50]} -> {calculate_bulk(question)}")
@@ -0,0 +1,167 @@
+"""
+Deterministic natural-language → calculator expression extractor.
+
+Turns questions like these into something CalculatorTool can evaluate,
+without an LLM round trip:
+- "What is 157 * 23?"            → "157 * 23"
+- "157 times 23"                 → "157 * 23"
+- "2 to the power of 10"         → "2 ** 10"
+- "15% of 240"                   → "(15 / 100 * 240)"
+- "sum of 3, 4 and 5"            → "sum(3, 4, 5)"
+
+Returns None when it can't produce a valid expression, so the caller can
+fall back to LLM extraction.
+"""
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+from tools.calculator import CalculationError, calculator_tool
+
+_NUMBER = r"-?\d+(?:\.\d+)?"
+
+_LEAD_RE = re.compile(
+    r"^(?:please\s+)?(?:(?:can|could)\s+you\s+)?(?:tell\s+me\s+)?"
+    r"(?:what\s+is|what's|whats|calculate|compute|evaluate|work\s+out|solve|"
+    r"how\s+much\s+is|find)?\s*(?:the\s+)?",
+)
+_THOUSANDS_RE = re.compile(r"(?<=\d),(?=\d{3}(?!\d))")
+_PERCENT_OF_RE = re.compile(rf"({_NUMBER})\s*(?:%|percent)\s+of\s+({_NUMBER})")
+_SQRT_RE = re.compile(rf"\b(?:square\s+root|sqrt)\s+of\s+({_NUMBER})")
+_AGGREGATE_RE = re.compile(
+    r"^(sum|total|product|average|mean|max|maximum|min|minimum)\s+of\s+(.+)$"
+)
+_LIST_RE = re.compile(rf"^{_NUMBER}(?:\s*(?:,|and|,\s*and)\s*{_NUMBER})+$")
+_NUMBER_RE = re.compile(_NUMBER)
+_SAFE_RE = re.compile(r"^[\d\s.+\-*/%()^,]*(?:(?:sum|min|max|abs|round)[\d\s.+\-*/%()^,]*)*$")
+
+# Ordered: longer phrases first so "multiplied by" wins over "by"
+_WORD_OPERATORS = [
+    (re.compile(r"\bmultiplied\s+by\b"), " * "),
+    (re.compile(r"\btimes\b"), " * "),
+    (re.compile(r"\bdivided\s+by\b"), " / "),
+    (re.compile(r"\bover\b"), " / "),
+    (re.compile(r"\bplus\b"), " + "),
+    (re.compile(r"\bminus\b"), " - "),
+    (re.compile(r"\bto\s+the\s+power\s+of\b"), " ** "),
+    (re.compile(r"\braised\s+to(?:\s+the\s+power\s+of)?\b"), " ** "),
+    (re.compile(r"\bsquared\b"), " ** 2"),
+    (re.compile(r"\bcubed\b"), " ** 3"),
+    (re.compile(r"\bmod(?:ulo)?\b"), " % "),
+    (re.compile(r"(?<=\d)\s*x\s*(?=\d)"), " * "),
+    (re.compile(r"×"), " * "),
+    (re.compile(r"÷"), " / "),
+]
+
+
+def _aggregate(function: str, numbers: List[str]) -> str:
+    joined = ", ".join(numbers)
+    if function in ("sum", "total"):
+        return f"sum({joined})"
+    if function == "product":
+        return " * ".join(numbers)
+    if function in ("average", "mean"):
+        return f"sum({joined}) / {len(numbers)}"
+    if function.startswith("max"):
+        return f"max({joined})"
+    return f"min({joined})"
+
+
+class ExpressionExtractor:
+    """
+    Rule-based expression extractor with hit counters.
+
+    Counters:
+    - "parsed": questions turned into an expression locally
+    - "llm": questions that needed the LLM extraction prompt
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Counter = Counter()
+
+    def extract(self, question: str) -> Optional[str]:
+        """
+        Extract a calculator expression from a natural-language question.
+
+        Args:
+            question: The user's question
+
+        Returns:
+            Expression string, or None if parsing failed
+        """
+        text = question.strip().lower().rstrip("?!. ")
+        text = _LEAD_RE.sub("", text, count=1)
+        text = _THOUSANDS_RE.sub("", text)
+
+        aggregate = _AGGREGATE_RE.match(text)
+        if aggregate and _LIST_RE.match(aggregate.group(2).strip()):
+            numbers = _NUMBER_RE.findall(aggregate.group(2))
+            text = _aggregate(aggregate.group(1), numbers)
+
+        text = _PERCENT_OF_RE.sub(r"(\1 / 100 * \2)", text)
+        text = _SQRT_RE.sub(r"(\1 ** 0.5)", text)
+        for pattern, replacement in _WORD_OPERATORS:
+            text = pattern.sub(replacement, text)
+
+        expression = " ".join(text.split())
+        if not expression or not any(c.isdigit() for c in expression):
+            return None
+        if not _SAFE_RE.match(expression):
+            return None
+
+        try:
+            calculator_tool.evaluate(expression)
+        except (SyntaxError, CalculationError):
+            return None
+        except Exception:
+            # Valid syntax that fails at runtime (e.g. division by zero);
+            # the calculator reports the error itself
+            pass
+
+        return expression
+
+    def record(self, source: str) -> None:
+        """Count which path ("parsed" or "llm") produced an expression."""
+        with self._lock:
+            self.counters[source] += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Snapshot of the counters plus the extractor hit rate."""
+        with self._lock:
+            snapshot = dict(self.counters)
+        total = snapshot.get("parsed", 0) + snapshot.get("llm", 0)
+        snapshot["total"] = total
+        snapshot["hit_rate"] = snapshot.get("parsed", 0) / total if total else 0.0
+        return snapshot
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+
+
+# Create singleton
+expression_extractor = ExpressionExtractor()
+
+
+def extract_expression(question: str) -> Optional[str]:
+    """
+    Convenience function for the calculator node.
+    """
+    return expression_extractor.extract(question)
+
+
+if __name__ == "__main__":
+    for q in [
+        "What is 157 * 23?",
+        "157 times 23",
+        "What is 2 to the power of 10?",
+        "What's 15% of 240?",
+        "What is the sum of 3, 4 and 5?",
+        "Average of 10, 20, 30",
+        "What is the square root of 144?",
+        "How much is 1,250 divided by 5?",
+        "How many legs does a spider have?",
+    ]:
+        print(f"{q!r:40} -> {extract_expression(q)}")
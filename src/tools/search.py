@@ -4,11 +4,18 @@ Web search tool using Tavily API.
 Why Tavily? It's designed for LLM agents - returns clean, formatted results
 optimized for RAG and agent use cases.
 """
+import asyncio
 import os
-from typing import Optional
+from typing import Optional, Tuple
 
 from dotenv import load_dotenv
 
+from tools.search_cache import STALE, SearchCache
+from utils.config import Config
+from utils.loop_local import LoopLocal
+from utils.metrics import record_cache
+from utils.single_flight import SingleFlight
+
 load_dotenv()
 
 
@@ -22,12 +29,24 @@ class WebSearchTool:
     - "Latest news about LangGraph"
     """
 
-    def __init__(self, api_key: Optional[str] = None, client=None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        client=None,
+        cache: Optional[SearchCache] = None,
+        async_client=None,
+        flight: Optional[SingleFlight] = None,
+    ):
         self.api_key = api_key or os.getenv("TAVILY_API_KEY")
         self.client = client
+        self.async_client = async_client
+        # Built from the API key: one AsyncTavilyClient per event loop
+        self._async_clients: Optional[LoopLocal] = None
+        self.cache = cache
+        self.flight = flight
         self._init_error = None
 
-        if self.client:
+        if self.client or self.async_client:
             return
 
         if not self.api_key:
@@ -42,10 +61,22 @@ class WebSearchTool:
 
         self.client = TavilyClient(api_key=self.api_key)
 
+        try:
+            from tavily import AsyncTavilyClient
+        except ImportError:  # Older tavily-python: asearch falls back to a thread
+            return
+
+        self._async_clients = LoopLocal(lambda: AsyncTavilyClient(api_key=self.api_key))
+
     def search(self, query: str, max_results: int = 3) -> str:
         """
         Search the web and return formatted results.
 
+        Successful results are served from the cache when one is configured;
+        stale entries are returned at once while a background refresh runs.
+        With a SingleFlight, concurrent searches for the same query share
+        one Tavily request.
+
         Args:
             query: Search query
             max_results: Number of results to return (default 3)
@@ -53,41 +84,159 @@ class WebSearchTool:
         Returns:
             Formatted string with search results
         """
+        unavailable = self._check_ready(query, self.client)
+        if unavailable:
+            return unavailable
+
+        if self.cache is None:
+            return self._fetch_once(query, max_results)[0]
+
+        key = self.cache.make_key(query, max_results)
+        cached, freshness = self.cache.get(key)
+        record_cache("search", freshness or "miss")
+        if cached is not None:
+            if freshness == STALE:
+                self.cache.refresh_in_background(
+                    key, lambda: self._fetch(query, max_results)
+                )
+            return cached
+
+        result, ok = self._fetch_once(query, max_results)
+        # Errors and empty result sets are never cached as successes
+        if ok:
+            self.cache.set(key, result)
+        return result
+
+    async def asearch(self, query: str, max_results: int = 3) -> str:
+        """
+        Async version of search().
+
+        Uses the async Tavily client when available, otherwise runs the
+        sync client in a worker thread.
+        """
+        unavailable = self._check_ready(query, self.client or self.async_client)
+        if unavailable:
+            return unavailable
+
+        if self.cache is None:
+            return (await self._afetch_once(query, max_results))[0]
+
+        key = self.cache.make_key(query, max_results)
+        cached, freshness = self.cache.get(key)
+        record_cache("search", freshness or "miss")
+        if cached is not None:
+            if freshness == STALE:
+                self.cache.arefresh_in_background(
+                    key, lambda: self._afetch(query, max_results)
+                )
+            return cached
+
+        result, ok = await self._afetch_once(query, max_results)
+        if ok:
+            self.cache.set(key, result)
+        return result
+
+    def _check_ready(self, query: str, client) -> Optional[str]:
+        """Return an error message if a search can't be attempted."""
         if not query.strip():
             return "Search error: empty query provided."
 
         if self._init_error:
             return f"Search unavailable: {self._init_error}"
 
-        if not self.client:
+        if not client:
             return "Search unavailable: Tavily client is not configured."
 
+        return None
+
+    def _fetch_once(self, query: str, max_results: int) -> Tuple[str, bool]:
+        """_fetch(), shared with concurrent identical searches."""
+        if self.flight is None:
+            return self._fetch(query, max_results)
+        return self.flight.do(
+            SearchCache.make_key(query, max_results), lambda: self._fetch(query, max_results)
+        )
+
+    async def _afetch_once(self, query: str, max_results: int) -> Tuple[str, bool]:
+        """Async version of _fetch_once()."""
+        if self.flight is None:
+            return await self._afetch(query, max_results)
+        return await self.flight.ado(
+            SearchCache.make_key(query, max_results), lambda: self._afetch(query, max_results)
+        )
+
+    def _fetch(self, query: str, max_results: int) -> Tuple[str, bool]:
+        """
+        Call Tavily and format the results.
+
+        Returns:
+            (formatted text, whether it is a cacheable success)
+        """
+        if not self.client:
+            return "Search unavailable: Tavily client is not configured.", False
+
         try:
             response = self.client.search(
                 query=query,
                 max_results=max_results,
                 search_depth="basic",
             )
+            return self._format(response)
 
-            formatted_results = []
-            for i, result in enumerate(response.get("results", []), 1):
-                formatted_results.append(
-                    f"[Result {i}]\n"
-                    f"Title: {result.get('title', 'N/A')}\n"
-                    f"Content: {result.get('content', 'N/A')}\n"
-                    f"URL: {result.get('url', 'N/A')}\n"
-                )
+        except Exception as e:
+            return f"Search error: {str(e)}", False
 
-            if not formatted_results:
-                return "No results found."
+    async def _afetch(self, query: str, max_results: int) -> Tuple[str, bool]:
+        """Async version of _fetch()."""
+        client = self._async_clients.get() if self._async_clients else self.async_client
+        if not client:
+            return await asyncio.to_thread(self._fetch, query, max_results)
 
-            return "\n".join(formatted_results)
+        try:
+            response = await client.search(
+                query=query,
+                max_results=max_results,
+                search_depth="basic",
+            )
+            return self._format(response)
 
         except Exception as e:
-            return f"Search error: {str(e)}"
+            return f"Search error: {str(e)}", False
+
+    @staticmethod
+    def _format(response: dict) -> Tuple[str, bool]:
+        """Format a Tavily response as (text, is_success)."""
+        formatted_results = []
+        for i, result in enumerate(response.get("results", []), 1):
+            formatted_results.append(
+                f"[Result {i}]\n"
+                f"Title: {result.get('title', 'N/A')}\n"
+                f"Content: {result.get('content', 'N/A')}\n"
+                f"URL: {result.get('url', 'N/A')}\n"
+            )
+
+        if not formatted_results:
+            return "No results found.", False
+
+        return "\n".join(formatted_results), True
+
 
+def _default_search_cache() -> Optional[SearchCache]:
+    if not Config.SEARCH_CACHE_ENABLED:
+        return None
+    return SearchCache(
+        path=Config.SEARCH_CACHE_PATH or None,
+        max_entries=Config.SEARCH_CACHE_MAX_ENTRIES,
+        ttl_seconds=Config.SEARCH_CACHE_TTL_SECONDS,
+        stale_seconds=Config.SEARCH_CACHE_STALE_SECONDS,
+        max_disk_entries=Config.SEARCH_CACHE_MAX_DISK_ENTRIES,
+    )
 
-web_search_tool = WebSearchTool()
+
+web_search_tool = WebSearchTool(
+    cache=_default_search_cache(),
+    flight=SingleFlight() if Config.COALESCE_ENABLED else None,
+)
 
 
 def search_web(query: str) -> str:
@@ -98,6 +247,13 @@ def search_web(query: str) -> str:
     return web_search_tool.search(query)
 
 
+async def asearch_web(query: str) -> str:
+    """
+    Async convenience function for web search.
+    """
+    return await web_search_tool.asearch(query)
+
+
 if __name__ == "__main__":
     result = search_web("LangGraph latest features")
     print(result)
@@ -0,0 +1,268 @@
+"""
+Result cache for the web search tool.
+
+Two tiers:
+- an in-memory LRU for hot queries
+- an optional SQLite tier that survives restarts
+
+Entries carry their own TTL. Once an entry is older than its TTL but still
+inside the stale window, it is served immediately while a background
+refresh fetches a new copy (stale-while-revalidate).
+
+The SQLite tier is bounded too: writes prune rows past their stale window
+(at most once per ``PRUNE_INTERVAL_SECONDS``) and evict the oldest rows
+beyond ``max_disk_entries``.
+"""
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+FRESH = "fresh"
+STALE = "stale"
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class SearchCache:
+    """
+    Two-tier TTL cache with stale-while-revalidate.
+
+    Counters:
+    - "fresh_hits" / "stale_hits" / "misses": lookups by outcome
+    - "refreshes" / "refresh_failures": background revalidations
+    - "evictions": entries pushed out of the memory tier
+    - "disk_evictions" / "disk_expired": rows removed from the SQLite tier
+    """
+
+    PRUNE_INTERVAL_SECONDS = 60
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_entries: int = 1024,
+        ttl_seconds: float = 300,
+        stale_seconds: float = 3600,
+        max_disk_entries: int = 100_000,
+    ):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.counters: Counter = Counter()
+
+        # key -> (value, stored_at, ttl)
+        self._memory: "OrderedDict[str, Tuple[str, float, float]]" = OrderedDict()
+        self._refreshing = set()
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._disk_size = 0
+        self._pruned_at = 0.0
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " stored_at REAL NOT NULL,"
+                " ttl REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS search_cache_stored_at ON search_cache (stored_at)"
+            )
+            self._conn.commit()
+            self._disk_size = self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+
+    @staticmethod
+    def make_key(query: str, max_results: int) -> str:
+        """Normalize a query so trivial variations share an entry."""
+        normalized = _WHITESPACE_RE.sub(" ", query.strip().lower()).rstrip("?!. ")
+        return f"{max_results}:{normalized}"
+
+    def get(self, key: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Look up a cached result.
+
+        Args:
+            key: Key from make_key()
+
+        Returns:
+            (value, FRESH/STALE), or (None, None) on a miss or expired entry
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+
+        if entry is None and self._conn is not None:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value, stored_at, ttl FROM search_cache WHERE key = ?", (key,)
+                ).fetchone()
+            if row is not None:
+                entry = tuple(row)
+                self._remember(key, entry)
+
+        if entry is None:
+            self._count("misses")
+            return None, None
+
+        value, stored_at, ttl = entry
+        age = now - stored_at
+        if age <= ttl:
+            self._count("fresh_hits")
+            return value, FRESH
+        if age <= ttl + self.stale_seconds:
+            self._count("stale_hits")
+            return value, STALE
+
+        self._count("misses")
+        return None, None
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """Store a successful result in both tiers."""
+        entry = (value, time.time(), self.ttl_seconds if ttl is None else ttl)
+        self._remember(key, entry)
+
+        if self._conn is not None:
+            with self._lock:
+                existed = self._conn.execute(
+                    "SELECT 1 FROM search_cache WHERE key = ?", (key,)
+                ).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO search_cache (key, value, stored_at, ttl)"
+                    " VALUES (?, ?, ?, ?)",
+                    (key, *entry),
+                )
+                if not existed:
+                    self._disk_size += 1
+                self._prune_disk(entry[1])
+                self._conn.commit()
+
+    def _prune_disk(self, now: float) -> None:
+        """Drop rows past their stale window, then the oldest over the cap. Holds _lock."""
+        if now - self._pruned_at >= self.PRUNE_INTERVAL_SECONDS:
+            self._pruned_at = now
+            expired = self._conn.execute(
+                "DELETE FROM search_cache WHERE stored_at + ttl + ? < ?",
+                (self.stale_seconds, now),
+            ).rowcount
+            self._disk_size -= expired
+            self.counters["disk_expired"] += expired
+
+        overflow = self._disk_size - self.max_disk_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM search_cache WHERE key IN ("
+                " SELECT key FROM search_cache ORDER BY stored_at ASC LIMIT ?)",
+                (overflow,),
+            )
+            self._disk_size -= overflow
+            self.counters["disk_evictions"] += overflow
+
+    def refresh_in_background(
+        self, key: str, fetch: Callable[[], Tuple[str, bool]]
+    ) -> bool:
+        """
+        Revalidate a stale entry on a daemon thread.
+
+        Args:
+            key: Cache key to refresh
+            fetch: Callable returning (value, ok); only ok values are stored
+
+        Returns:
+            True if a refresh was started, False if one is already running
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+
+        def _run():
+            try:
+                value, ok = fetch()
+                if ok:
+                    self.set(key, value)
+                    self._count("refreshes")
+                else:
+                    self._count("refresh_failures")
+            except Exception:
+                self._count("refresh_failures")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=_run, name=f"search-refresh:{key}", daemon=True).start()
+        return True
+
+    def arefresh_in_background(
+        self, key: str, afetch: Callable[[], Awaitable[Tuple[str, bool]]]
+    ) -> bool:
+        """
+        Async version of refresh_in_background(): runs as a task on the
+        current event loop instead of a thread.
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+
+        async def _run():
+            try:
+                value, ok = await afetch()
+                if ok:
+                    self.set(key, value)
+                    self._count("refreshes")
+                else:
+                    self._count("refresh_failures")
+            except Exception:
+                self._count("refresh_failures")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        # Keep a reference so the task isn't garbage collected mid-flight
+        task = asyncio.ensure_future(_run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM search_cache")
+                self._conn.commit()
+                self._disk_size = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Snapshot of the counters plus memory-tier size and hit rate."""
+        with self._lock:
+            snapshot = dict(self.counters)
+            snapshot["size"] = len(self._memory)
+            snapshot["disk_size"] = self._disk_size
+        hits = snapshot.get("fresh_hits", 0) + snapshot.get("stale_hits", 0)
+        lookups = hits + snapshot.get("misses", 0)
+        snapshot["hit_rate"] = hits / lookups if lookups else 0.0
+        return snapshot
+
+    def _remember(self, key: str, entry: Tuple[str, float, float]) -> None:
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
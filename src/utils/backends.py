@@ -0,0 +1,364 @@
+"""
+Load balancing across several Ollama servers.
+
+``OLLAMA_BACKENDS`` lists the servers ("http://gpu1:11434=2,http://gpu2:11434";
+the optional ``=N`` is a weight). Each request goes to the healthy backend
+with the lowest ``(outstanding + 1) / weight``; ties go to the backend that
+has served the least per unit of weight, so an idle pool still spreads
+calls in proportion to the weights.
+
+- Sticky sessions: calls carrying a session id keep going to the backend
+  that served the session before, so its KV context (utils/context_reuse.py)
+  stays warm. A session moves only if its backend is ejected.
+- Ejection: ``eject_after`` consecutive failures (connection errors,
+  timeouts, 5xx) eject a backend for ``eject_seconds``. After that it gets
+  one trial request: success re-admits it, failure ejects it again.
+- Health checks: check_health() lists models on every backend and ejects or
+  re-admits accordingly; start_health_checks() runs it in a daemon thread.
+- Failover: a call that fails with a backend error is retried once on each
+  of the other backends before the error is raised.
+- Concurrency limit: with ``max_outstanding`` set, a backend never has more
+  than that many calls in flight; further calls wait for a free slot
+  (threads block, coroutines await) instead of piling onto the server.
+"""
+import asyncio
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import (
+    AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar,
+)
+
+import httpx
+import ollama
+
+from utils.loop_local import LoopLocal
+
+T = TypeVar("T")
+
+
+def parse_backends(spec: str) -> List[Tuple[str, float]]:
+    """Parse "url[=weight],url[=weight]" into (url, weight) pairs."""
+    backends = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, weight = item.rpartition("=")
+        if not url or not weight.replace(".", "", 1).isdigit():
+            url, weight = item, "1"
+        backends.append((url.strip(), float(weight)))
+    return backends
+
+
+def is_backend_failure(error: BaseException) -> bool:
+    """Errors that say the server is unhealthy, not that the request was bad."""
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code >= 500
+    return isinstance(error, (ConnectionError, httpx.TransportError))
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class Backend:
+    """One Ollama server with its own connection pool and load counters."""
+
+    def __init__(self, url: str, weight: float = 1.0, client_options: Optional[dict] = None):
+        self.url = url
+        self.weight = weight
+        self.client_options = client_options or {}
+        self.outstanding = 0
+        self.served = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self._client: Optional[ollama.Client] = None
+        self._async_clients = LoopLocal(
+            lambda: ollama.AsyncClient(host=self.url, **self.client_options)
+        )
+
+    @property
+    def client(self) -> ollama.Client:
+        if self._client is None:
+            self._client = ollama.Client(host=self.url, **self.client_options)
+        return self._client
+
+    @property
+    def async_client(self) -> ollama.AsyncClient:
+        """This backend's client for the running event loop."""
+        return self._async_clients.get()
+
+    def available(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+    def __repr__(self) -> str:
+        return f"Backend({self.url!r}, weight={self.weight})"
+
+
+class BackendPool:
+    """
+    Picks a backend per call and tracks health.
+
+    Counters:
+    - "requests": backend calls made (retries included)
+    - "sticky": calls routed by session affinity
+    - "failures" / "failovers": backend errors and retries on another backend
+    - "ejections" / "readmissions": backends taken out of / back into rotation
+    - "waits": calls that had to wait because every backend was at max_outstanding
+    """
+
+    def __init__(
+        self,
+        backends: Sequence[Backend],
+        eject_after: int = 3,
+        eject_seconds: float = 30.0,
+        max_sessions: int = 10_000,
+        max_outstanding: int = 0,
+    ):
+        if not backends:
+            raise ValueError("BackendPool needs at least one backend")
+        self.backends = list(backends)
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.max_sessions = max_sessions
+        self.max_outstanding = max_outstanding
+        self.counters: Counter = Counter()
+        self._sessions: "OrderedDict[str, Backend]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._capacity = threading.Condition(self._lock)
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._health_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Selection
+    # ------------------------------------------------------------------
+
+    def _least_loaded(self, candidates: Sequence[Backend]) -> Backend:
+        return min(
+            candidates,
+            key=lambda b: ((b.outstanding + 1) / b.weight, b.served / b.weight),
+        )
+
+    def _has_room(self, backend: Backend) -> bool:
+        return not self.max_outstanding or backend.outstanding < self.max_outstanding
+
+    def _select(self, session: Optional[str], exclude: Sequence[Backend]) -> Optional[Backend]:
+        """Pick and claim a backend (caller holds the lock); None if all are full."""
+        now = time.monotonic()
+        remaining = [b for b in self.backends if b not in exclude] or self.backends
+        candidates = [b for b in remaining if b.available(now)] or remaining
+        candidates = [b for b in candidates if self._has_room(b)]
+        if not candidates:
+            return None
+
+        backend = self._sessions.get(session) if session is not None else None
+        if backend is not None and backend in candidates:
+            self.counters["sticky"] += 1
+        else:
+            backend = self._least_loaded(candidates)
+
+        if session is not None:
+            self._sessions[session] = backend
+            self._sessions.move_to_end(session)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+        backend.outstanding += 1
+        backend.served += 1
+        self.counters["requests"] += 1
+        return backend
+
+    def acquire(self, session: Optional[str] = None, exclude: Sequence[Backend] = ()) -> Backend:
+        """
+        Choose a backend and count the call as outstanding on it.
+
+        When every backend is ejected, the pool still picks one rather than
+        failing without trying. When every backend is at max_outstanding,
+        this blocks until a call finishes.
+        """
+        with self._capacity:
+            backend = self._select(session, exclude)
+            if backend is None:
+                self.counters["waits"] += 1
+                while backend is None:
+                    self._capacity.wait()
+                    backend = self._select(session, exclude)
+            return backend
+
+    async def aacquire(
+        self, session: Optional[str] = None, exclude: Sequence[Backend] = ()
+    ) -> Backend:
+        """Async version of acquire(); waits without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        waited = False
+        while True:
+            with self._lock:
+                backend = self._select(session, exclude)
+                if backend is not None:
+                    return backend
+                if not waited:
+                    self.counters["waits"] += 1
+                    waited = True
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            await waiter
+
+    def release(self, backend: Backend, error: Optional[BaseException] = None) -> None:
+        """Finish a call, update the backend's health and wake waiting calls."""
+        with self._lock:
+            backend.outstanding -= 1
+            if error is None:
+                self._mark_healthy(backend)
+            elif is_backend_failure(error):
+                self.counters["failures"] += 1
+                backend.failures += 1
+                if backend.failures >= self.eject_after:
+                    self._eject(backend)
+            self._capacity.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+
+    def _mark_healthy(self, backend: Backend) -> None:
+        if backend.failures >= self.eject_after:
+            self.counters["readmissions"] += 1
+        backend.failures = 0
+        backend.ejected_until = 0.0
+
+    def _eject(self, backend: Backend) -> None:
+        if backend.available(time.monotonic()):
+            self.counters["ejections"] += 1
+        backend.failures = max(backend.failures, self.eject_after)
+        backend.ejected_until = time.monotonic() + self.eject_seconds
+
+    @contextmanager
+    def lease(self, session: Optional[str] = None) -> Iterator[Backend]:
+        """Hold a backend for the duration of a block (e.g. a stream)."""
+        backend = self.acquire(session)
+        try:
+            yield backend
+        except BaseException as exc:
+            self.release(backend, exc)
+            raise
+        self.release(backend)
+
+    @asynccontextmanager
+    async def alease(self, session: Optional[str] = None) -> AsyncIterator[Backend]:
+        """Async version of lease()."""
+        backend = await self.aacquire(session)
+        try:
+            yield backend
+        except BaseException as exc:
+            self.release(backend, exc)
+            raise
+        self.release(backend)
+
+    # ------------------------------------------------------------------
+    # Calls with failover
+    # ------------------------------------------------------------------
+
+    def call(self, fn: Callable[[Backend], T], session: Optional[str] = None) -> T:
+        """Run fn(backend), retrying on another backend after a backend failure."""
+        tried: List[Backend] = []
+        while True:
+            backend = self.acquire(session, exclude=tried)
+            try:
+                result = fn(backend)
+            except Exception as exc:
+                self.release(backend, exc)
+                tried.append(backend)
+                if not is_backend_failure(exc) or len(tried) >= len(self.backends):
+                    raise
+                self._add("failovers")
+                continue
+            self.release(backend)
+            return result
+
+    async def acall(
+        self, fn: Callable[[Backend], Awaitable[T]], session: Optional[str] = None
+    ) -> T:
+        """Async version of call()."""
+        tried: List[Backend] = []
+        while True:
+            backend = await self.aacquire(session, exclude=tried)
+            try:
+                result = await fn(backend)
+            except BaseException as exc:
+                self.release(backend, exc)
+                tried.append(backend)
+                if (
+                    not isinstance(exc, Exception)
+                    or not is_backend_failure(exc)
+                    or len(tried) >= len(self.backends)
+                ):
+                    raise
+                self._add("failovers")
+                continue
+            self.release(backend)
+            return result
+
+    def _add(self, key: str) -> None:
+        with self._lock:
+            self.counters[key] += 1
+
+    # ------------------------------------------------------------------
+    # Health checks
+    # ------------------------------------------------------------------
+
+    def check_health(self) -> Dict[str, bool]:
+        """Probe every backend once; eject failing ones, re-admit healthy ones."""
+        results = {}
+        for backend in self.backends:
+            try:
+                backend.client.list()
+                healthy = True
+            except Exception:
+                healthy = False
+            with self._lock:
+                if healthy:
+                    self._mark_healthy(backend)
+                else:
+                    self._eject(backend)
+            results[backend.url] = healthy
+        return results
+
+    def start_health_checks(self, interval: float) -> None:
+        """Run check_health() every ``interval`` seconds in a daemon thread."""
+        if self._health_thread is not None or interval <= 0:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.check_health()
+
+        self._health_thread = threading.Thread(target=loop, name="ollama-health", daemon=True)
+        self._health_thread.start()
+
+    def stop_health_checks(self) -> None:
+        self._stop.set()
+        if self._health_thread is not None:
+            self._health_thread.join(timeout=1)
+            self._health_thread = None
+        self._stop.clear()
+
+    def stats(self) -> Dict[str, object]:
+        """Counters plus per-backend load and health."""
+        now = time.monotonic()
+        with self._lock:
+            snapshot: Dict[str, object] = dict(self.counters)
+            snapshot["sessions"] = len(self._sessions)
+            snapshot["waiting"] = len(self._async_waiters)
+            snapshot["backends"] = {
+                b.url: {
+                    "weight": b.weight,
+                    "outstanding": b.outstanding,
+                    "served": b.served,
+                    "healthy": b.available(now),
+                }
+                for b in self.backends
+            }
+        return snapshot
@@ -16,6 +16,103 @@ class Config:
     # LLM Settings
     OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "mistral")
     OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # keep model + KV cache loaded
+    
+    # LLM Client Settings (shared HTTP pool; size it for batch + speculation concurrency)
+    OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "16"))
+    OLLAMA_MAX_KEEPALIVE = int(os.getenv("OLLAMA_MAX_KEEPALIVE", "16"))
+    OLLAMA_KEEPALIVE_EXPIRY = float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY", "60"))
+    OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+    OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "120"))  # per call
+    OLLAMA_POOL_TIMEOUT = float(os.getenv("OLLAMA_POOL_TIMEOUT", "30"))
+    
+    # LLM Backends (load balancing; "http://gpu1:11434=2,http://gpu2:11434", empty = OLLAMA_BASE_URL)
+    OLLAMA_BACKENDS = os.getenv("OLLAMA_BACKENDS", "")
+    OLLAMA_EJECT_AFTER = int(os.getenv("OLLAMA_EJECT_AFTER", "3"))  # consecutive failures
+    OLLAMA_EJECT_SECONDS = float(os.getenv("OLLAMA_EJECT_SECONDS", "30"))
+    OLLAMA_HEALTH_INTERVAL = float(os.getenv("OLLAMA_HEALTH_INTERVAL", "15"))  # 0 disables
+    OLLAMA_MAX_OUTSTANDING = int(os.getenv("OLLAMA_MAX_OUTSTANDING", "0"))  # per backend; 0 = no cap
+    
+    # Model Profiles (per-node model/options; JSON file of named sets, see utils/profiles.py)
+    MODEL_PROFILE = os.getenv("MODEL_PROFILE", "default")
+    MODEL_PROFILES_PATH = os.getenv("MODEL_PROFILES_PATH", "")
+    NODE_MODELS = os.getenv("NODE_MODELS", "")  # "router=qwen2.5:0.5b,summarizer=llama3.2:1b"
+    
+    # Routing Settings
+    FAST_ROUTER_ENABLED = os.getenv("FAST_ROUTER_ENABLED", "true").lower() == "true"
+    
+    # LLM Cache Settings (only calls at or below the temperature are cached)
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true"
+    LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite3")
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+    LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+    LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.2"))
+    
+    # Search Cache Settings (memory LRU over an optional SQLite tier)
+    SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "false").lower() == "true"
+    SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", ".cache/search_cache.sqlite3")
+    SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024"))
+    SEARCH_CACHE_MAX_DISK_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_DISK_ENTRIES", "100000"))
+    SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "300"))
+    SEARCH_CACHE_STALE_SECONDS = float(os.getenv("SEARCH_CACHE_STALE_SECONDS", "3600"))
+    
+    # Semantic Answer Cache (near-duplicate questions skip the multi-tool graph)
+    SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+    SEMANTIC_CACHE_TOOLS = os.getenv("SEMANTIC_CACHE_TOOLS", "direct,calculator,search")
+    SEMANTIC_CACHE_TTLS = os.getenv("SEMANTIC_CACHE_TTLS", "search=300")  # seconds per tool
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "100000"))
+    SEMANTIC_CACHE_DIM = int(os.getenv("SEMANTIC_CACHE_DIM", "256"))
+    SEMANTIC_CACHE_AUDIT_PATH = os.getenv("SEMANTIC_CACHE_AUDIT_PATH", ".cache/semantic_cache_audit.jsonl")
+    SEMANTIC_CACHE_AUDIT_RATE = float(os.getenv("SEMANTIC_CACHE_AUDIT_RATE", "0.01"))
+    
+    # Request Coalescing (identical concurrent agent runs, searches and LLM calls run once)
+    COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "false").lower() == "true"
+    
+    # Synthesis Settings (per-tool strategy: template, extractive, llm, llm_capped)
+    SYNTHESIS_STRATEGIES = os.getenv("SYNTHESIS_STRATEGIES", "calculator=template,search=llm")
+    SYNTHESIS_MAX_TOKENS = int(os.getenv("SYNTHESIS_MAX_TOKENS", "120"))
+    SYNTHESIS_MAX_INPUT_CHARS = int(os.getenv("SYNTHESIS_MAX_INPUT_CHARS", "1500"))
+    
+    # Conversation Memory Settings ("rolling" summary + window, "full" transcript, or "vector")
+    MEMORY_MODE = os.getenv("MEMORY_MODE", "rolling")
+    MEMORY_WINDOW_TURNS = int(os.getenv("MEMORY_WINDOW_TURNS", "4"))
+    
+    # Vector Memory Settings (MEMORY_MODE=vector; empty path keeps indexes in memory)
+    MEMORY_TOP_K = int(os.getenv("MEMORY_TOP_K", "3"))
+    VECTOR_MEMORY_PATH = os.getenv("VECTOR_MEMORY_PATH", ".cache/vector_memory")
+    VECTOR_MEMORY_EMBEDDER = os.getenv("VECTOR_MEMORY_EMBEDDER", "hashing")  # or "ollama"
+    VECTOR_MEMORY_EMBED_MODEL = os.getenv("VECTOR_MEMORY_EMBED_MODEL", "nomic-embed-text")
+    VECTOR_MEMORY_APPROX_THRESHOLD = int(os.getenv("VECTOR_MEMORY_APPROX_THRESHOLD", "5000"))
+    
+    # Session Store Settings (durable append-only conversation history)
+    SESSION_STORE_ENABLED = os.getenv("SESSION_STORE_ENABLED", "false").lower() == "true"
+    SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", ".cache/sessions.sqlite3")
+    
+    # Speculative Execution (run the likely tool branch alongside the LLM router)
+    SPECULATION_ENABLED = os.getenv("SPECULATION_ENABLED", "false").lower() == "true"
+    SPECULATION_MAX_INFLIGHT = int(os.getenv("SPECULATION_MAX_INFLIGHT", "4"))
+    SPECULATION_TOOLS = os.getenv("SPECULATION_TOOLS", "search,calculator")
+    
+    # KV Context Reuse (shared prompt prefixes; raw mode with each model's instruction wrapper)
+    CONTEXT_REUSE_ENABLED = os.getenv("CONTEXT_REUSE_ENABLED", "false").lower() == "true"
+    CONTEXT_REUSE_MAX_ENTRIES = int(os.getenv("CONTEXT_REUSE_MAX_ENTRIES", "256"))
+    RAW_PROMPT_FORMATS = os.getenv("RAW_PROMPT_FORMATS", "")  # JSON {"model prefix": "... {prompt} ..."}
+    
+    # Prompt Token Budgets (answer prompt; per-model overrides "mistral=6000,llama3=7000")
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1536"))
+    CONTEXT_TOKEN_BUDGETS = os.getenv("CONTEXT_TOKEN_BUDGETS", "")
+    
+    # API Server (api/server.py; requests beyond concurrency + queue get 429)
+    API_HOST = os.getenv("API_HOST", "127.0.0.1")
+    API_PORT = int(os.getenv("API_PORT", "8000"))
+    API_MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "16"))
+    API_MAX_QUEUE = int(os.getenv("API_MAX_QUEUE", "64"))
+    API_REQUEST_TIMEOUT = float(os.getenv("API_REQUEST_TIMEOUT", "120"))
+    
+    # Metrics Settings (per-node timing; empty spans path = no span file)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_SPANS_PATH = os.getenv("METRICS_SPANS_PATH", "")
     
     # Application Settings
     DEBUG = os.getenv("DEBUG", "false").lower() == "true"
@@ -38,8 +135,8 @@ class Config:
         """Check if Ollama is running"""
         try:
             import ollama
-            # Try to list models
-            ollama.list()
+            # Try to list models on the configured server
+            ollama.Client(host=cls.OLLAMA_BASE_URL, timeout=cls.OLLAMA_CONNECT_TIMEOUT).list()
             return True
         except Exception:
             return False
@@ -65,9 +162,10 @@ def validate_environment():
     # Check Ollama
     if not Config.check_ollama():
         print("\n❌ Ollama Error:")
-        print("   Ollama is not running or Mistral is not installed\n")
+        print(f"   Ollama is not reachable at {Config.OLLAMA_BASE_URL} "
+              f"or {Config.OLLAMA_MODEL} is not installed\n")
         print("Please run:")
-        print("   ollama pull mistral")
+        print(f"   ollama pull {Config.OLLAMA_MODEL}")
         print("   ollama serve  (if not running)\n")
         raise RuntimeError("Ollama not available")
     
@@ -0,0 +1,206 @@
+"""
+KV-context reuse for shared prompt prefixes.
+
+Ollama returns a ``context`` token array with every completion and accepts
+it back on the next call; paired with ``keep_alive`` (model stays loaded)
+the runner only has to prefill tokens it hasn't seen. This module keeps one
+context per key:
+
+- ``template:<name>`` for static prompt prefixes (router instructions, ...)
+- ``session:<id>`` for a conversation's growing transcript
+
+Calls go out in raw mode so the tokens we send are exactly the tokens that
+were cached. The model's instruction wrapper is applied here, e.g. for
+Mistral ``[INST] <prefix>`` is the cached part and ``<suffix> [/INST]`` is
+the only part prefilled per request. Wrappers are looked up per model
+(``DEFAULT_RAW_FORMATS`` plus ``RAW_PROMPT_FORMATS`` overrides, matched on
+the longest model-name prefix); a model without one is called normally,
+through its own template, and never reuses context.
+
+Invalidation rules:
+- an entry is used only if its text is a prefix of the new prefix
+  (same model); otherwise it is dropped and the prefix is re-primed
+- a grown prefix (e.g. a transcript with one more turn) extends the cached
+  context with just the new text
+- entries are LRU-bounded by ``max_entries``
+"""
+import json
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from utils.config import Config
+
+# Single-turn instruction wrappers, keyed by model-name prefix
+DEFAULT_RAW_FORMATS: Dict[str, str] = {
+    "mistral": "[INST] {prompt} [/INST]",
+    "mixtral": "[INST] {prompt} [/INST]",
+    "llama3": (
+        "<|start_header_id|>user<|end_header_id|>\n\n{prompt}<|eot_id|>"
+        "<|start_header_id|>assistant<|end_header_id|>\n\n"
+    ),
+    "qwen2": "<|im_start|>user\n{prompt}<|im_end|>\n<|im_start|>assistant\n",
+    "gemma": "<start_of_turn>user\n{prompt}<end_of_turn>\n<start_of_turn>model\n",
+    "phi3": "<|user|>\n{prompt}<|end|>\n<|assistant|>\n",
+}
+
+
+def parse_raw_formats(spec: str) -> Dict[str, str]:
+    """
+    Parse RAW_PROMPT_FORMATS, a JSON object of model prefix -> wrapper.
+
+    Every wrapper must contain "{prompt}"; an empty string maps to no
+    wrapper, which turns reuse off for that model.
+    """
+    if not spec.strip():
+        return {}
+    formats = json.loads(spec)
+    if not isinstance(formats, dict):
+        raise ValueError("RAW_PROMPT_FORMATS must be a JSON object")
+    for model, raw_format in formats.items():
+        if raw_format and "{prompt}" not in raw_format:
+            raise ValueError(f"Raw prompt format for {model!r} has no {{prompt}}")
+    return formats
+
+
+class ContextReuse:
+    """
+    Per-key cache of Ollama context arrays for prompt prefixes.
+
+    Counters:
+    - "hits": prefix unchanged, cached context reused as-is
+    - "extends": cached context extended with the new part of the prefix
+    - "primes": prefix prefilled from scratch (first use or invalidated)
+    - "invalidations": entries dropped because the prefix diverged
+    - "unsupported": calls skipped because the model has no raw format
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        raw_formats: Optional[Mapping[str, str]] = None,
+    ):
+        self.max_entries = max_entries
+        self.raw_formats = dict(DEFAULT_RAW_FORMATS if raw_formats is None else raw_formats)
+        self.counters: Counter = Counter()
+        self._entries: "OrderedDict[str, Tuple[str, str, List[int]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def raw_format(self, model: str) -> Optional[str]:
+        """The model's wrapper (longest matching name prefix), or None."""
+        name = model.lower()
+        matches = [key for key in self.raw_formats if name.startswith(key.lower())]
+        if not matches:
+            return None
+        return self.raw_formats[max(matches, key=len)] or None
+
+    def split(self, prompt: str, prefix: str, model: str) -> Optional[Tuple[str, str]]:
+        """
+        Raw (head, tail) for a prompt: head is cacheable, tail is per request.
+
+        Returns None if the prompt doesn't start with the prefix or the model
+        has no raw format.
+        """
+        if not prefix or not prompt.startswith(prefix):
+            return None
+        raw_format = self.raw_format(model)
+        if raw_format is None:
+            with self._lock:
+                self.counters["unsupported"] += 1
+            return None
+        open_, _, close = raw_format.partition("{prompt}")
+        return open_ + prefix, prompt[len(prefix):] + close
+
+    def lookup(self, key: str, model: str, head: str) -> Tuple[Optional[List[int]], str]:
+        """
+        Cached context for a prefix.
+
+        Returns:
+            (context, remainder): the context to send and the part of head
+            it doesn't cover yet. (None, head) when nothing usable is cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                cached_model, text, context = entry
+                if cached_model == model and head.startswith(text):
+                    self._entries.move_to_end(key)
+                    remainder = head[len(text):]
+                    self.counters["extends" if remainder else "hits"] += 1
+                    return context, remainder
+                del self._entries[key]
+                self.counters["invalidations"] += 1
+            self.counters["primes"] += 1
+        return None, head
+
+    def store(self, key: str, model: str, head: str, response) -> List[int]:
+        """
+        Remember the context covering ``head`` from a priming response.
+
+        The response context also holds the tokens the model generated;
+        those (``eval_count`` of them) are trimmed off.
+        """
+        context = list(response.get("context") or [])
+        generated = response.get("eval_count") or 0
+        if generated:
+            context = context[:-generated]
+        with self._lock:
+            self._entries[key] = (model, head, context)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return context
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Drop one entry, or everything (e.g. after a model change)."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            snapshot = dict(self.counters)
+            snapshot["entries"] = len(self._entries)
+        lookups = sum(snapshot.get(k, 0) for k in ("hits", "extends", "primes"))
+        reused = snapshot.get("hits", 0) + snapshot.get("extends", 0)
+        snapshot["reuse_rate"] = reused / lookups if lookups else 0.0
+        return snapshot
+
+
+def priming_options(options: Optional[dict]) -> dict:
+    """Options for a priming call: same sampling, one token of output."""
+    return {**(options or {}), "num_predict": 1}
+
+
+_UNSET = object()
+_context_reuse = _UNSET
+
+
+def get_context_reuse() -> Optional[ContextReuse]:
+    """
+    Return the shared ContextReuse, creating it from Config on first use.
+
+    Returns None when CONTEXT_REUSE_ENABLED is false.
+    """
+    global _context_reuse
+    if _context_reuse is _UNSET:
+        _context_reuse = (
+            ContextReuse(
+                max_entries=Config.CONTEXT_REUSE_MAX_ENTRIES,
+                raw_formats={
+                    **DEFAULT_RAW_FORMATS,
+                    **parse_raw_formats(Config.RAW_PROMPT_FORMATS),
+                },
+            )
+            if Config.CONTEXT_REUSE_ENABLED
+            else None
+        )
+    return _context_reuse
+
+
+def set_context_reuse(reuse: Optional[ContextReuse]) -> None:
+    """Install a ContextReuse, or None to disable."""
+    global _context_reuse
+    _context_reuse = reuse
@@ -0,0 +1,546 @@
+"""
+LLM call layer shared by all agent nodes.
+
+Every node goes through the shared ``ollama.Client`` / ``ollama.AsyncClient``
+returned by get_client() / get_async_client(): one keep-alive connection
+pool per process (per event loop for the async client), pointed at
+``OLLAMA_BASE_URL``, with connect/read/pool timeouts from Config. With
+``OLLAMA_BACKENDS`` set, calls are instead spread over several servers by
+utils/backends.py (least outstanding, weighted, sticky per session, with
+ejection and failover). On top of the client this
+layer adds:
+- an optional response cache for low-temperature (near-deterministic) calls
+- optional KV-context reuse for shared prompt prefixes (utils/context_reuse.py)
+- ``keep_alive`` on every call, so the model and its KV cache stay loaded
+- prefill accounting (``prefill_stats()``) from Ollama's prompt_eval fields
+- per-node token and duration metrics for the calling node (utils/metrics.py)
+- optional single-flight coalescing: concurrent calls with the same model,
+  prompt and options share one request (utils/single_flight.py)
+"""
+import json
+import threading
+from collections import Counter
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+import httpx
+import ollama
+
+from utils.backends import Backend, BackendPool, parse_backends
+from utils.config import Config
+from utils.context_reuse import get_context_reuse, priming_options
+from utils.llm_cache import LLMCache
+from utils.loop_local import LoopLocal
+from utils.metrics import record_cache, record_llm
+from utils.single_flight import SingleFlight
+
+_UNSET = object()
+_llm_cache = _UNSET
+_client: Optional[ollama.Client] = None
+_async_client: Optional[ollama.AsyncClient] = None  # installed with set_async_client()
+_backend_pool = _UNSET
+_flight = _UNSET
+_client_lock = threading.Lock()
+
+_prefill: Counter = Counter()
+_prefill_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """
+    Return the active LLM cache, creating it from Config on first use.
+
+    Returns None when caching is disabled.
+    """
+    global _llm_cache
+    if _llm_cache is _UNSET:
+        _llm_cache = (
+            LLMCache(
+                path=Config.LLM_CACHE_PATH,
+                max_entries=Config.LLM_CACHE_MAX_ENTRIES,
+                ttl_seconds=Config.LLM_CACHE_TTL_SECONDS,
+                max_temperature=Config.LLM_CACHE_MAX_TEMPERATURE,
+            )
+            if Config.LLM_CACHE_ENABLED
+            else None
+        )
+    return _llm_cache
+
+
+def set_llm_cache(cache: Optional[LLMCache]) -> None:
+    """
+    Install a cache (any object with LLMCache's interface), or None to disable.
+    """
+    global _llm_cache
+    _llm_cache = cache
+
+
+def get_llm_flight() -> Optional[SingleFlight]:
+    """
+    Return the SingleFlight that coalesces identical concurrent calls.
+
+    Returns None when COALESCE_ENABLED is false.
+    """
+    global _flight
+    if _flight is _UNSET:
+        _flight = SingleFlight() if Config.COALESCE_ENABLED else None
+    return _flight
+
+
+def set_llm_flight(flight: Optional[SingleFlight]) -> None:
+    """Install a SingleFlight, or None to disable coalescing."""
+    global _flight
+    _flight = flight
+
+
+def _request_key(model: str, prompt: str, options: Optional[dict]) -> tuple:
+    """
+    What makes two calls interchangeable. The session and reuse key only
+    pick a backend and a KV context, so they are left out. Callers that
+    want independent samples of one prompt should pass distinct seeds.
+    """
+    return (model, prompt, json.dumps(options or {}, sort_keys=True, default=str))
+
+
+def _coalesce(model: str, prompt: str, options: Optional[dict], fn):
+    flight = get_llm_flight()
+    if flight is None:
+        return fn()
+    return flight.do(_request_key(model, prompt, options), fn)
+
+
+async def _acoalesce(model: str, prompt: str, options: Optional[dict], fn):
+    flight = get_llm_flight()
+    if flight is None:
+        return await fn()
+    return await flight.ado(_request_key(model, prompt, options), fn)
+
+
+def _client_options() -> dict:
+    """httpx settings shared by the sync and async clients."""
+    return {
+        "timeout": httpx.Timeout(
+            Config.OLLAMA_READ_TIMEOUT,
+            connect=Config.OLLAMA_CONNECT_TIMEOUT,
+            pool=Config.OLLAMA_POOL_TIMEOUT,
+        ),
+        "limits": httpx.Limits(
+            max_connections=Config.OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.OLLAMA_MAX_KEEPALIVE,
+            keepalive_expiry=Config.OLLAMA_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+def get_client() -> ollama.Client:
+    """
+    Shared sync client, created from Config on first use.
+
+    The underlying httpx pool is thread-safe, so batch workers and
+    speculative branches all share its keep-alive connections.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ollama.Client(host=Config.OLLAMA_BASE_URL, **_client_options())
+    return _client
+
+
+def set_client(client: Optional[ollama.Client]) -> None:
+    """
+    Install a client (anything with ``generate``/``embed``), or None to
+    rebuild it from Config on next use.
+    """
+    global _client
+    _client = client
+
+
+def get_backend_pool() -> Optional[BackendPool]:
+    """
+    Pool over Config.OLLAMA_BACKENDS, created on first use.
+
+    With only OLLAMA_MAX_OUTSTANDING set, the pool holds just
+    OLLAMA_BASE_URL so the per-backend cap still applies. Returns None when
+    neither is set (calls use get_client()).
+    """
+    global _backend_pool
+    if _backend_pool is _UNSET:
+        with _client_lock:
+            if _backend_pool is _UNSET:
+                backends = parse_backends(Config.OLLAMA_BACKENDS)
+                if not backends and Config.OLLAMA_MAX_OUTSTANDING > 0:
+                    backends = [(Config.OLLAMA_BASE_URL, 1.0)]
+                pool = None
+                if backends:
+                    options = _client_options()
+                    pool = BackendPool(
+                        [Backend(url, weight, options) for url, weight in backends],
+                        eject_after=Config.OLLAMA_EJECT_AFTER,
+                        eject_seconds=Config.OLLAMA_EJECT_SECONDS,
+                        max_outstanding=Config.OLLAMA_MAX_OUTSTANDING,
+                    )
+                    pool.start_health_checks(Config.OLLAMA_HEALTH_INTERVAL)
+                _backend_pool = pool
+    return _backend_pool
+
+
+def set_backend_pool(pool: Optional[BackendPool]) -> None:
+    """Install a BackendPool, or None to send every call to get_client()."""
+    global _backend_pool
+    _backend_pool = pool
+
+
+def _backend_key(reuse_key: Optional[str], backend: Backend) -> Optional[str]:
+    """A KV context is only valid on the server that built it."""
+    return f"{reuse_key}@{backend.url}" if reuse_key else None
+
+
+def embed(model: str, texts: List[str]):
+    """Embeddings from the shared client or the backend pool."""
+    pool = get_backend_pool()
+    if pool is None:
+        return get_client().embed(model=model, input=texts)
+    return pool.call(lambda backend: backend.client.embed(model=model, input=texts))
+
+
+def _keep_alive(kwargs: dict) -> dict:
+    if Config.OLLAMA_KEEP_ALIVE and "keep_alive" not in kwargs:
+        return {**kwargs, "keep_alive": Config.OLLAMA_KEEP_ALIVE}
+    return kwargs
+
+
+def _record_prefill(response, kind: str = "request") -> None:
+    """Accumulate Ollama's prompt_eval_count / prompt_eval_duration (ns)."""
+    tokens = response.get("prompt_eval_count") or 0
+    duration = response.get("prompt_eval_duration") or 0
+    with _prefill_lock:
+        _prefill[f"{kind}_calls"] += 1
+        _prefill[f"{kind}_tokens"] += tokens
+        _prefill[f"{kind}_ms"] += duration / 1e6
+
+
+def prefill_stats() -> Dict[str, float]:
+    """
+    Prefill totals since start (or the last reset).
+
+    "request_*" covers the answering calls; "prime_*" covers the extra calls
+    that fill a prefix context for reuse.
+    """
+    with _prefill_lock:
+        snapshot = dict(_prefill)
+    calls = snapshot.get("request_calls", 0)
+    if calls:
+        snapshot["request_ms_avg"] = snapshot.get("request_ms", 0) / calls
+        snapshot["request_tokens_avg"] = snapshot.get("request_tokens", 0) / calls
+    return snapshot
+
+
+def reset_prefill_stats() -> None:
+    with _prefill_lock:
+        _prefill.clear()
+
+
+def _generate_reusing_prefix(
+    client, model: str, prompt: str, options: Optional[dict], reuse_key: str, prefix: str,
+    **kwargs,
+):
+    reuse = get_context_reuse()
+    split = reuse.split(prompt, prefix, model) if reuse else None
+    if split is None:
+        return None
+    head, tail = split
+
+    context, remainder = reuse.lookup(reuse_key, model, head)
+    if context is None or remainder:
+        primed = client.generate(
+            model=model, prompt=remainder, context=context, raw=True,
+            options=priming_options(options), **kwargs,
+        )
+        _record_prefill(primed, "prime")
+        context = reuse.store(reuse_key, model, head, primed)
+
+    return client.generate(
+        model=model, prompt=tail, context=context, raw=True, options=options, **kwargs
+    )
+
+
+def _generate_on(
+    client, model: str, prompt: str, options: Optional[dict], reuse_key, prefix, **kwargs
+):
+    response = None
+    if reuse_key and prefix:
+        response = _generate_reusing_prefix(
+            client, model, prompt, options, reuse_key, prefix, **kwargs
+        )
+    if response is None:
+        response = client.generate(model=model, prompt=prompt, options=options, **kwargs)
+    return response
+
+
+def _call(model: str, prompt: str, options: Optional[dict], reuse_key, prefix, session, **kwargs):
+    kwargs = _keep_alive(kwargs)
+    pool = get_backend_pool()
+    if pool is None:
+        response = _generate_on(get_client(), model, prompt, options, reuse_key, prefix, **kwargs)
+    else:
+        response = pool.call(
+            lambda backend: _generate_on(
+                backend.client, model, prompt, options,
+                _backend_key(reuse_key, backend), prefix, **kwargs,
+            ),
+            session=session,
+        )
+    _record_prefill(response)
+    record_llm(response)
+    return response
+
+
+def generate(
+    model: str,
+    prompt: str,
+    options: Optional[dict] = None,
+    reuse_key: Optional[str] = None,
+    prefix: Optional[str] = None,
+    session: Optional[str] = None,
+    **kwargs,
+):
+    """
+    Drop-in replacement for ``ollama.generate`` on the shared client, with
+    response caching.
+
+    Args:
+        model: Ollama model name
+        prompt: Full prompt text
+        options: Ollama sampling options (temperature, num_predict, ...)
+        reuse_key: Context-reuse key ("template:router", "session:<id>")
+        prefix: Leading part of ``prompt`` whose KV context can be reused
+        session: Session id; with several backends, keeps the session on one
+        **kwargs: Extra arguments forwarded to Client.generate
+
+    Returns:
+        Response mapping with at least a 'response' key
+    """
+    cache = get_llm_cache()
+
+    # Streaming and other special calls are never cached or coalesced
+    if kwargs:
+        return _call(model, prompt, options, reuse_key, prefix, session, **kwargs)
+
+    if cache is None or not cache.is_cacheable(options):
+        return _coalesce(
+            model, prompt, options,
+            lambda: _call(model, prompt, options, reuse_key, prefix, session),
+        )
+
+    key = cache.make_key(model, prompt, options)
+    cached = cache.get(key)
+    record_cache("llm", "miss" if cached is None else "hit")
+    if cached is not None:
+        return cached
+
+    def fetch():
+        response = _call(model, prompt, options, reuse_key, prefix, session)
+        cache.set(key, {"response": response["response"]})
+        return response
+
+    return _coalesce(model, prompt, options, fetch)
+
+
+def _new_async_client() -> ollama.AsyncClient:
+    return ollama.AsyncClient(host=Config.OLLAMA_BASE_URL, **_client_options())
+
+
+_loop_clients = LoopLocal(_new_async_client)
+
+
+def get_async_client() -> ollama.AsyncClient:
+    """
+    Shared AsyncClient for the running event loop.
+
+    Its connection pool is bound to a loop, so each loop gets its own
+    client (utils/loop_local.py). A client installed with
+    set_async_client() is used on every loop.
+    """
+    if _async_client is not None:
+        return _async_client
+    return _loop_clients.get()
+
+
+def set_async_client(client: Optional[ollama.AsyncClient]) -> None:
+    """Install an async client, or None to rebuild it from Config on next use."""
+    global _async_client, _loop_clients
+    _async_client = client
+    _loop_clients = LoopLocal(_new_async_client)
+
+
+def stream_generate(
+    model: str,
+    prompt: str,
+    options: Optional[dict] = None,
+    reuse_key: Optional[str] = None,
+    prefix: Optional[str] = None,
+    session: Optional[str] = None,
+    **kwargs,
+) -> Iterator[str]:
+    """
+    Stream a completion token chunk by token chunk (never cached, no reuse).
+
+    Yields:
+        Text fragments as Ollama produces them
+    """
+    kwargs = _keep_alive(kwargs)
+    pool = get_backend_pool()
+    if pool is None:
+        stream = get_client().generate(
+            model=model, prompt=prompt, options=options, stream=True, **kwargs
+        )
+        for chunk in stream:
+            if chunk["response"]:
+                yield chunk["response"]
+            if chunk.get("done"):
+                record_llm(chunk)
+        return
+
+    with pool.lease(session) as backend:
+        stream = backend.client.generate(
+            model=model, prompt=prompt, options=options, stream=True, **kwargs
+        )
+        for chunk in stream:
+            if chunk["response"]:
+                yield chunk["response"]
+            if chunk.get("done"):
+                record_llm(chunk)
+
+
+async def _agenerate_reusing_prefix(
+    client, model: str, prompt: str, options: Optional[dict], reuse_key: str, prefix: str,
+    **kwargs,
+):
+    reuse = get_context_reuse()
+    split = reuse.split(prompt, prefix, model) if reuse else None
+    if split is None:
+        return None
+    head, tail = split
+
+    context, remainder = reuse.lookup(reuse_key, model, head)
+    if context is None or remainder:
+        primed = await client.generate(
+            model=model, prompt=remainder, context=context, raw=True,
+            options=priming_options(options), **kwargs,
+        )
+        _record_prefill(primed, "prime")
+        context = reuse.store(reuse_key, model, head, primed)
+
+    return await client.generate(
+        model=model, prompt=tail, context=context, raw=True, options=options, **kwargs
+    )
+
+
+async def _agenerate_on(
+    client, model: str, prompt: str, options: Optional[dict], reuse_key, prefix, **kwargs
+):
+    response = None
+    if reuse_key and prefix:
+        response = await _agenerate_reusing_prefix(
+            client, model, prompt, options, reuse_key, prefix, **kwargs
+        )
+    if response is None:
+        response = await client.generate(model=model, prompt=prompt, options=options, **kwargs)
+    return response
+
+
+async def _acall(
+    model: str, prompt: str, options: Optional[dict], reuse_key, prefix, session, **kwargs
+):
+    kwargs = _keep_alive(kwargs)
+    pool = get_backend_pool()
+    if pool is None:
+        response = await _agenerate_on(
+            get_async_client(), model, prompt, options, reuse_key, prefix, **kwargs
+        )
+    else:
+        response = await pool.acall(
+            lambda backend: _agenerate_on(
+                backend.async_client, model, prompt, options,
+                _backend_key(reuse_key, backend), prefix, **kwargs,
+            ),
+            session=session,
+        )
+    _record_prefill(response)
+    record_llm(response)
+    return response
+
+
+async def agenerate(
+    model: str,
+    prompt: str,
+    options: Optional[dict] = None,
+    reuse_key: Optional[str] = None,
+    prefix: Optional[str] = None,
+    session: Optional[str] = None,
+    **kwargs,
+):
+    """
+    Async version of generate() backed by ``ollama.AsyncClient``.
+
+    Shares the same cache, context reuse and coalescing as the sync path.
+    """
+    cache = get_llm_cache()
+
+    if kwargs:
+        return await _acall(model, prompt, options, reuse_key, prefix, session, **kwargs)
+
+    if cache is None or not cache.is_cacheable(options):
+        return await _acoalesce(
+            model, prompt, options,
+            lambda: _acall(model, prompt, options, reuse_key, prefix, session),
+        )
+
+    key = cache.make_key(model, prompt, options)
+    cached = cache.get(key)
+    record_cache("llm", "miss" if cached is None else "hit")
+    if cached is not None:
+        return cached
+
+    async def fetch():
+        response = await _acall(model, prompt, options, reuse_key, prefix, session)
+        cache.set(key, {"response": response["response"]})
+        return response
+
+    return await _acoalesce(model, prompt, options, fetch)
+
+
+async def astream_generate(
+    model: str,
+    prompt: str,
+    options: Optional[dict] = None,
+    reuse_key: Optional[str] = None,
+    prefix: Optional[str] = None,
+    session: Optional[str] = None,
+    **kwargs,
+) -> AsyncIterator[str]:
+    """
+    Async version of stream_generate().
+    """
+    kwargs = _keep_alive(kwargs)
+    pool = get_backend_pool()
+    if pool is None:
+        stream = await get_async_client().generate(
+            model=model, prompt=prompt, options=options, stream=True, **kwargs
+        )
+        async for chunk in stream:
+            if chunk["response"]:
+                yield chunk["response"]
+            if chunk.get("done"):
+                record_llm(chunk)
+        return
+
+    async with pool.alease(session) as backend:
+        stream = await backend.async_client.generate(
+            model=model, prompt=prompt, options=options, stream=True, **kwargs
+        )
+        async for chunk in stream:
+            if chunk["response"]:
+                yield chunk["response"]
+            if chunk.get("done"):
+                record_llm(chunk)
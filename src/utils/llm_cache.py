@@ -0,0 +1,171 @@
+"""
+Content-addressed cache for deterministic LLM calls.
+
+Entries are keyed on a hash of (model, prompt, options) and stored in SQLite,
+so repeated low-temperature prompts (routing, expression extraction, memory
+summaries) can skip the model entirely. Eviction is LRU bounded by
+``max_entries`` plus a per-entry TTL.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+# Ollama's default sampling temperature when the caller doesn't set one
+DEFAULT_OLLAMA_TEMPERATURE = 0.8
+
+
+class LLMCache:
+    """
+    SQLite-backed LRU/TTL cache for LLM responses.
+
+    Only calls whose temperature is at or below ``max_temperature`` are
+    cached; anything more creative is passed straight through.
+
+    Counters:
+    - "hits" / "misses": lookups on cacheable calls
+    - "bypassed": calls skipped because of their temperature
+    - "evictions" / "expired": entries dropped by LRU size or TTL
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        max_entries: int = 10_000,
+        ttl_seconds: Optional[float] = 24 * 3600,
+        max_temperature: float = 0.2,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_temperature = max_temperature
+        self.counters: Counter = Counter()
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS llm_cache_lru ON llm_cache(last_access)"
+        )
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, prompt: str, options: Optional[dict] = None) -> str:
+        """Content address for a call: sha256 over canonical JSON."""
+        payload = json.dumps(
+            {"model": model, "prompt": prompt, "options": options or {}},
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def is_cacheable(self, options: Optional[dict] = None) -> bool:
+        """Whether a call with these options is deterministic enough to cache."""
+        temperature = (options or {}).get("temperature", DEFAULT_OLLAMA_TEMPERATURE)
+        cacheable = temperature <= self.max_temperature
+        if not cacheable:
+            with self._lock:
+                self.counters["bypassed"] += 1
+        return cacheable
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Key from make_key()
+
+        Returns:
+            Cached response dict, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+
+            response, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self._size -= 1
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.counters["hits"] += 1
+
+        return json.loads(response)
+
+    def set(self, key: str, response: dict) -> None:
+        """Store a response, evicting least-recently-used entries if full."""
+        now = time.time()
+        with self._lock:
+            existed = self._conn.execute(
+                "SELECT 1 FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, created_at, last_access)"
+                " VALUES (?, ?, ?, ?)",
+                (key, json.dumps(response), now, now),
+            )
+            if not existed:
+                self._size += 1
+
+            overflow = self._size - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN ("
+                    " SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self._size -= overflow
+                self.counters["evictions"] += overflow
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+            self._size = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Snapshot of the counters plus current size and hit rate."""
+        with self._lock:
+            snapshot = dict(self.counters)
+            snapshot["size"] = self._size
+        lookups = snapshot.get("hits", 0) + snapshot.get("misses", 0)
+        snapshot["hit_rate"] = snapshot.get("hits", 0) / lookups if lookups else 0.0
+        return snapshot
+
+    def __len__(self) -> int:
+        return self._size
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
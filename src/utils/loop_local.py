@@ -0,0 +1,45 @@
+"""
+Per-event-loop instances of async clients.
+
+httpx's async connection pool (used by ``ollama.AsyncClient`` and
+``AsyncTavilyClient``) is bound to the event loop that first used it. A
+client cached process-wide therefore breaks as soon as a second loop uses
+it, e.g. the second ``batch()`` call, which runs its own ``asyncio.run``:
+"RuntimeError: Event loop is closed". LoopLocal builds one instance per
+running loop and forgets the instances of loops that have been closed.
+"""
+import asyncio
+import threading
+from typing import Callable, Dict, Generic, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class LoopLocal(Generic[T]):
+    """
+    Lazily built value, one per running event loop.
+
+    Args:
+        factory: Builds the value for a loop (called inside that loop)
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self.factory = factory
+        self._values: Dict[int, Tuple[asyncio.AbstractEventLoop, T]] = {}
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        """The running loop's value; must be called from a coroutine."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._values.get(id(loop))
+            if entry is None or entry[0] is not loop:
+                # A new loop (possibly reusing a dead loop's id): drop closed ones
+                for key in [k for k, (l, _) in self._values.items() if l.is_closed()]:
+                    del self._values[key]
+                entry = self._values[id(loop)] = (loop, self.factory())
+            return entry[1]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._values)
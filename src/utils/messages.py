@@ -0,0 +1,185 @@
+"""
+Compact conversation messages and the append-only history reducer.
+
+- ``Message``: slotted (role, content) pair with an interned role. It reads
+  like the dicts it replaces (``m["role"]``, ``m.get("content")``, equality
+  with ``{"role": ..., "content": ...}``) at a fraction of the memory.
+- ``MessageLog``: immutable-looking, O(1)-append history. Views share one
+  growing buffer and each is bounded by its own length, so appending never
+  changes a view someone else is holding.
+- ``MessageList``: the plain-dict history a graph returns (JSON-ready, a
+  real list). Passed back in unchanged, it hands its MessageLog back.
+- ``append_messages``: the LangGraph reducer for ConversationState.messages.
+  Nodes return only the new turn; the reducer appends it.
+"""
+import sys
+from collections.abc import Sequence
+from typing import Iterable, List, Optional
+
+from utils.session_store import SessionHistory
+
+
+class Message:
+    """One conversation message."""
+
+    __slots__ = ("role", "content")
+
+    def __init__(self, role: str, content: str):
+        self.role = sys.intern(role)
+        self.content = content
+
+    @classmethod
+    def coerce(cls, message) -> "Message":
+        if isinstance(message, Message):
+            return message
+        return cls(message.get("role", "user"), message.get("content", ""))
+
+    # dict-style access, so code written against {"role", "content"} dicts keeps working
+    def __getitem__(self, key: str) -> str:
+        if key == "role":
+            return self.role
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return ("role", "content")
+
+    def to_dict(self) -> dict:
+        return {"role": self.role, "content": self.content}
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Message):
+            return self.role == other.role and self.content == other.content
+        if isinstance(other, dict):
+            return other == self.to_dict()
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Message(role={self.role!r}, content={self.content!r})"
+
+
+class MessageLog(Sequence):
+    """
+    Append-only message history with structural sharing.
+
+    ``extend()`` returns a new view; when the view is at the end of the
+    shared buffer, it appends in place (amortized O(1)) instead of copying.
+    """
+
+    __slots__ = ("_buffer", "_length")
+
+    def __init__(self, messages: Iterable = (), _buffer: Optional[List[Message]] = None, _length: int = 0):
+        if _buffer is None:
+            _buffer = [Message.coerce(m) for m in messages]
+            _length = len(_buffer)
+        self._buffer = _buffer
+        self._length = _length
+
+    def extend(self, messages: Iterable) -> "MessageLog":
+        new = [Message.coerce(m) for m in messages]
+        buffer, length = self._buffer, self._length
+
+        if len(buffer) > length:
+            # Another view already appended past us. If it appended these
+            # exact messages, share them; otherwise branch off with a copy.
+            tail = buffer[length:length + len(new)]
+            if len(tail) == len(new) and all(a is b for a, b in zip(tail, new)):
+                return MessageLog(_buffer=buffer, _length=length + len(new))
+            buffer = buffer[:length]
+
+        buffer.extend(new)
+        return MessageLog(_buffer=buffer, _length=length + len(new))
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._buffer[:self._length][index]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("message log index out of range")
+        return self._buffer[index]
+
+    def __iter__(self):
+        buffer = self._buffer
+        return (buffer[i] for i in range(self._length))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (MessageLog, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def to_list(self) -> "MessageList":
+        """Plain dicts, e.g. for JSON or a graph's output."""
+        return MessageList([{"role": m.role, "content": m.content} for m in self], log=self)
+
+    def __repr__(self) -> str:
+        return f"MessageLog({self._length} messages)"
+
+
+class MessageList(list):
+    """
+    Plain-dict history returned from a graph.
+
+    A real list of {"role", "content"} dicts, so json.dumps, dict methods
+    and in-place edits all work. It remembers the MessageLog it was built
+    from: passed back in with the same length and last message, as_log()
+    returns that log and the next turn appends without re-coercing.
+    """
+
+    __slots__ = ("log",)
+
+    def __init__(self, messages: Iterable = (), log: Optional[MessageLog] = None):
+        super().__init__(messages)
+        self.log = log
+
+    def as_log(self) -> MessageLog:
+        log = self.log
+        if log is not None and len(log) == len(self) and (not self or log[-1] == self[-1]):
+            return log
+        return MessageLog(self)
+
+    def extended(self, messages: Iterable) -> "MessageList":
+        """
+        A new MessageList with messages appended.
+
+        Reuses this list's dicts (only the new messages are converted) and
+        appends to its MessageLog, so a turn costs a pointer copy.
+        """
+        new = [Message.coerce(m) for m in messages]
+        result = MessageList(self, log=self.as_log().extend(new))
+        result.extend(m.to_dict() for m in new)
+        return result
+
+
+def append_messages(existing: Optional[Sequence], new: Optional[Sequence]) -> Sequence:
+    """
+    Reducer for ConversationState.messages.
+
+    - A SessionHistory (store-backed) update replaces the value; the store
+      has already recorded the append.
+    - A MessageList (the plain-dict output of update_memory, or one passed
+      back in) replaces the value too.
+    - A MessageLog arriving on an empty channel (the caller's input) is
+      adopted as-is.
+    - Anything else is appended to the existing history.
+    """
+    if isinstance(new, (SessionHistory, MessageList)):
+        return new
+    if not existing and isinstance(new, MessageLog):
+        return new  # history passed back in from a previous result: no copy
+    if isinstance(existing, SessionHistory):
+        # Only reachable if a node emits plain messages for a stored session
+        return existing.extend([Message.coerce(m).to_dict() for m in new or ()])
+    if not isinstance(existing, MessageLog):
+        existing = MessageLog(existing or ())
+    return existing.extend(new or ())
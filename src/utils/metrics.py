@@ -0,0 +1,394 @@
+"""
+Per-node instrumentation for both agent graphs.
+
+Every node is wrapped with instrument(graph, node, fn) when the graph is
+built. Each run of a node opens a span that records:
+
+- wall time and whether the node raised
+- LLM calls made inside it: prompt / completion token counts and the
+  prompt_eval / eval durations Ollama reports (utils/llm.py adds them to the
+  current span)
+- cache outcomes seen inside it: LLM response cache, search cache, semantic
+  answer cache
+- the tool chosen, for nodes that decide one
+
+Spans feed in-process counters and histograms (``metrics``), which
+to_prometheus() renders in the Prometheus text format (the API server serves
+it on /metrics), and node_summary() condenses into p50/p99 per node. With
+``METRICS_SPANS_PATH`` set, every span is also appended to a JSONL file.
+
+The span is carried in a context variable, so LLM and cache calls are
+attributed to the node that made them on both the sync and async paths.
+Work handed to other threads (speculative branches) is not attributed.
+"""
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from utils.config import Config
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+# name -> (type, help)
+METRICS = {
+    "agent_node_duration_seconds": ("histogram", "Wall time of one node run"),
+    "agent_node_runs_total": ("counter", "Node runs by outcome"),
+    "agent_llm_calls_total": ("counter", "LLM calls made inside a node"),
+    "agent_llm_prompt_tokens_total": ("counter", "Prompt tokens evaluated by Ollama"),
+    "agent_llm_completion_tokens_total": ("counter", "Tokens generated by Ollama"),
+    "agent_llm_prompt_eval_seconds": ("histogram", "Ollama prompt_eval_duration per call"),
+    "agent_llm_eval_seconds": ("histogram", "Ollama eval_duration per call"),
+    "agent_cache_lookups_total": ("counter", "Cache lookups by cache and outcome"),
+    "agent_tool_choice_total": ("counter", "Tools chosen, by decision source"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics)."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """Thread-safe labelled counters and histograms."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters: Dict[str, Dict[Labels, float]] = defaultdict(dict)
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = defaultdict(dict)
+        self._keys: Dict[tuple, Labels] = {}
+        self._lock = threading.Lock()
+
+    def _labels(self, labels: Dict[str, Any]) -> Labels:
+        # Call sites pass the same labels in the same order, so the sorted
+        # key is memoized on the raw items
+        raw = tuple(labels.items())
+        key = self._keys.get(raw)
+        if key is None:
+            key = self._keys[raw] = tuple(sorted((k, str(v)) for k, v in raw))
+        return key
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = self._labels(labels)
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = self._labels(labels)
+        with self._lock:
+            series = self._histograms[name]
+            if key not in series:
+                series[key] = Histogram(self.buckets)
+            series[key].observe(value)
+
+    def counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(self._labels(labels), 0)
+
+    def histogram(self, name: str, **labels) -> Optional[Histogram]:
+        with self._lock:
+            return self._histograms.get(name, {}).get(self._labels(labels))
+
+    def node_summary(self) -> Dict[str, dict]:
+        """{"graph.node": {"runs", "mean_ms", "p50_ms", "p99_ms", ...}} per node."""
+        with self._lock:
+            durations = dict(self._histograms.get("agent_node_duration_seconds", {}))
+            totals: Dict[Tuple[str, str, str], float] = defaultdict(float)
+            for name in ("agent_llm_calls_total", "agent_llm_prompt_tokens_total",
+                         "agent_llm_completion_tokens_total"):
+                for key, value in self._counters.get(name, {}).items():
+                    labels = dict(key)
+                    totals[(name, labels.get("graph"), labels.get("node"))] += value
+
+        summary = {}
+        for key, hist in sorted(durations.items()):
+            graph, node = dict(key)["graph"], dict(key)["node"]
+            summary[f"{graph}.{node}"] = {
+                "runs": hist.count,
+                "mean_ms": hist.sum / hist.count * 1e3 if hist.count else 0.0,
+                "p50_ms": hist.quantile(0.5) * 1e3,
+                "p99_ms": hist.quantile(0.99) * 1e3,
+                "llm_calls": totals[("agent_llm_calls_total", graph, node)],
+                "prompt_tokens": totals[("agent_llm_prompt_tokens_total", graph, node)],
+                "completion_tokens": totals[("agent_llm_completion_tokens_total", graph, node)],
+            }
+        return summary
+
+    def to_prometheus(self) -> str:
+        """Render every series in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: dict(series) for name, series in self._histograms.items()}
+
+        for name in sorted(set(counters) | set(histograms)):
+            default_kind = "counter" if name in counters else "histogram"
+            kind, help_text = METRICS.get(name, (default_kind, name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in sorted(counters.get(name, {}).items()):
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+            for key, hist in sorted(histograms.get(name, {}).items()):
+                cumulative = 0
+                for bound, n in zip(hist.buckets + (float("inf"),), hist.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else _format_value(bound)
+                    bucket_labels = _format_labels(key + (("le", le),))
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(hist.sum)}")
+                lines.append(f"{name}_count{_format_labels(key)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class SpanExporter:
+    """Appends one JSON line per finished node span."""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def export(self, span: dict) -> None:
+        line = json.dumps(span, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class Span:
+    """One node run; LLM and cache calls inside it add to it."""
+
+    __slots__ = (
+        "graph", "node", "start", "wall_start", "llm_calls", "prompt_tokens",
+        "completion_tokens", "prompt_eval_ms", "eval_ms", "caches", "session_id",
+    )
+
+    def __init__(self, graph: str, node: str, state: Any):
+        self.graph = graph
+        self.node = node
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.prompt_eval_ms = 0.0
+        self.eval_ms = 0.0
+        self.caches: Dict[str, str] = {}
+        self.session_id = state.get("session_id") if isinstance(state, dict) else None
+
+
+metrics = MetricsRegistry()
+
+_current: ContextVar[Optional[Span]] = ContextVar("agent_node_span", default=None)
+_UNSET = object()
+_span_exporter = _UNSET
+
+
+def get_span_exporter() -> Optional[SpanExporter]:
+    """
+    Return the shared SpanExporter, created from Config on first use.
+
+    Returns None when METRICS_SPANS_PATH is empty.
+    """
+    global _span_exporter
+    if _span_exporter is _UNSET:
+        _span_exporter = (
+            SpanExporter(Config.METRICS_SPANS_PATH) if Config.METRICS_SPANS_PATH else None
+        )
+    return _span_exporter
+
+
+def set_span_exporter(exporter: Optional[SpanExporter]) -> None:
+    """Install a SpanExporter, or None to stop exporting spans."""
+    global _span_exporter
+    _span_exporter = exporter
+
+
+def record_llm(response) -> None:
+    """Add one Ollama response's token counts and durations to the current node."""
+    span = _current.get()
+    if span is None:
+        return
+    prompt_tokens = response.get("prompt_eval_count") or 0
+    completion_tokens = response.get("eval_count") or 0
+    prompt_eval = (response.get("prompt_eval_duration") or 0) / 1e9
+    eval_time = (response.get("eval_duration") or 0) / 1e9
+
+    span.llm_calls += 1
+    span.prompt_tokens += prompt_tokens
+    span.completion_tokens += completion_tokens
+    span.prompt_eval_ms += prompt_eval * 1e3
+    span.eval_ms += eval_time * 1e3
+
+    labels = {"graph": span.graph, "node": span.node}
+    metrics.inc("agent_llm_calls_total", **labels)
+    metrics.inc("agent_llm_prompt_tokens_total", prompt_tokens, **labels)
+    metrics.inc("agent_llm_completion_tokens_total", completion_tokens, **labels)
+    metrics.observe("agent_llm_prompt_eval_seconds", prompt_eval, **labels)
+    metrics.observe("agent_llm_eval_seconds", eval_time, **labels)
+
+
+def _count_cache(span: Span, cache: str, outcome: str) -> None:
+    span.caches[cache] = outcome
+    metrics.inc(
+        "agent_cache_lookups_total", graph=span.graph, node=span.node, cache=cache, outcome=outcome
+    )
+
+
+def record_cache(cache: str, outcome: str) -> None:
+    """Count a cache lookup ("hit", "miss", "stale", ...) against the current node."""
+    span = _current.get()
+    if span is not None:
+        _count_cache(span, cache, outcome)
+
+
+def _finish(span: Span, update: Any, error: Optional[BaseException]) -> None:
+    elapsed = time.perf_counter() - span.start
+    labels = {"graph": span.graph, "node": span.node}
+    metrics.observe("agent_node_duration_seconds", elapsed, **labels)
+    metrics.inc("agent_node_runs_total", status="error" if error else "ok", **labels)
+
+    update = update if isinstance(update, dict) else {}
+    if update.get("semantic_cache"):
+        _count_cache(span, "semantic", update["semantic_cache"])
+    tool = update.get("tool_choice")
+    if tool:
+        metrics.inc(
+            "agent_tool_choice_total",
+            graph=span.graph, tool=tool, source=update.get("route_source", "unknown"),
+        )
+
+    exporter = get_span_exporter()
+    if exporter is None:
+        return
+    record = {
+        "graph": span.graph,
+        "node": span.node,
+        "start": span.wall_start,
+        "duration_ms": round(elapsed * 1e3, 3),
+        "status": "error" if error else "ok",
+        "llm_calls": span.llm_calls,
+        "prompt_tokens": span.prompt_tokens,
+        "completion_tokens": span.completion_tokens,
+        "prompt_eval_ms": round(span.prompt_eval_ms, 3),
+        "eval_ms": round(span.eval_ms, 3),
+    }
+    if span.caches:
+        record["caches"] = span.caches
+    if tool:
+        record["tool_choice"] = tool
+        record["route_source"] = update.get("route_source")
+    if span.session_id:
+        record["session_id"] = span.session_id
+    if error is not None:
+        record["error"] = repr(error)
+    exporter.export(record)
+
+
+def instrument(graph: str, node: str, fn: Callable) -> Callable:
+    """
+    Wrap a node function (sync or async) so each run is measured.
+
+    The wrapper keeps the node's signature, so LangGraph still passes the
+    run config to nodes that take one. Returns fn unchanged when
+    METRICS_ENABLED is false.
+    """
+    if not Config.METRICS_ENABLED:
+        return fn
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state, *args, **kwargs):
+            span = Span(graph, node, state)
+            token = _current.set(span)
+            update, error = None, None
+            try:
+                update = await fn(state, *args, **kwargs)
+                return update
+            except BaseException as exc:
+                error = exc
+                raise
+            finally:
+                _current.reset(token)
+                _finish(span, update, error)
+
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(state, *args, **kwargs):
+        span = Span(graph, node, state)
+        token = _current.set(span)
+        update, error = None, None
+        try:
+            update = fn(state, *args, **kwargs)
+            return update
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            _current.reset(token)
+            _finish(span, update, error)
+
+    return wrapper
@@ -0,0 +1,158 @@
+"""
+Per-node model and option profiles.
+
+Every LLM-calling node asks for its call arguments by node name:
+
+    router, extractor, direct, synthesizer      (multi-tool agent)
+    batch_router                                (agents/batch.py)
+    summarizer, answer, memory_update           (conversational agent)
+
+A profile set maps node names to a model and option overrides, so the
+one-word router can run on a small fast model while synthesis keeps a
+larger one. Sets live in a JSON file (``MODEL_PROFILES_PATH``) keyed by set
+name, and ``MODEL_PROFILE`` picks the active one:
+
+    {
+      "fast":    {"router":    {"model": "qwen2.5:0.5b", "options": {"num_predict": 4}},
+                  "extractor": {"model": "qwen2.5:0.5b"}},
+      "quality": {}
+    }
+
+``NODE_MODELS`` ("router=qwen2.5:0.5b,summarizer=llama3.2:1b") overrides
+the model per node on top of the file. Nodes without an entry use
+``OLLAMA_MODEL`` and their built-in options; a profile's options are merged
+over those. ``batch_router`` falls back to the router's model.
+
+Each node that calls the LLM records what it ran with under the result's
+'profiles' key ({node: {"profile", "model", "options"}}), for A/B runs.
+"""
+import json
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Tuple
+
+from utils.config import Config
+
+NODES = (
+    "router",
+    "extractor",
+    "direct",
+    "synthesizer",
+    "batch_router",
+    "summarizer",
+    "answer",
+    "memory_update",
+)
+
+# Nodes that use another node's model unless they name their own
+_MODEL_FALLBACK = {"batch_router": "router"}
+
+
+def parse_node_models(spec: str) -> Dict[str, str]:
+    """Parse "node=model,node=model" (model names may contain ':')."""
+    models = {}
+    for item in spec.split(","):
+        node, _, model = item.partition("=")
+        if node.strip() and model.strip():
+            models[node.strip()] = model.strip()
+    return models
+
+
+def merge_profiles(
+    left: Optional[Mapping[str, dict]], right: Optional[Mapping[str, dict]]
+) -> Dict[str, dict]:
+    """State reducer: each node adds its own entry to 'profiles'."""
+    return {**(left or {}), **(right or {})}
+
+
+class ModelProfiles:
+    """
+    Resolves (model, options) per node for the active profile set.
+
+    Args:
+        profiles: Profile sets, {set name: {node: {"model", "options"}}}
+        active: Name of the set in use
+        node_models: Per-node model overrides applied on top of the set
+        default_model: Model for nodes the set doesn't cover
+    """
+
+    def __init__(
+        self,
+        profiles: Optional[Mapping[str, Mapping[str, dict]]] = None,
+        active: str = "default",
+        node_models: Optional[Mapping[str, str]] = None,
+        default_model: Optional[str] = None,
+    ):
+        profiles = dict(profiles or {})
+        if active not in profiles and active != "default":
+            raise ValueError(f"Unknown model profile '{active}' (have: {', '.join(profiles)})")
+        unknown = set(profiles.get(active, {})) | set(node_models or {})
+        unknown -= set(NODES)
+        if unknown:
+            raise ValueError(f"Unknown node(s) in model profile: {', '.join(sorted(unknown))}")
+
+        self.active = active
+        self.default_model = default_model
+        self._nodes: Dict[str, dict] = {
+            node: dict(spec) for node, spec in profiles.get(active, {}).items()
+        }
+        for node, model in (node_models or {}).items():
+            self._nodes.setdefault(node, {})["model"] = model
+
+    @classmethod
+    def from_config(cls) -> "ModelProfiles":
+        profiles = {}
+        if Config.MODEL_PROFILES_PATH:
+            profiles = json.loads(Path(Config.MODEL_PROFILES_PATH).read_text(encoding="utf-8"))
+        return cls(
+            profiles,
+            active=Config.MODEL_PROFILE,
+            node_models=parse_node_models(Config.NODE_MODELS),
+        )
+
+    def model(self, node: str) -> str:
+        spec = self._nodes.get(node, {})
+        if "model" in spec:
+            return spec["model"]
+        fallback = _MODEL_FALLBACK.get(node)
+        if fallback and "model" in self._nodes.get(fallback, {}):
+            return self._nodes[fallback]["model"]
+        return self.default_model or Config.OLLAMA_MODEL
+
+    def resolve(self, node: str, options: Optional[dict] = None) -> Tuple[str, dict]:
+        """Model and options for a node; profile options win over the node's."""
+        overrides = self._nodes.get(node, {}).get("options") or {}
+        return self.model(node), {**(options or {}), **overrides}
+
+
+_profiles: Optional[ModelProfiles] = None
+
+
+def get_model_profiles() -> ModelProfiles:
+    """Return the shared ModelProfiles, loaded from Config on first use."""
+    global _profiles
+    if _profiles is None:
+        _profiles = ModelProfiles.from_config()
+    return _profiles
+
+
+def set_model_profiles(profiles: Optional[ModelProfiles]) -> None:
+    """Install profiles, or None to reload from Config on next use."""
+    global _profiles
+    _profiles = profiles
+
+
+def node_request(node: str, prompt: str, options: Optional[dict] = None, **extra) -> dict:
+    """LLM call arguments for a node under the active profile."""
+    model, options = get_model_profiles().resolve(node, options)
+    return {"model": model, "prompt": prompt, "options": options, **extra}
+
+
+def node_profile(request: Mapping, node: str) -> Dict[str, dict]:
+    """'profiles' entry describing the request a node just sent."""
+    return {
+        node: {
+            "profile": get_model_profiles().active,
+            "model": request["model"],
+            "options": dict(request.get("options") or {}),
+        }
+    }
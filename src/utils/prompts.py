@@ -2,9 +2,17 @@
 Prompt templates for agents.
 """
 
-ROUTER_PROMPT = """You are a routing assistant. Your job is to decide which tool to use.
 
-Question: "{question}"
+def template_prefix(template: str) -> str:
+    """Static text before a template's first placeholder (reusable KV prefix)."""
+    return template.split("{", 1)[0]
+
+
+# Templates keep their static instructions first and the per-request fields
+# last, so the instruction prefix can be reused across calls (see
+# utils/context_reuse.py and template_prefix()).
+
+ROUTER_PROMPT = """You are a routing assistant. Your job is to decide which tool to use.
 
 Available tools:
 - "search": Use for questions about current events, news, facts that change, or things happening now
@@ -21,6 +29,8 @@ Think step by step:
 2. Does this need precise calculation? → calculator  
 3. Can I answer from general knowledge? → direct
 
+Question: "{question}"
+
 Respond with ONLY ONE WORD: search, calculator, or direct"""
 
 
@@ -63,6 +73,20 @@ Summarize the key facts or answers that are relevant to the current question.
 Keep it to 3 bullet points or fewer."""
 
 
+MEMORY_UPDATE_PROMPT = """You are a conversation memory module maintaining a running summary.
+
+Current summary:
+{summary}
+
+New messages:
+{new_messages}
+
+Update the summary so it also covers the new messages.
+Keep names, facts and answers that may matter later. Stay under 120 words.
+
+Updated summary:"""
+
+
 CONVERSATION_ANSWER_PROMPT = """You are a helpful assistant continuing a conversation.
 
 Conversation so far:
@@ -74,3 +98,17 @@ Relevant context:
 User question: {question}
 
 Answer concisely (3-5 sentences) using the relevant context when available."""
+
+
+BATCH_ROUTER_PROMPT = """You are a routing assistant. For each numbered question, decide which tool to use.
+
+Available tools:
+- "search": current events, news, facts that change, or things happening now
+- "calculator": mathematical calculations and numerical operations
+- "direct": general knowledge you can answer without external tools
+
+Questions:
+{questions}
+
+Respond with exactly one line per question in the form "<number>: <tool>".
+Use ONLY search, calculator, or direct as the tool."""
@@ -0,0 +1,406 @@
+"""
+Semantic answer cache for the multi-tool agent.
+
+Questions are normalized ("what's python" → "what is python"), embedded
+locally and looked up before the graph runs:
+
+- exact: the normalized text was answered before (dict lookup)
+- near duplicate: cosine similarity ≥ ``threshold`` in an in-memory
+  VectorStore tuned for near-duplicate lookups (8 LSH tables × 16 bits,
+  no exact fallback), which stays sub-millisecond at 100k entries
+
+A near match must also carry the same numbers, math operators and content
+words (everything but stopwords) as the question, so "What is 2 + 2?" never
+answers "What is 2 * 3?" and "capital of France" never answers "capital of
+Germany". Paraphrases that differ only in stopwords, filler, contractions,
+punctuation or word order still hit.
+
+Entries expire per tool (``ttl_seconds``, e.g. search results after a few
+minutes; tools without a TTL never expire) and the oldest are evicted past
+``max_entries``. Dead rows are compacted away once they outnumber live ones.
+
+Auditing: every hit is appended to ``audit_path`` (JSONL). A sampled
+``audit_rate`` of hits is answered by the graph anyway and compared with
+the cached entry; a different tool choice or calculator output counts as a
+false hit, is logged, and evicts the entry.
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, Mapping, Optional, Sequence
+
+import numpy as np
+
+from utils.config import Config
+from utils.vector_store import HashingEmbedder, VectorStore
+
+_CONTRACTIONS = [
+    (re.compile(r"\b(what|who|where|when|how|why|it|that|there)'s\b"), r"\1 is"),
+    (re.compile(r"\b(can)'t\b"), r"\1 not"),
+    (re.compile(r"n't\b"), " not"),
+    (re.compile(r"'re\b"), " are"),
+    (re.compile(r"'m\b"), " am"),
+]
+_FILLER_RE = re.compile(r"\b(please|hey|hi|quick question|can you tell me|tell me)\b")
+_WORD_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?|[-+*/^%=<>]")
+_FACTS_RE = re.compile(
+    r"\d+(?:\.\d+)?|[-+*/^%=<>]"
+    r"|\b(?:plus|minus|times|divided|multiplied|power|squared|cubed|root|percent|mod)\b"
+)
+# Words that don't change what a question asks for
+_STOPWORDS = frozenset("""
+a an the is are was were be been being am do does did what who whom whose which
+where when why how of in on at to for from by with about as into than then so
+and or but if it its this that these those there here i me my you your we our
+they them their he him his she her can could would should will shall may might
+must just really actually exactly some any please tell know like
+""".split())
+
+# Tool outputs that describe a failure rather than an answer
+_UNCACHEABLE_PREFIXES = ("Search error", "Search unavailable", "No results found", "Error:")
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, expand contractions, drop filler words and punctuation."""
+    text = question.lower().replace("’", "'")
+    for pattern, replacement in _CONTRACTIONS:
+        text = pattern.sub(replacement, text)
+    text = _FILLER_RE.sub(" ", text)
+    return " ".join(_WORD_RE.findall(text))
+
+
+def _facts(normalized: str) -> tuple:
+    """Numbers, operators, math words and content words; these must match for a hit."""
+    content = sorted(
+        word for word in normalized.split() if word[0].isalpha() and word not in _STOPWORDS
+    )
+    return tuple(_FACTS_RE.findall(normalized)), tuple(content)
+
+
+def parse_ttls(spec: str) -> Dict[str, float]:
+    """Parse "tool=seconds,tool=seconds"."""
+    ttls = {}
+    for item in spec.split(","):
+        tool, _, seconds = item.partition("=")
+        if tool.strip() and seconds.strip():
+            ttls[tool.strip()] = float(seconds)
+    return ttls
+
+
+class SemanticCache:
+    """
+    Near-duplicate question → answer cache.
+
+    Args:
+        embedder: Object with ``embed(texts) -> np.ndarray`` (default: hashing)
+        threshold: Minimum cosine similarity for a near-duplicate hit
+        tools: Tool choices whose answers may be cached
+        ttl_seconds: Per-tool expiry; tools not listed never expire
+        max_entries: Live entries kept; the oldest are evicted first
+        audit_path: JSONL audit log (None disables logging)
+        audit_rate: Fraction of hits re-answered by the graph to check them
+        approximate_threshold: Size at which lookups switch to LSH
+    """
+
+    def __init__(
+        self,
+        embedder=None,
+        threshold: float = 0.9,
+        tools: Sequence[str] = ("direct", "calculator", "search"),
+        ttl_seconds: Optional[Mapping[str, float]] = None,
+        max_entries: int = 100_000,
+        audit_path: Optional[str] = None,
+        audit_rate: float = 0.0,
+        approximate_threshold: int = 5000,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.embedder = embedder or HashingEmbedder(dim=Config.SEMANTIC_CACHE_DIM)
+        self.threshold = threshold
+        self.tools = set(tools)
+        self.ttl_seconds = dict(ttl_seconds or {})
+        self.max_entries = max_entries
+        self.audit_path = audit_path
+        self.audit_rate = audit_rate
+        self.approximate_threshold = approximate_threshold
+        self.clock = clock
+        self.counters: Counter = Counter()
+        self._lock = threading.Lock()
+        self._audit_lock = threading.Lock()
+        self._reset_index()
+
+    def _reset_index(self) -> None:
+        self._store: Optional[VectorStore] = None
+        self._live: "OrderedDict[int, dict]" = OrderedDict()  # row -> entry, oldest first
+        self._exact: Dict[str, int] = {}
+
+    def _new_store(self, dim: int) -> VectorStore:
+        return VectorStore(
+            dim,
+            approximate_threshold=self.approximate_threshold,
+            lsh_tables=8,
+            lsh_bits=16,
+            exact_fallback=False,
+        )
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def _usable(self, entry: Optional[dict], now: float) -> bool:
+        if entry is None:
+            return False
+        if entry["expires_at"] is not None and entry["expires_at"] <= now:
+            self._drop(entry["row"])
+            self.counters["expired"] += 1
+            return False
+        return True
+
+    def lookup(self, question: str) -> Optional[dict]:
+        """
+        Cached answer for a question, or None.
+
+        Returns:
+            The entry (question, tool_choice, tool_output, final_answer,
+            synthesis_strategy, created_at) plus 'score' and 'match'
+            ("exact" or "similar")
+        """
+        normalized = normalize_question(question)
+        now = self.clock()
+
+        with self._lock:
+            self.counters["lookups"] += 1
+            row = self._exact.get(normalized)
+            entry = self._live.get(row) if row is not None else None
+            if self._usable(entry, now):
+                self.counters["hits"] += 1
+                self.counters["exact_hits"] += 1
+                return {**entry, "score": 1.0, "match": "exact"}
+
+        vector = self._embed(normalized)  # outside the lock
+        with self._lock:
+            match = self._similar(normalized, vector, now)
+            self.counters["hits" if match else "misses"] += 1
+            return match
+
+    def _embed(self, normalized: str) -> np.ndarray:
+        return self.embedder.embed([normalized])[0]
+
+    def _similar(self, normalized: str, vector: np.ndarray, now: float) -> Optional[dict]:
+        if self._store is None or not self._live:
+            return None
+        facts = _facts(normalized)
+        for result in self._store.search(vector, k=4):
+            if result["score"] < self.threshold:
+                break
+            entry = self._live.get(result["row"])
+            if not self._usable(entry, now):
+                continue
+            if entry["facts"] != facts:
+                self.counters["guard_rejects"] += 1
+                continue
+            return {**entry, "score": result["score"], "match": "similar"}
+        return None
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def cacheable(self, result: Mapping[str, Any]) -> bool:
+        """Only finished answers from cacheable tools, never tool failures."""
+        if result.get("tool_choice") not in self.tools or not result.get("final_answer"):
+            return False
+        output = result.get("tool_output") or ""
+        return not output.startswith(_UNCACHEABLE_PREFIXES)
+
+    def store(self, question: str, result: Mapping[str, Any]) -> bool:
+        """Cache a graph result for the question; returns False if skipped."""
+        if not self.cacheable(result):
+            self.counters["skipped"] += 1
+            return False
+
+        normalized = normalize_question(question)
+        vector = self._embed(normalized)
+        now = self.clock()
+        tool = result["tool_choice"]
+        ttl = self.ttl_seconds.get(tool)
+
+        with self._lock:
+            if self._store is None:
+                self._store = self._new_store(len(vector))
+            row = len(self._store)
+            entry = {
+                "row": row,
+                "question": question,
+                "normalized": normalized,
+                "facts": _facts(normalized),
+                "tool_choice": tool,
+                "tool_output": result.get("tool_output"),
+                "final_answer": result["final_answer"],
+                "synthesis_strategy": result.get("synthesis_strategy"),
+                "created_at": now,
+                "expires_at": now + ttl if ttl else None,
+            }
+            self._store.add(vector[None, :], [{"row": row}])
+
+            previous = self._exact.get(normalized)
+            if previous is not None:
+                self._drop(previous)
+            self._exact[normalized] = row
+            self._live[row] = entry
+            self.counters["stores"] += 1
+
+            while len(self._live) > self.max_entries:
+                oldest = next(iter(self._live))
+                self._drop(oldest)
+                self.counters["evictions"] += 1
+            self._maybe_compact()
+        return True
+
+    def _drop(self, row: int) -> None:
+        entry = self._live.pop(row, None)
+        if entry is not None and self._exact.get(entry["normalized"]) == row:
+            del self._exact[entry["normalized"]]
+
+    def invalidate(self, question: str) -> bool:
+        """Drop the entry stored for exactly this question (normalized)."""
+        with self._lock:
+            row = self._exact.get(normalize_question(question))
+            if row is None:
+                return False
+            self._drop(row)
+            return True
+
+    def _maybe_compact(self) -> None:
+        """Rebuild the index without dead rows once they outnumber live ones."""
+        dead = len(self._store) - len(self._live)
+        if dead <= max(1024, len(self._live)):
+            return
+        rows = list(self._live)
+        vectors = self._store.get_vectors(rows)
+        entries = list(self._live.values())
+        self._reset_index()
+        self._store = self._new_store(vectors.shape[1])
+        self._store.add(vectors, [{"row": i} for i in range(len(entries))])
+        for row, entry in enumerate(entries):
+            entry["row"] = row
+            self._live[row] = entry
+            self._exact[entry["normalized"]] = row
+        self.counters["compactions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset_index()
+
+    # ------------------------------------------------------------------
+    # Auditing
+    # ------------------------------------------------------------------
+
+    def should_audit(self) -> bool:
+        """Sample a hit for verification against a fresh graph run."""
+        return self.audit_rate > 0 and random.random() < self.audit_rate
+
+    def log_hit(self, question: str, match: Mapping[str, Any]) -> None:
+        self._audit({
+            "event": "hit",
+            "question": question,
+            "matched_question": match["question"],
+            "match": match["match"],
+            "score": round(float(match["score"]), 4),
+            "tool": match["tool_choice"],
+            "age_s": round(self.clock() - match["created_at"], 1),
+        })
+
+    def verify(self, question: str, match: Mapping[str, Any], result: Mapping[str, Any]) -> bool:
+        """
+        Compare a sampled hit with the graph's fresh answer.
+
+        A different tool choice, or a different calculator output, is a
+        false hit: it is logged and the cached entry is evicted.
+
+        Returns:
+            True if the cached answer held up
+        """
+        same_tool = result.get("tool_choice") == match["tool_choice"]
+        same_output = match["tool_choice"] != "calculator" or (
+            result.get("tool_output") == match["tool_output"]
+        )
+        ok = same_tool and same_output
+        with self._lock:
+            self.counters["audits"] += 1
+            if not ok:
+                self.counters["false_hits"] += 1
+                if match["row"] in self._live:
+                    self._drop(match["row"])
+        self._audit({
+            "event": "audit" if ok else "false_hit",
+            "question": question,
+            "matched_question": match["question"],
+            "score": round(float(match["score"]), 4),
+            "cached_tool": match["tool_choice"],
+            "fresh_tool": result.get("tool_choice"),
+            "cached_answer": match["final_answer"],
+            "fresh_answer": result.get("final_answer"),
+        })
+        return ok
+
+    def _audit(self, record: dict) -> None:
+        if not self.audit_path:
+            return
+        record = {"ts": round(self.clock(), 3), **record}
+        try:
+            with self._audit_lock:
+                directory = os.path.dirname(self.audit_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.audit_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+        except OSError as exc:
+            print(f"⚠️  Semantic cache audit log failed: {exc}")
+
+    def stats(self) -> Dict[str, float]:
+        """Counters plus size, hit rate and false-hit rate among audited hits."""
+        with self._lock:
+            snapshot = dict(self.counters)
+            snapshot["entries"] = len(self._live)
+        lookups = snapshot.get("lookups", 0)
+        audits = snapshot.get("audits", 0)
+        snapshot["hit_rate"] = snapshot.get("hits", 0) / lookups if lookups else 0.0
+        snapshot["false_hit_rate"] = snapshot.get("false_hits", 0) / audits if audits else 0.0
+        return snapshot
+
+
+_UNSET = object()
+_semantic_cache = _UNSET
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """
+    Return the shared SemanticCache, creating it from Config on first use.
+
+    Returns None when SEMANTIC_CACHE_ENABLED is false.
+    """
+    global _semantic_cache
+    if _semantic_cache is _UNSET:
+        _semantic_cache = (
+            SemanticCache(
+                threshold=Config.SEMANTIC_CACHE_THRESHOLD,
+                tools=[t.strip() for t in Config.SEMANTIC_CACHE_TOOLS.split(",") if t.strip()],
+                ttl_seconds=parse_ttls(Config.SEMANTIC_CACHE_TTLS),
+                max_entries=Config.SEMANTIC_CACHE_MAX_ENTRIES,
+                audit_path=Config.SEMANTIC_CACHE_AUDIT_PATH or None,
+                audit_rate=Config.SEMANTIC_CACHE_AUDIT_RATE,
+            )
+            if Config.SEMANTIC_CACHE_ENABLED
+            else None
+        )
+    return _semantic_cache
+
+
+def set_semantic_cache(cache: Optional[SemanticCache]) -> None:
+    """Install a SemanticCache, or None to disable."""
+    global _semantic_cache
+    _semantic_cache = cache
@@ -0,0 +1,202 @@
+"""
+Durable conversation sessions in SQLite (WAL).
+
+With a session store, callers send only the new question plus a session id
+(or a LangGraph ``thread_id``); the conversational agent loads the history
+itself. Messages are written append-only, one row per message, so a turn
+writes two rows instead of re-serializing the whole history. History is
+loaded lazily: ``SessionHistory`` is a read-through sequence that only
+fetches the rows a prompt actually slices (e.g. the recent window).
+
+Any worker pointed at the same database can pick up any session.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Sequence
+from typing import Dict, List, Optional
+
+from utils.config import Config
+
+
+class SessionStore:
+    """
+    SQLite-backed message log plus per-session memory metadata.
+
+    Tables:
+    - messages(session_id, seq, role, content): append-only log
+    - sessions(session_id, summary, summarized_count, updated_at)
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " session_id TEXT NOT NULL,"
+            " seq INTEGER NOT NULL,"
+            " role TEXT NOT NULL,"
+            " content TEXT NOT NULL,"
+            " PRIMARY KEY (session_id, seq))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " summary TEXT,"
+            " summarized_count INTEGER NOT NULL DEFAULT 0,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def history(self, session_id: str) -> "SessionHistory":
+        """Lazy view over a session's messages."""
+        return SessionHistory(self, session_id)
+
+    def count(self, session_id: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0]
+
+    def fetch(self, session_id: str, start: int, stop: int) -> List[dict]:
+        """Messages with start <= seq < stop, in order."""
+        if stop <= start:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content FROM messages"
+                " WHERE session_id = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (session_id, start, stop),
+            ).fetchall()
+        return [{"role": role, "content": content} for role, content in rows]
+
+    def append(self, session_id: str, messages: List[dict]) -> int:
+        """
+        Append messages to a session's log.
+
+        Sequence numbers are assigned inside one transaction, so two workers
+        appending to the same session can't interleave or collide.
+
+        Returns:
+            The session's message count after the append
+        """
+        with self._lock:
+            with self._conn:
+                for message in messages:
+                    self._conn.execute(
+                        "INSERT INTO messages (session_id, seq, role, content)"
+                        " SELECT ?, COALESCE(MAX(seq) + 1, 0), ?, ?"
+                        " FROM messages WHERE session_id = ?",
+                        (session_id, message["role"], message["content"], session_id),
+                    )
+                row = self._conn.execute(
+                    "SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)
+                ).fetchone()
+        return row[0]
+
+    def load_memory(self, session_id: str) -> Dict[str, object]:
+        """Rolling-memory metadata ('summary', 'summarized_count') for a session."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, summarized_count FROM sessions WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+        if row is None:
+            return {}
+        memory: Dict[str, object] = {"summarized_count": row[1]}
+        if row[0]:
+            memory["summary"] = row[0]
+        return memory
+
+    def save_memory(self, session_id: str, summary: Optional[str], summarized_count: int) -> None:
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO sessions (session_id, summary, summarized_count, updated_at)"
+                    " VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT(session_id) DO UPDATE SET"
+                    " summary = excluded.summary,"
+                    " summarized_count = excluded.summarized_count,"
+                    " updated_at = excluded.updated_at",
+                    (session_id, summary, summarized_count, time.time()),
+                )
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SessionHistory(Sequence):
+    """
+    Read-through list of a session's messages.
+
+    len() is one COUNT query; indexing and slicing fetch only the requested
+    rows. Iterating loads everything, so only full-transcript prompts pay
+    for the whole history.
+    """
+
+    def __init__(self, store: SessionStore, session_id: str, length: Optional[int] = None):
+        self.store = store
+        self.session_id = session_id
+        self._length = store.count(session_id) if length is None else length
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step != 1:
+                return self.store.fetch(self.session_id, 0, self._length)[index]
+            return self.store.fetch(self.session_id, start, stop)
+
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("session history index out of range")
+        return self.store.fetch(self.session_id, index, index + 1)[0]
+
+    def __iter__(self):
+        return iter(self.store.fetch(self.session_id, 0, self._length))
+
+    def extend(self, messages: List[dict]) -> "SessionHistory":
+        """Append messages durably; returns a view that includes them."""
+        length = self.store.append(self.session_id, messages)
+        return SessionHistory(self.store, self.session_id, length)
+
+    def __repr__(self) -> str:
+        return f"SessionHistory(session_id={self.session_id!r}, messages={self._length})"
+
+
+_UNSET = object()
+_session_store = _UNSET
+
+
+def get_session_store() -> Optional[SessionStore]:
+    """
+    Return the shared session store, creating it from Config on first use.
+
+    Returns None when SESSION_STORE_ENABLED is false.
+    """
+    global _session_store
+    if _session_store is _UNSET:
+        _session_store = (
+            SessionStore(Config.SESSION_STORE_PATH) if Config.SESSION_STORE_ENABLED else None
+        )
+    return _session_store
@@ -0,0 +1,155 @@
+"""
+Single-flight request coalescing.
+
+When several callers ask for the same thing at once (a trending question
+hitting the agent, the same Tavily query, the same LLM prompt), only the
+first caller (the leader) does the work; the others wait for it and get
+the same result, or the same exception.
+
+- Sync callers are threads: followers block until the leader finishes.
+  A thread can't be interrupted, so the work always runs to completion.
+- Async callers share one task per event loop. A follower that is
+  cancelled just stops waiting; the shared task is cancelled only when
+  every caller waiting on it has been cancelled. If the task itself is
+  cancelled, every waiter sees CancelledError.
+
+Only in-flight work is shared. Once it finishes the key is free again, so
+this never serves old results; caching is a separate layer.
+
+Counters:
+- "executed": calls that ran the work (leaders)
+- "coalesced": calls that waited on someone else's work instead
+- "errors": leader calls whose work raised (followers re-raise it too)
+- "cancelled": shared async tasks cancelled because every waiter left
+"""
+import asyncio
+import threading
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    """One in-flight sync call and its outcome."""
+
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 1
+
+
+class _AsyncCall:
+    """One in-flight async task and the number of callers awaiting it."""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs concurrent calls that share a key once and fans out the result."""
+
+    def __init__(self):
+        self.counters: Counter = Counter()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._async_calls: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], _AsyncCall] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """
+        Return fn(), sharing one execution with concurrent callers of ``key``.
+
+        Raises:
+            Whatever fn raised, in the leader and in every follower
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.counters["executed"] += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.counters["coalesced"] += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            self._add("errors")
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Async version of do(); callers on the same event loop share one task.
+
+        Raises:
+            Whatever the shared task raised; CancelledError if this caller
+            was cancelled or the shared task was
+        """
+        loop = asyncio.get_running_loop()
+        slot = (loop, key)
+        call = self._async_calls.get(slot)
+        if call is None or call.task.done():
+            call = self._async_calls[slot] = _AsyncCall(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda _: self._finish(slot, call))
+            self._add("executed")
+        else:
+            self._add("coalesced")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Every caller gave up: stop the work nobody is waiting for
+                call.task.cancel()
+                self._add("cancelled")
+
+    def _finish(self, slot, call: _AsyncCall) -> None:
+        if self._async_calls.get(slot) is call:
+            del self._async_calls[slot]
+        if not call.task.cancelled() and call.task.exception() is not None:
+            self._add("errors")
+
+    def _add(self, key: str) -> None:
+        with self._lock:
+            self.counters[key] += 1
+
+    def inflight(self) -> int:
+        """Keys currently being worked on (sync and async)."""
+        with self._lock:
+            return len(self._calls) + len(self._async_calls)
+
+    def stats(self) -> Dict[str, float]:
+        """Counters plus the share of calls that were coalesced."""
+        with self._lock:
+            snapshot = dict(self.counters)
+        total = snapshot.get("executed", 0) + snapshot.get("coalesced", 0)
+        snapshot["coalesce_rate"] = snapshot.get("coalesced", 0) / total if total else 0.0
+        snapshot["inflight"] = self.inflight()
+        return snapshot
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
@@ -1,28 +1,45 @@
 """
 State definitions for LangGraph agents.
 """
-from typing import List, Literal, Optional, TypedDict
+from typing import Annotated, Any, Dict, Literal, Optional, Sequence, TypedDict
 
 try:
     from typing import NotRequired, Required
 except ImportError:  # Python <3.11
     from typing_extensions import NotRequired, Required
 
+from utils.messages import append_messages
+from utils.profiles import merge_profiles
+
 
 class MultiToolState(TypedDict):
     """State for multi-tool routing agent."""
 
     question: Required[str]
     tool_choice: NotRequired[Literal["search", "calculator", "direct"]]
+    route_source: NotRequired[Literal["rules", "llm", "cache"]]
     tool_input: NotRequired[str]
     tool_output: NotRequired[str]
     final_answer: NotRequired[str]
+    synthesis_strategy: NotRequired[str]
+    speculation: NotRequired[Literal["hit", "miss", "skipped"]]
+    semantic_cache: NotRequired[Literal["hit", "miss", "audit"]]
+    cache_match: NotRequired[Dict[str, Any]]  # Cached entry being audited
+    # Model/options each LLM-calling node ran with (see utils.profiles)
+    profiles: NotRequired[Annotated[Dict[str, dict], merge_profiles]]
 
 
 class ConversationState(TypedDict):
     """State for conversational agent with memory."""
 
-    messages: Required[List[dict]]
+    # Append-only (see utils.messages): nodes return just the new messages.
+    # Loaded from the session store when one is set.
+    messages: NotRequired[Annotated[Sequence[dict], append_messages]]
     current_question: Required[str]
     retrieved_context: NotRequired[Optional[str]]
     answer: NotRequired[str]
+    summary: NotRequired[str]           # Rolling memory: summary of older turns
+    summarized_count: NotRequired[int]  # Messages already folded into 'summary'
+    session_id: NotRequired[str]        # Session store / vector memory key
+    context_tokens: NotRequired[Dict[str, Any]]  # Answer prompt tokens per section
+    profiles: NotRequired[Annotated[Dict[str, dict], merge_profiles]]  # Per-node model/options
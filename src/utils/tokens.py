@@ -0,0 +1,153 @@
+"""
+Token counting and budgeted prompt assembly.
+
+Ollama doesn't expose a tokenizer, so counts are a fast estimate: roughly
+one token per word or punctuation mark, plus one per extra 6 characters of
+a long word. That tracks SentencePiece/BPE counts closely enough to keep
+prompts inside a budget, and it is cheap enough to run on every turn.
+
+fit_sections() packs named prompt sections into a token budget in
+priority order, applying each section's truncation policy when it doesn't
+fit, and reports the tokens each section ended up using.
+"""
+import math
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+from utils.config import Config
+
+# Truncation policies
+KEEP = "keep"                    # never truncated (may overrun the budget)
+TRUNCATE_TAIL = "truncate_tail"  # keep the beginning, cut the end
+DROP_OLDEST = "drop_oldest"      # drop whole parts from the front, keep the newest
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+_ELLIPSIS = " …"
+
+# Truncating a section to fewer tokens than this only leaves a useless stub
+MIN_TRUNCATED_TOKENS = 16
+
+
+def _piece_tokens(piece: str) -> int:
+    return 1 + max(0, math.ceil((len(piece) - 6) / 6))
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimated token count of a piece of text."""
+    if not text:
+        return 0
+    return sum(_piece_tokens(piece) for piece in _PIECE_RE.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut text so its estimated size fits in max_tokens (marked with "…").
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens - 1  # room for the ellipsis
+    if budget <= 0:
+        return ""
+
+    used, end = 0, 0
+    for match in _PIECE_RE.finditer(text):
+        used += _piece_tokens(match.group())
+        if used > budget:
+            break
+        end = match.end()
+    return text[:end].rstrip() + _ELLIPSIS if end else ""
+
+
+def token_budget(model: str) -> int:
+    """
+    Prompt token budget for a model.
+
+    Config.CONTEXT_TOKEN_BUDGETS ("mistral=6000,llama3=7000") overrides the
+    default Config.CONTEXT_TOKEN_BUDGET per model.
+    """
+    for item in Config.CONTEXT_TOKEN_BUDGETS.split(","):
+        name, _, budget = item.partition("=")
+        if name.strip() == model and budget.strip():
+            return int(budget)
+    return Config.CONTEXT_TOKEN_BUDGET
+
+
+@dataclass
+class Section:
+    """
+    A named piece of a prompt.
+
+    Args:
+        name: Key used in the rendered output and the token report
+        parts: Units of text; DROP_OLDEST drops from the front of this list
+        priority: Lower numbers are packed first
+        policy: KEEP, TRUNCATE_TAIL or DROP_OLDEST
+        joiner: String used to join the kept parts
+    """
+
+    name: str
+    parts: Sequence[str]
+    priority: int
+    policy: str = TRUNCATE_TAIL
+    joiner: str = "\n"
+
+
+def _fit_section(section: Section, remaining: int) -> Tuple[str, bool]:
+    text = section.joiner.join(section.parts)
+    if section.policy == KEEP or estimate_tokens(text) <= remaining:
+        return text, False
+
+    if section.policy == DROP_OLDEST:
+        kept: List[str] = []
+        used = 0
+        for part in reversed(section.parts):
+            cost = estimate_tokens(part)
+            if used + cost > remaining:
+                if not kept and remaining >= MIN_TRUNCATED_TOKENS:
+                    # Not even the newest part fits whole; keep its start
+                    kept.append(truncate_to_tokens(part, remaining))
+                break
+            kept.append(part)
+            used += cost
+        return section.joiner.join(p for p in reversed(kept) if p), True
+
+    if remaining < MIN_TRUNCATED_TOKENS:
+        return "", True
+    return truncate_to_tokens(text, remaining), True
+
+
+def fit_sections(
+    sections: Sequence[Section], budget: int, reserved: int = 0
+) -> Tuple[Dict[str, str], Dict[str, object]]:
+    """
+    Fit sections into a token budget, highest priority first.
+
+    Args:
+        sections: Prompt sections to pack
+        budget: Total prompt token budget
+        reserved: Tokens already used by fixed text (e.g. the template)
+
+    Returns:
+        (rendered text per section name, report) where the report holds
+        tokens per section, "template", "total", "budget" and a list of
+        "truncated" section names
+    """
+    remaining = budget - reserved
+    rendered: Dict[str, str] = {}
+    report: Dict[str, object] = {"template": reserved}
+    truncated = []
+
+    for section in sorted(sections, key=lambda s: s.priority):
+        text, was_truncated = _fit_section(section, max(0, remaining))
+        tokens = estimate_tokens(text)
+        rendered[section.name] = text
+        report[section.name] = tokens
+        remaining -= tokens
+        if was_truncated:
+            truncated.append(section.name)
+
+    report["total"] = budget - remaining
+    report["budget"] = budget
+    report["truncated"] = truncated
+    return rendered, report
@@ -0,0 +1,448 @@
+"""
+Local vector index for conversation memory.
+
+Each completed turn (user + assistant message) is embedded once and
+appended to a per-session VectorStore. The current question then retrieves
+only the top-k most similar turns instead of summarizing the whole history.
+
+- Exact search: brute-force cosine similarity with NumPy.
+- Approximate search: random-hyperplane LSH, used once a session grows past
+  ``approximate_threshold`` turns. Candidates are re-ranked exactly.
+- Persistence: append-only files per session (``vectors.f32`` +
+  ``payloads.jsonl``) in a directory named after the SHA-256 of the session
+  id. Vectors are memory-mapped on load, so long-lived sessions reload
+  without reading or re-embedding every turn.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import zlib
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from utils.config import Config
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedder:
+    """
+    Dependency-free embedder: hashed unigrams + bigrams, L2-normalized.
+
+    Deterministic across processes (crc32, not Python's salted hash), so
+    persisted vectors stay comparable with new ones.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = _TOKEN_RE.findall(text.lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                digest = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if digest & 1 else -1.0
+                vectors[row, (digest >> 1) % self.dim] += sign
+        return _normalize(vectors)
+
+
+class OllamaEmbedder:
+    """Embeddings from an Ollama embedding model (e.g. nomic-embed-text)."""
+
+    def __init__(self, model: str = "nomic-embed-text"):
+        self.model = model
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        from utils import llm
+
+        response = llm.embed(self.model, list(texts))
+        return np.asarray(response["embeddings"], dtype=np.float32)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class VectorStore:
+    """
+    Append-only cosine-similarity index with optional on-disk persistence.
+
+    Args:
+        dim: Vector dimension
+        path: Directory for the persisted index (None keeps it in memory)
+        approximate_threshold: Size at which search switches to LSH
+        lsh_tables / lsh_bits: LSH shape (more tables = better recall)
+        exact_fallback: Fall back to exact search when LSH finds fewer than
+            k candidates (False for threshold lookups, where a sparse
+            probe already means "no close match")
+    """
+
+    VECTORS_FILE = "vectors.f32"
+    PAYLOADS_FILE = "payloads.jsonl"
+    META_FILE = "meta.json"
+
+    def __init__(
+        self,
+        dim: int,
+        path: Optional[str] = None,
+        approximate_threshold: int = 5000,
+        lsh_tables: int = 4,
+        lsh_bits: int = 12,
+        exact_fallback: bool = True,
+    ):
+        self.dim = dim
+        self.path = path
+        self.approximate_threshold = approximate_threshold
+        self.exact_fallback = exact_fallback
+        self.payloads: List[dict] = []
+        self._lock = threading.Lock()
+
+        # Fixed seed: the same planes are regenerated on reload
+        rng = np.random.default_rng(0)
+        self._planes = rng.standard_normal((lsh_tables, lsh_bits, dim)).astype(np.float32)
+        self._bit_weights = 1 << np.arange(lsh_bits, dtype=np.int64)
+        self._buckets = [defaultdict(list) for _ in range(lsh_tables)]
+
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._size = 0
+
+        if path is not None:
+            self._load()
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        meta_path = self._file(self.META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                stored_dim = json.load(f)["dim"]
+            if stored_dim != self.dim:
+                raise ValueError(
+                    f"Index at {self.path} has dim {stored_dim}, expected {self.dim}"
+                )
+        else:
+            with open(meta_path, "w") as f:
+                json.dump({"dim": self.dim}, f)
+
+        payloads_path = self._file(self.PAYLOADS_FILE)
+        if os.path.exists(payloads_path):
+            with open(payloads_path) as f:
+                for line in f:
+                    try:
+                        self.payloads.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        break  # torn final write
+
+        vectors_path = self._file(self.VECTORS_FILE)
+        row_bytes = 4 * self.dim
+        file_bytes = os.path.getsize(vectors_path) if os.path.exists(vectors_path) else 0
+        # A crash between the two appends can leave one file ahead; trim both
+        # back to the last complete entry so later appends stay aligned
+        self._size = min(file_bytes // row_bytes, len(self.payloads))
+        if file_bytes != self._size * row_bytes:
+            os.truncate(vectors_path, self._size * row_bytes)
+        if len(self.payloads) > self._size or self._has_torn_payload(payloads_path):
+            del self.payloads[self._size:]
+            with open(payloads_path, "w") as f:
+                for payload in self.payloads:
+                    f.write(json.dumps(payload) + "\n")
+        self._remap()
+        self._index_rows(0, self._size)
+
+    @staticmethod
+    def _has_torn_payload(payloads_path: str) -> bool:
+        if not os.path.exists(payloads_path) or not os.path.getsize(payloads_path):
+            return False
+        with open(payloads_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def _remap(self) -> None:
+        if self._size:
+            self._vectors = np.memmap(
+                self._file(self.VECTORS_FILE),
+                dtype=np.float32,
+                mode="r",
+                shape=(self._size, self.dim),
+            )
+        else:
+            self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def add(self, vectors: np.ndarray, payloads: Sequence[dict]) -> None:
+        """
+        Append vectors with their payloads. Existing rows are never rewritten.
+        """
+        vectors = _normalize(vectors)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dim {self.dim}, got {vectors.shape[1]}")
+        if len(vectors) != len(payloads):
+            raise ValueError("vectors and payloads must have the same length")
+        if not len(vectors):
+            return
+
+        with self._lock:
+            start = self._size
+            if self.path is None:
+                self._append_in_memory(vectors)
+            else:
+                with open(self._file(self.VECTORS_FILE), "ab") as f:
+                    f.write(vectors.tobytes())
+                with open(self._file(self.PAYLOADS_FILE), "a") as f:
+                    for payload in payloads:
+                        f.write(json.dumps(payload) + "\n")
+                self._size += len(vectors)
+                self._remap()
+
+            self.payloads.extend(payloads)
+            self._index_rows(start, self._size)
+
+    def _append_in_memory(self, vectors: np.ndarray) -> None:
+        needed = self._size + len(vectors)
+        if needed > len(self._vectors):
+            capacity = max(needed, 2 * len(self._vectors), 64)
+            grown = np.zeros((capacity, self.dim), dtype=np.float32)
+            grown[:self._size] = self._vectors[:self._size]
+            self._vectors = grown
+        self._vectors[self._size:needed] = vectors
+        self._size = needed
+
+    def _codes(self, vectors: np.ndarray) -> np.ndarray:
+        """LSH bucket codes, shape (tables, n)."""
+        bits = np.einsum("tbd,nd->tnb", self._planes, vectors) > 0
+        return bits.astype(np.int64) @ self._bit_weights
+
+    def _index_rows(self, start: int, end: int) -> None:
+        if end <= start:
+            return
+        codes = self._codes(np.asarray(self._vectors[start:end]))
+        for table, table_codes in zip(self._buckets, codes):
+            for offset, code in enumerate(table_codes.tolist()):
+                table[code].append(start + offset)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def search(self, vector: np.ndarray, k: int = 3) -> List[dict]:
+        """
+        Top-k most similar entries.
+
+        Returns:
+            Payload dicts with an added 'score' (cosine similarity),
+            best match first
+        """
+        query = _normalize(vector)[0]
+        with self._lock:
+            size = self._size
+            vectors = self._vectors[:size]
+            if not size or k <= 0:
+                return []
+
+            ids = None
+            if size >= self.approximate_threshold:
+                ids = self._candidates(query)
+                if len(ids) < k and self.exact_fallback:
+                    ids = None  # too sparse, fall back to exact search
+                elif not len(ids):
+                    return []
+
+            if ids is None:
+                scores = vectors @ query
+                ids = np.arange(size)
+            else:
+                scores = vectors[ids] @ query
+
+            top = min(k, len(ids))
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            return [
+                {**self.payloads[int(ids[i])], "score": float(scores[i])}
+                for i in best
+            ]
+
+    def _candidates(self, query: np.ndarray) -> np.ndarray:
+        """Ids sharing a bucket (or a 1-bit neighbour) with the query."""
+        codes = self._codes(query[None, :])[:, 0]
+        candidates = set()
+        weights = self._bit_weights.tolist()
+        for table, code in zip(self._buckets, codes.tolist()):
+            candidates.update(table.get(code, ()))
+            for weight in weights:
+                candidates.update(table.get(code ^ weight, ()))
+        return np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+
+    def get_vectors(self, ids: Sequence[int]) -> np.ndarray:
+        """Copy of the stored (normalized) vectors for the given row ids."""
+        with self._lock:
+            return np.array(self._vectors[np.asarray(ids, dtype=np.int64)], dtype=np.float32)
+
+    def __len__(self) -> int:
+        return self._size
+
+
+def _turn_text(user: dict, assistant: dict) -> str:
+    return (
+        f"{user['role'].title()}: {user['content']}\n"
+        f"{assistant['role'].title()}: {assistant['content']}"
+    )
+
+
+class VectorMemory:
+    """
+    Per-session turn indexes for the conversational agent.
+
+    Turns are embedded incrementally: sync() only embeds turns the session's
+    index hasn't seen yet, so old turns are never re-embedded. If the history
+    no longer starts with the indexed turns (it is shorter, or was replaced),
+    the session index is dropped and rebuilt from the history.
+    """
+
+    def __init__(
+        self,
+        embedder=None,
+        path: Optional[str] = None,
+        approximate_threshold: int = 5000,
+    ):
+        self.embedder = embedder or HashingEmbedder()
+        self.path = path
+        self.approximate_threshold = approximate_threshold
+        self.counters: Counter = Counter()
+        self._stores: Dict[str, VectorStore] = {}
+        self._lock = threading.Lock()
+
+    def _store(self, session_id: str, dim: Optional[int] = None) -> Optional[VectorStore]:
+        store = self._stores.get(session_id)
+        if store is not None:
+            return store
+
+        directory = None
+        if self.path:
+            directory = self._directory(session_id)
+            meta_path = os.path.join(directory, VectorStore.META_FILE)
+            if dim is None and os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    dim = json.load(f)["dim"]
+        if dim is None:
+            return None
+
+        store = VectorStore(dim, path=directory, approximate_threshold=self.approximate_threshold)
+        self._stores[session_id] = store
+        return store
+
+    def _directory(self, session_id: str) -> str:
+        """
+        A session's index directory: a hash of the id, so ids like ".." or
+        "/" can't leave ``path`` and distinct ids never share files.
+
+        Raises:
+            ValueError: If the directory would not be strictly inside ``path``
+        """
+        root = os.path.realpath(self.path)
+        name = hashlib.sha256(session_id.encode("utf-8")).hexdigest()
+        directory = os.path.realpath(os.path.join(root, name))
+        if os.path.dirname(directory) != root:
+            raise ValueError(f"Vector memory directory escapes {self.path!r}")
+        return directory
+
+    def _drop(self, session_id: str) -> None:
+        self._stores.pop(session_id, None)
+        if self.path:
+            shutil.rmtree(self._directory(session_id), ignore_errors=True)
+
+    @staticmethod
+    def _matches(store: VectorStore, messages: Sequence[dict]) -> bool:
+        """Whether messages still begin with the indexed turns (first and last checked)."""
+        indexed = len(store)
+        if len(messages) < 2 * indexed:
+            return False
+        for turn in {0, indexed - 1}:
+            user, assistant = messages[2 * turn:2 * turn + 2]
+            if store.payloads[turn]["text"] != _turn_text(user, assistant):
+                return False
+        return True
+
+    def sync(self, session_id: str, messages: Sequence[dict]) -> int:
+        """
+        Index any complete turns in ``messages`` not yet in the session index.
+
+        Returns:
+            Number of turns newly embedded
+        """
+        with self._lock:
+            store = self._store(session_id)
+            if store is not None and len(store) and not self._matches(store, messages):
+                self._drop(session_id)
+                self.counters["reindexed"] += 1
+                store = None
+            indexed = len(store) if store is not None else 0
+            # One slice, so lazily-loaded histories fetch only the new turns
+            unseen = messages[2 * indexed:2 * (len(messages) // 2)]
+            turns = [
+                (indexed + offset, unseen[2 * offset], unseen[2 * offset + 1])
+                for offset in range(len(unseen) // 2)
+            ]
+            if not turns:
+                return 0
+
+            texts = [_turn_text(user, assistant) for _, user, assistant in turns]
+            vectors = self.embedder.embed(texts)
+            store = store or self._store(session_id, dim=vectors.shape[1])
+            store.add(vectors, [{"turn": index, "text": text} for (index, _, _), text in zip(turns, texts)])
+            self.counters["embedded"] += len(turns)
+            return len(turns)
+
+    def search(self, session_id: str, question: str, k: int = 3) -> List[dict]:
+        """Top-k turns of a session most similar to the question."""
+        with self._lock:
+            store = self._store(session_id)
+            if store is None or not len(store):
+                return []
+            self.counters["searches"] += 1
+        return store.search(self.embedder.embed([question])[0], k)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            snapshot = dict(self.counters)
+            snapshot["sessions"] = len(self._stores)
+            snapshot["turns"] = sum(len(s) for s in self._stores.values())
+        return snapshot
+
+
+_vector_memory: Optional[VectorMemory] = None
+
+
+def get_vector_memory() -> VectorMemory:
+    """Shared VectorMemory configured from Config, created on first use."""
+    global _vector_memory
+    if _vector_memory is None:
+        embedder = (
+            OllamaEmbedder(Config.VECTOR_MEMORY_EMBED_MODEL)
+            if Config.VECTOR_MEMORY_EMBEDDER == "ollama"
+            else HashingEmbedder()
+        )
+        _vector_memory = VectorMemory(
+            embedder=embedder,
+            path=Config.VECTOR_MEMORY_PATH or None,
+            approximate_threshold=Config.VECTOR_MEMORY_APPROX_THRESHOLD,
+        )
+    return _vector_memory
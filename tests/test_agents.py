@@ -1,5 +1,7 @@
+import json
 import sys
 from pathlib import Path
+from types import SimpleNamespace
 
 import pytest
 
@@ -12,6 +14,13 @@ sys.path.insert(0, str(ROOT / "src"))
 import agents.conversational as conversational
 import agents.multi_tool as multi_tool
 from tools.search import WebSearchTool
+from utils import llm
+from utils.config import Config
+
+
+def use_fake_client(monkeypatch, generate):
+    """Route the shared LLM client's generate() to a fake."""
+    monkeypatch.setattr(llm, "_client", SimpleNamespace(generate=generate))
 
 
 def test_web_search_tool_graceful_when_missing_api_key(monkeypatch):
@@ -43,9 +52,9 @@ def test_multi_tool_agent_routing_and_synthesis(monkeypatch):
         return {"response": "direct"}
 
     monkeypatch.setattr(multi_tool, "search_web", lambda query: "search results stub")
-    monkeypatch.setattr(multi_tool.ollama, "generate", fake_generate)
+    use_fake_client(monkeypatch, fake_generate)
 
-    agent = multi_tool.create_multi_tool_agent()
+    agent = multi_tool.create_multi_tool_agent(synthesis_strategies={"calculator": "llm"})
 
     calc = agent.invoke({"question": "What is 2 + 2?"})
     assert calc["tool_choice"] == "calculator"
@@ -58,6 +67,153 @@ def test_multi_tool_agent_routing_and_synthesis(monkeypatch):
     assert "Synthesized search answer" in search["final_answer"]
 
 
+def test_semantic_cache_answers_paraphrases_before_routing(monkeypatch):
+    from utils.semantic_cache import SemanticCache
+
+    calls = []
+
+    def fake_generate(model, prompt, options=None, **_):
+        calls.append(prompt)
+        if "Respond with ONLY ONE WORD" in prompt:
+            return {"response": "direct"}
+        return {"response": "A language named after Monty Python."}
+
+    use_fake_client(monkeypatch, fake_generate)
+    cache = SemanticCache(threshold=0.8)
+    agent = multi_tool.create_multi_tool_agent(semantic_cache=cache)
+
+    first = agent.invoke({"question": "Why is Python called Python?"})
+    assert first["semantic_cache"] == "miss"
+    assert calls
+
+    calls.clear()
+    again = agent.invoke({"question": "so why is python called python"})
+    assert again["semantic_cache"] == "hit" and again["route_source"] == "cache"
+    assert again["final_answer"] == first["final_answer"]
+    assert calls == []
+    assert cache.stats()["hits"] == 1
+
+
+def test_nodes_record_timings_tokens_caches_and_spans(tmp_path, monkeypatch):
+    import asyncio
+    import json
+
+    from utils import metrics
+    from utils.semantic_cache import SemanticCache
+
+    def fake_generate(model, prompt, options=None, **_):
+        word = "direct" if "Respond with ONLY ONE WORD" in prompt else "Because of Monty Python."
+        return {
+            "response": word,
+            "prompt_eval_count": 40,
+            "prompt_eval_duration": 20_000_000,
+            "eval_count": 5,
+            "eval_duration": 50_000_000,
+        }
+
+    async def fake_agenerate(model, prompt, options=None, **kwargs):
+        return fake_generate(model, prompt, options, **kwargs)
+
+    use_fake_client(monkeypatch, fake_generate)
+    monkeypatch.setattr(llm, "_async_client", SimpleNamespace(generate=fake_agenerate))
+    monkeypatch.setattr(Config, "FAST_ROUTER_ENABLED", False)
+    registry = metrics.MetricsRegistry()
+    monkeypatch.setattr(metrics, "metrics", registry)
+    spans_path = tmp_path / "spans.jsonl"
+    metrics.set_span_exporter(metrics.SpanExporter(str(spans_path)))
+    try:
+        agent = multi_tool.create_multi_tool_agent(semantic_cache=SemanticCache(threshold=0.8))
+        first = agent.invoke({"question": "Why is Python called Python?"})
+        again = asyncio.run(agent.ainvoke({"question": "so why is python called python"}))
+    finally:
+        metrics.set_span_exporter(None)
+
+    # Instrumentation never changes what the nodes return
+    assert first["final_answer"] == "Because of Monty Python."
+    assert again["semantic_cache"] == "hit"
+
+    router = {"graph": "multi_tool", "node": "router"}
+    assert registry.histogram("agent_node_duration_seconds", **router).count == 1
+    lookup = {"graph": "multi_tool", "node": "cache_lookup"}
+    assert registry.histogram("agent_node_duration_seconds", **lookup).count == 2
+    assert registry.counter("agent_llm_prompt_tokens_total", **router) == 40
+    assert registry.counter("agent_llm_completion_tokens_total", **router) == 5
+    assert registry.histogram("agent_llm_eval_seconds", **router).sum == pytest.approx(0.05)
+    choices = {"graph": "multi_tool", "tool": "direct"}
+    assert registry.counter("agent_tool_choice_total", source="llm", **choices) == 1
+    assert registry.counter("agent_tool_choice_total", source="cache", **choices) == 1
+    assert registry.counter(
+        "agent_cache_lookups_total", cache="semantic", outcome="hit", **lookup
+    ) == 1
+    assert registry.node_summary()["multi_tool.direct"]["completion_tokens"] == 5
+
+    exposition = registry.to_prometheus()
+    assert "# TYPE agent_node_duration_seconds histogram" in exposition
+    assert 'agent_node_duration_seconds_bucket{graph="multi_tool",node="router",le="+Inf"} 1' in exposition
+    assert 'agent_llm_prompt_tokens_total{graph="multi_tool",node="router"} 40' in exposition
+
+    spans = [json.loads(line) for line in spans_path.read_text().splitlines()]
+    assert [span["node"] for span in spans] == [
+        "cache_lookup", "router", "direct", "synthesizer", "cache_store", "cache_lookup",
+    ]
+    assert spans[1]["tool_choice"] == "direct" and spans[1]["prompt_tokens"] == 40
+    assert spans[-1]["caches"] == {"semantic": "hit"} and spans[-1]["status"] == "ok"
+
+
+def test_coalesced_agent_runs_concurrent_identical_questions_once(monkeypatch):
+    import threading
+    import time
+
+    calls = []
+
+    def fake_generate(model, prompt, options=None, **_):
+        calls.append(prompt)
+        time.sleep(0.05)
+        if "Respond with ONLY ONE WORD" in prompt:
+            return {"response": "direct"}
+        return {"response": "It is trending because of the launch."}
+
+    use_fake_client(monkeypatch, fake_generate)
+    agent = multi_tool.create_multi_tool_agent(coalesce=True)
+
+    results = []
+    questions = ["Why is it trending?", "why is it  trending?", "Why is it trending?"]
+    threads = [
+        threading.Thread(target=lambda q=q: results.append(agent.invoke({"question": q})))
+        for q in questions
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 2  # one router call, one direct answer
+    assert len(results) == 3 and results[0] is not results[1]
+    assert {r["final_answer"] for r in results} == {"It is trending because of the launch."}
+    assert agent.flight.stats()["coalesced"] == 2
+
+
+def test_nodes_use_configured_model(monkeypatch):
+    models = set()
+
+    def fake_generate(model, prompt, options=None, **_):
+        models.add(model)
+        if "Respond with ONLY ONE WORD" in prompt:
+            return {"response": "direct"}
+        return {"response": "Direct response"}
+
+    monkeypatch.setattr(Config, "OLLAMA_MODEL", "llama3")
+    use_fake_client(monkeypatch, fake_generate)
+
+    agent = multi_tool.create_multi_tool_agent()
+    result = agent.invoke({"question": "Tell me about octopuses"})
+    assert result["final_answer"] == "Direct response"
+
+    chat = conversational.create_conversational_agent(memory_mode="full")
+    chat.invoke({"current_question": "Hello there"})
+    assert models == {"llama3"}
+
+
 def test_conversational_agent_updates_memory(monkeypatch):
     def fake_generate(model, prompt, options=None, **_):
         if "Summarize the key facts" in prompt:
@@ -68,7 +224,7 @@ def test_conversational_agent_updates_memory(monkeypatch):
 
         return {"response": "Fallback response"}
 
-    monkeypatch.setattr(conversational.ollama, "generate", fake_generate)
+    use_fake_client(monkeypatch, fake_generate)
 
     agent = conversational.create_conversational_agent()
     start_messages = [
@@ -87,3 +243,633 @@ def test_conversational_agent_updates_memory(monkeypatch):
     assert result["answer"] == "LangChain also built LangServe."
     assert len(result["messages"]) == len(start_messages) + 2
     assert result["messages"][-1]["content"] == "LangChain also built LangServe."
+
+
+def test_fast_router_classifies_clear_cut_questions():
+    from agents.fast_router import fast_route
+
+    assert fast_route("What is 157 * 23?").tool == "calculator"
+    assert fast_route("What is 2 to the power of 10?").tool == "calculator"
+    assert fast_route("Latest AI news").tool == "search"
+    assert fast_route("What is Python?").tool == "direct"
+    assert fast_route("Who is the CEO of OpenAI?") is None
+    assert fast_route("What is the current price of 2 + 2 stocks?") is None
+    assert fast_route("What is 144 over 12?").tool == "calculator"
+    assert fast_route("What is 12 squared?").tool == "calculator"
+    assert fast_route("What happened in 2020 over the summer?") is None
+    assert fast_route("Why do I wake up 3 times a night?") is None
+
+
+def test_router_node_reports_decision_path(monkeypatch):
+    calls = []
+
+    def fake_generate(model, prompt, options=None, **_):
+        calls.append(prompt)
+        return {"response": "direct"}
+
+    use_fake_client(monkeypatch, fake_generate)
+    multi_tool.fast_router.reset()
+
+    fast = multi_tool.router_node({"question": "What is 157 * 23?"})
+    assert fast == {"tool_choice": "calculator", "route_source": "rules"}
+    assert calls == []
+
+    slow = multi_tool.router_node({"question": "Tell me something interesting"})
+    assert slow == {
+        "tool_choice": "direct",
+        "route_source": "llm",
+        "profiles": {
+            "router": {
+                "profile": "default",
+                "model": Config.OLLAMA_MODEL,
+                "options": {"temperature": 0.1, "num_predict": 10},
+            }
+        },
+    }
+    assert len(calls) == 1
+
+    stats = multi_tool.fast_router.stats()
+    assert stats["rules"] == 1 and stats["llm"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_agents_support_native_async_invocation(monkeypatch):
+    import asyncio
+
+    in_flight = {"now": 0, "peak": 0}
+
+    async def fake_agenerate(self, model, prompt, options=None, **_):
+        in_flight["now"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        await asyncio.sleep(0.01)
+        in_flight["now"] -= 1
+        if "Summarize the key facts" in prompt:
+            return {"response": "Earlier we talked about LangGraph."}
+        if "Information gathered from tools" in prompt:
+            return {"response": "Async synthesized answer"}
+        return {"response": "Async answer"}
+
+    async def fake_asearch(query):
+        return "async search stub"
+
+    def no_sync_calls(*args, **kwargs):
+        raise AssertionError("sync client used on the async path")
+
+    monkeypatch.setattr(ollama.AsyncClient, "generate", fake_agenerate)
+    use_fake_client(monkeypatch, no_sync_calls)
+    monkeypatch.setattr(multi_tool, "asearch_web", fake_asearch)
+
+    multi_agent = multi_tool.create_multi_tool_agent()
+    chat_agent = conversational.create_conversational_agent()
+
+    async def run():
+        questions = ["Latest AI news"] * 10
+        results = await asyncio.gather(
+            *(multi_agent.ainvoke({"question": q}) for q in questions)
+        )
+        chat = await chat_agent.ainvoke(
+            {
+                "messages": [{"role": "user", "content": "Who created LangGraph?"}],
+                "current_question": "What else did they build?",
+            }
+        )
+        return results, chat
+
+    results, chat = asyncio.run(run())
+
+    assert all(r["final_answer"] == "Async synthesized answer" for r in results)
+    assert in_flight["peak"] > 1  # requests overlapped on one event loop
+    assert chat["retrieved_context"] == "Earlier we talked about LangGraph."
+    assert chat["answer"] == "Async answer"
+    assert len(chat["messages"]) == 3
+
+
+def test_batch_routes_pending_questions_in_one_call_and_keeps_order(monkeypatch):
+    import asyncio
+
+    from agents import batch as batch_module
+
+    router_prompts = []
+
+    async def fake_agenerate(self, model, prompt, options=None, **_):
+        if "one line per question" in prompt:
+            router_prompts.append(prompt)
+            return {"response": "1: direct\n2. search\n3) banana"}
+        if "Answer this question directly" in prompt:
+            if "explode" in prompt:
+                raise RuntimeError("model crashed")
+            return {"response": "Direct response"}
+        if "Information gathered from tools" in prompt:
+            return {"response": "Synthesized"}
+        if "Extract ONLY the mathematical expression" in prompt:
+            return {"response": "6 * 7"}
+        return {"response": "unused"}
+
+    async def fake_asearch(query):
+        await asyncio.sleep(0)
+        return "search results stub"
+
+    monkeypatch.setattr(ollama.AsyncClient, "generate", fake_agenerate)
+    monkeypatch.setattr(multi_tool, "asearch_web", fake_asearch)
+
+    questions = [
+        "Tell me something interesting",
+        "Who is the CEO of OpenAI?",
+        "Please explode",
+        "What is 6 * 7?",
+    ]
+    results = batch_module.batch(questions, max_concurrency=2)
+
+    assert len(router_prompts) == 1  # all three LLM-routed items in one prompt
+    assert [r["question"] for r in results] == questions
+    assert [r["tool_choice"] for r in results] == ["direct", "search", "direct", "calculator"]
+    assert results[0]["final_answer"] == "Direct response"
+    assert results[1]["final_answer"] == "Synthesized"
+    assert "model crashed" in results[2]["error"]
+    assert results[3]["route_source"] == "rules"
+    assert "42" in results[3]["tool_output"]
+
+
+def test_parse_batch_routes_ignores_out_of_range_and_garbage():
+    from agents.batch import parse_batch_routes
+
+    text = "1: Search\n2 - calculator\n5: direct\nnonsense\n2: direct"
+    assert parse_batch_routes(text, 3) == {0: "search", 1: "calculator"}
+
+
+def test_multi_tool_agent_streams_answer_tokens(monkeypatch):
+    def fake_generate(model, prompt, options=None, stream=False, **_):
+        if "Information gathered from tools" in prompt:
+            assert stream
+            return iter({"response": t} for t in ["The ", "answer ", "is 4."])
+        if "Extract ONLY the mathematical expression" in prompt:
+            return {"response": "2 + 2"}
+        return {"response": "unused"}
+
+    use_fake_client(monkeypatch, fake_generate)
+
+    agent = multi_tool.create_multi_tool_agent(
+        stream_tokens=True, synthesis_strategies={"calculator": "llm"}
+    )
+
+    tokens, final = [], None
+    for mode, chunk in agent.stream({"question": "What is 2 + 2?"}, stream_mode=["custom", "values"]):
+        if mode == "custom":
+            tokens.append(chunk)
+        else:
+            final = chunk
+
+    assert [c["token"] for c in tokens] == ["The ", "answer ", "is 4."]
+    assert {c["node"] for c in tokens} == {"synthesizer"}
+    assert final["final_answer"] == "The answer is 4."
+
+
+def test_synthesis_strategies_skip_the_llm_and_are_recorded(monkeypatch):
+    prompts = []
+
+    def fake_generate(model, prompt, options=None, **_):
+        prompts.append(prompt)
+        if "Extract ONLY the mathematical expression" in prompt:
+            return {"response": "157 * 23"}
+        return {"response": "LLM synthesis"}
+
+    search_output = (
+        "[Result 1]\nTitle: LangGraph\n"
+        "Content: LangGraph 1.0 shipped durable execution. Unrelated filler here.\n"
+        "URL: https://example.com/langgraph\n"
+    )
+    use_fake_client(monkeypatch, fake_generate)
+    monkeypatch.setattr(multi_tool, "search_web", lambda query: search_output)
+
+    agent = multi_tool.create_multi_tool_agent(synthesis_strategies={"search": "extractive"})
+
+    calc = agent.invoke({"question": "What is 157 * 23?"})
+    assert calc["final_answer"] == "157 * 23 = 3611"
+    assert calc["synthesis_strategy"] == "template"
+    assert not any("Information gathered from tools" in p for p in prompts)
+
+    search = agent.invoke({"question": "Latest LangGraph release news"})
+    assert search["synthesis_strategy"] == "extractive"
+    assert search["final_answer"].startswith("LangGraph 1.0 shipped durable execution.")
+    assert "Source: https://example.com/langgraph" in search["final_answer"]
+
+    capped = multi_tool.synthesizer_node(
+        {"question": "q", "tool_choice": "search", "tool_output": "x" * 10_000},
+        strategies={"search": "llm_capped"},
+    )
+    assert capped["final_answer"] == "LLM synthesis"
+    assert capped["synthesis_strategy"] == "llm_capped"
+    assert capped["profiles"]["synthesizer"]["options"]["num_predict"] == Config.SYNTHESIS_MAX_TOKENS
+    assert len(prompts[-1]) < 10_000
+
+
+def test_calculator_node_uses_llm_extraction_only_when_parsing_fails(monkeypatch):
+    prompts = []
+
+    def fake_generate(model, prompt, options=None, **_):
+        prompts.append(prompt)
+        return {"response": "4 * 2"}
+
+    use_fake_client(monkeypatch, fake_generate)
+    multi_tool.expression_extractor.reset()
+
+    parsed = multi_tool.calculator_node({"question": "What is 15% of 240?"})
+    assert parsed["tool_output"] == "Calculation: (15 / 100 * 240) = 36"
+    assert prompts == []
+
+    fallback = multi_tool.calculator_node({"question": "How many legs do two spiders have?"})
+    assert fallback["tool_input"] == "4 * 2"
+    assert len(prompts) == 1
+
+    stats = multi_tool.expression_extractor.stats()
+    assert stats["parsed"] == 1 and stats["llm"] == 1 and stats["hit_rate"] == 0.5
+
+
+def test_rolling_memory_keeps_prompt_size_flat(monkeypatch):
+    prompts = []
+
+    def fake_generate(model, prompt, options=None, **_):
+        prompts.append(prompt)
+        if "running summary" in prompt:
+            return {"response": "Summary: the user asked a series of numbered questions."}
+        return {"response": "A short answer."}
+
+    use_fake_client(monkeypatch, fake_generate)
+
+    agent = conversational.create_conversational_agent(memory_mode="rolling", window_turns=2)
+    memory = {"messages": []}
+    answer_sizes = []
+    for turn in range(30):
+        prompts.clear()
+        result = agent.invoke({**memory, "current_question": f"Question number {turn}?"})
+        answer_sizes.append(len(next(p for p in prompts if "continuing a conversation" in p)))
+        memory = {k: result[k] for k in ("messages", "summary", "summarized_count") if k in result}
+
+    assert len(memory["messages"]) == 60
+    # Everything but the last 2 turns has been folded into the summary
+    assert memory["summarized_count"] == 56
+    assert "Question number 0?" not in prompts[-1]
+    # Prompt size plateaus once the window is full
+    assert max(answer_sizes[5:]) - min(answer_sizes[5:]) < 10
+
+
+def test_rolling_memory_keeps_old_summary_when_fold_fails(monkeypatch):
+    def fake_generate(model, prompt, options=None, **_):
+        if "running summary" in prompt:
+            raise RuntimeError("ollama down")
+        return {"response": "ok"}
+
+    use_fake_client(monkeypatch, fake_generate)
+
+    agent = conversational.create_conversational_agent(window_turns=1)
+    history = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    result = agent.invoke(
+        {"messages": history, "summary": "Greetings.", "summarized_count": 0, "current_question": "Next?"}
+    )
+
+    assert result["summary"] == "Greetings."
+    assert result["summarized_count"] == 0
+    assert len(result["messages"]) == 4
+
+
+def test_vector_memory_retrieves_relevant_turns_without_llm(monkeypatch):
+    from utils.vector_store import HashingEmbedder, VectorMemory
+
+    prompts = []
+
+    def fake_generate(model, prompt, options=None, **_):
+        prompts.append(prompt)
+        return {"response": "ok"}
+
+    use_fake_client(monkeypatch, fake_generate)
+
+    memory = VectorMemory(embedder=HashingEmbedder(dim=128))
+    agent = conversational.create_conversational_agent(
+        memory_mode="vector", window_turns=1, vector_memory=memory
+    )
+    history = []
+    for topic in ["sourdough bread baking", "kubernetes pod scheduling", "marathon training plan"]:
+        history += [
+            {"role": "user", "content": f"Question about {topic}"},
+            {"role": "assistant", "content": f"Answer about {topic}"},
+        ]
+
+    result = agent.invoke(
+        {"messages": history, "session_id": "chat-1", "current_question": "How long should sourdough bread proof?"}
+    )
+
+    # Only the answer prompt hit the LLM; retrieval was a vector lookup
+    assert len(prompts) == 1
+    assert result["retrieved_context"].startswith("User: Question about sourdough")
+    assert memory.stats()["turns"] == 4
+
+
+def test_answer_prompt_stays_within_token_budget_on_long_sessions(monkeypatch):
+    from utils.tokens import estimate_tokens
+
+    prompts = []
+
+    def fake_generate(model, prompt, options=None, **_):
+        prompts.append(prompt)
+        return {"response": "A short summary of what matters."}
+
+    use_fake_client(monkeypatch, fake_generate)
+    monkeypatch.setattr(Config, "CONTEXT_TOKEN_BUDGET", 300)
+
+    history = []
+    for i in range(200):
+        history += [
+            {"role": "user", "content": f"Tell me fact number {i} about the ocean"},
+            {"role": "assistant", "content": f"Ocean fact {i}: it is very deep and very wide."},
+        ]
+
+    agent = conversational.create_conversational_agent(memory_mode="full")
+    result = agent.invoke({"messages": history, "current_question": "Summarize the facts?"})
+
+    answer_prompt = next(p for p in prompts if "continuing a conversation" in p)
+    report = result["context_tokens"]
+    assert report["budget"] == 300
+    assert report["total"] <= 300
+    assert estimate_tokens(answer_prompt) <= 310
+    assert "history" in report["truncated"]
+    # Newest turns kept, oldest dropped
+    assert "Ocean fact 199" in answer_prompt
+    assert "fact number 0 " not in answer_prompt
+
+
+def test_session_store_lets_turns_send_only_the_question(tmp_path, monkeypatch):
+    from utils.session_store import SessionHistory, SessionStore
+
+    prompts = []
+
+    def fake_generate(model, prompt, options=None, **_):
+        prompts.append(prompt)
+        if "running summary" in prompt:
+            return {"response": "Earlier: the user counted upwards."}
+        return {"response": f"answer {len(prompts)}"}
+
+    use_fake_client(monkeypatch, fake_generate)
+
+    path = str(tmp_path / "sessions.sqlite3")
+    thread = {"configurable": {"thread_id": "user-42"}}
+    worker_a = conversational.create_conversational_agent(
+        window_turns=2, session_store=SessionStore(path)
+    )
+    for i in range(5):
+        result = worker_a.invoke({"current_question": f"count {i}"}, thread)
+
+    assert isinstance(result["messages"], SessionHistory)
+    assert len(result["messages"]) == 10
+    assert result["summarized_count"] == 6
+
+    # A different worker (new store connection) picks the session up
+    store_b = SessionStore(path)
+    fetched = []
+    original_fetch = store_b.fetch
+    monkeypatch.setattr(
+        store_b, "fetch", lambda *args: fetched.append(args[1:]) or original_fetch(*args)
+    )
+    worker_b = conversational.create_conversational_agent(window_turns=2, session_store=store_b)
+    prompts.clear()
+    result = worker_b.invoke({"current_question": "count 5"}, thread)
+
+    assert result["session_id"] == "user-42"
+    assert len(result["messages"]) == 12
+    assert result["messages"][-2] == {"role": "user", "content": "count 5"}
+    assert "Earlier: the user counted upwards." in prompts[0]
+    # Only windows/fold ranges were read, never the whole log from seq 0
+    assert all(start > 0 for start, _ in fetched)
+
+    other = worker_b.invoke({"current_question": "hello"}, {"configurable": {"thread_id": "other"}})
+    assert len(other["messages"]) == 2
+
+
+def test_speculative_branch_is_used_on_hit_and_discarded_on_miss(monkeypatch):
+    import time
+
+    from agents.speculation import speculator
+
+    searches = []
+
+    def fake_search(query):
+        time.sleep(0.02)  # overlaps the router call
+        searches.append(query)
+        return f"search results stub for {query}"
+
+    def fake_generate(model, prompt, options=None, **_):
+        if "Respond with ONLY ONE WORD" in prompt:
+            time.sleep(0.02)
+            return {"response": "direct" if "poem" in prompt else "search"}
+        if "Information gathered from tools" in prompt:
+            return {"response": "synthesized"}
+        return {"response": "direct answer"}
+
+    use_fake_client(monkeypatch, fake_generate)
+    monkeypatch.setattr(multi_tool, "search_web", fake_search)
+    speculator.reset()
+
+    agent = multi_tool.create_multi_tool_agent(
+        speculate=True, synthesis_strategies={"search": "llm"}
+    )
+
+    # "who is" is only a weak search hint: the LLM router decides, search runs alongside
+    hit = agent.invoke({"question": "Who is the CEO of OpenAI?"})
+    assert hit["tool_choice"] == "search" and hit["speculation"] == "hit"
+    assert hit["tool_output"].startswith("search results stub")
+    assert hit["final_answer"] == "synthesized"
+    assert len(searches) == 1  # the search node didn't run it again
+
+    miss = agent.invoke({"question": "Write a poem about the recent rain"})
+    assert miss["tool_choice"] == "direct" and miss["speculation"] == "miss"
+    assert "tool_output" not in miss or not miss["tool_output"].startswith("search")
+    assert miss["final_answer"] == "direct answer"
+
+    stats = speculator.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["saved_ms"] > 0
+
+
+def test_async_speculation_cancels_losing_branch_and_respects_budget(monkeypatch):
+    import asyncio
+
+    from agents.speculation import Speculator
+
+    cancelled = []
+
+    async def slow_branch():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return {"tool_output": "late"}
+
+    async def route():
+        await asyncio.sleep(0.01)
+        return {"tool_choice": "direct", "route_source": "llm"}
+
+    spec = Speculator(max_inflight=1)
+
+    async def run():
+        decision, update, outcome = await spec.arun("search", route, slow_branch)
+        await asyncio.sleep(0)  # let the cancellation land
+        return decision, update, outcome
+
+    decision, update, outcome = asyncio.run(run())
+    assert (decision["tool_choice"], update, outcome) == ("direct", None, "miss")
+    assert cancelled == [True]
+    assert spec.stats()["cancelled"] == 1 and spec.stats()["inflight"] == 0
+
+    no_budget = Speculator(max_inflight=0)
+    _, _, outcome = asyncio.run(no_budget.arun("search", route, slow_branch))
+    assert outcome == "skipped"
+    assert no_budget.stats()["skipped_budget"] == 1
+
+
+def test_vector_memory_without_session_id_does_not_leak_between_callers(monkeypatch):
+    from utils.vector_store import HashingEmbedder, VectorMemory
+
+    use_fake_client(monkeypatch, lambda model, prompt, options=None, **_: {"response": "Noted."})
+    memory = VectorMemory(embedder=HashingEmbedder(dim=128))
+    agent = conversational.create_conversational_agent(
+        memory_mode="vector", window_turns=0, vector_memory=memory
+    )
+
+    first = agent.invoke({"messages": [], "current_question": "My bank PIN is 4821"})
+    agent.invoke({"messages": first["messages"], "current_question": "Remember that"})
+
+    other = agent.invoke({"messages": [], "current_question": "What is my bank PIN?"})
+    assert "4821" not in other["retrieved_context"]
+    assert memory.stats()["turns"] == 0
+
+    mine = [
+        {"role": "user", "content": "I like hiking in the Alps"},
+        {"role": "assistant", "content": "Noted."},
+    ]
+    again = agent.invoke({"messages": mine, "current_question": "Where do I like hiking?"})
+    assert "Alps" in again["retrieved_context"]
+
+
+def test_conversation_returns_plain_json_messages_and_reuses_them(monkeypatch):
+    use_fake_client(monkeypatch, lambda model, prompt, options=None, **_: {"response": "ok"})
+    agent = conversational.create_conversational_agent(memory_mode="full")
+
+    first = agent.invoke({"messages": [], "current_question": "hi"})
+    assert json.loads(json.dumps(first["messages"])) == [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "ok"},
+    ]
+
+    # Passed back unchanged, the next turn appends to the same buffer
+    second = agent.invoke({"messages": first["messages"], "current_question": "again"})
+    assert second["messages"].log._buffer is first["messages"].log._buffer
+    assert len(second["messages"]) == 4
+
+    # Edits made by the caller are respected
+    edited = second["messages"]
+    edited[-1]["content"] = "changed"
+    third = agent.invoke({"messages": edited, "current_question": "more"})
+    assert third["messages"][3] == {"role": "assistant", "content": "changed"}
+
+
+def test_model_profiles_tier_nodes_and_are_recorded(monkeypatch, tmp_path):
+    import json
+
+    from utils.profiles import ModelProfiles, parse_node_models, set_model_profiles
+
+    calls = []
+
+    def fake_generate(model, prompt, options=None, **_):
+        calls.append((model, options))
+        if "Respond with ONLY ONE WORD" in prompt:
+            return {"response": "search"}
+        return {"response": "Synthesized"}
+
+    path = tmp_path / "profiles.json"
+    path.write_text(json.dumps({
+        "fast": {"router": {"model": "qwen2.5:0.5b", "options": {"num_predict": 3}}},
+        "quality": {},
+    }))
+    monkeypatch.setattr(Config, "MODEL_PROFILES_PATH", str(path))
+    monkeypatch.setattr(Config, "MODEL_PROFILE", "fast")
+    monkeypatch.setattr(Config, "NODE_MODELS", "synthesizer=llama3:70b")
+    monkeypatch.setattr(multi_tool, "search_web", lambda query: "search results stub")
+    use_fake_client(monkeypatch, fake_generate)
+    set_model_profiles(None)
+    try:
+        agent = multi_tool.create_multi_tool_agent(synthesis_strategies={"search": "llm"})
+        result = agent.invoke({"question": "Who runs the biggest chip maker?"})
+    finally:
+        set_model_profiles(None)
+
+    assert calls[0] == ("qwen2.5:0.5b", {"temperature": 0.1, "num_predict": 3})
+    assert calls[1][0] == "llama3:70b"
+    assert result["profiles"]["router"]["model"] == "qwen2.5:0.5b"
+    assert result["profiles"]["router"]["profile"] == "fast"
+    assert result["profiles"]["synthesizer"]["model"] == "llama3:70b"
+
+    assert parse_node_models("router=qwen2.5:0.5b, answer=llama3") == {
+        "router": "qwen2.5:0.5b",
+        "answer": "llama3",
+    }
+    with pytest.raises(ValueError):
+        ModelProfiles({"fast": {"routr": {"model": "x"}}}, active="fast")
+
+
+def test_rolling_memory_folds_only_the_turn_leaving_the_window(monkeypatch):
+    folds = []
+
+    def fake_generate(model, prompt, options=None, **_):
+        if "running summary" in prompt:
+            folds.append(prompt)
+            return {"response": f"Summary after {len(folds)} folds."}
+        return {"response": "A short answer."}
+
+    use_fake_client(monkeypatch, fake_generate)
+    agent = conversational.create_conversational_agent(memory_mode="rolling", window_turns=2)
+
+    memory = {"messages": []}
+    for turn in range(12):
+        before = len(folds)
+        result = agent.invoke({**memory, "current_question": f"Question number {turn}?"})
+        memory = {k: result[k] for k in ("messages", "summary", "summarized_count") if k in result}
+
+        # Once the window is full, each slide folds exactly the one turn that left it
+        assert len(folds) - before == (1 if turn >= 2 else 0)
+        if turn >= 2:
+            assert f"Question number {turn - 2}?" in folds[-1]
+            assert f"Question number {turn - 3}?" not in folds[-1]
+
+    assert memory["summarized_count"] == 20
+
+
+def test_batch_router_chunks_respect_max_concurrency(monkeypatch):
+    import asyncio
+
+    from agents import batch as batch_module
+
+    in_flight = {"now": 0, "peak": 0, "router_calls": 0}
+
+    async def fake_agenerate(self, model, prompt, options=None, **_):
+        in_flight["now"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        try:
+            await asyncio.sleep(0.01)
+            if "one line per question" in prompt:
+                in_flight["router_calls"] += 1
+                return {"response": "\n".join(f"{i}: direct" for i in range(1, 3))}
+            return {"response": "Direct response"}
+        finally:
+            in_flight["now"] -= 1
+
+    monkeypatch.setattr(Config, "FAST_ROUTER_ENABLED", False)
+    monkeypatch.setattr(ollama.AsyncClient, "generate", fake_agenerate)
+
+    questions = [f"Tell me something interesting #{i}" for i in range(20)]
+    results = batch_module.batch(questions, max_concurrency=3, router_batch_size=2)
+
+    assert in_flight["router_calls"] == 10
+    assert in_flight["peak"] <= 3
+    assert all(r["final_answer"] == "Direct response" for r in results)
+
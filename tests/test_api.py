@@ -0,0 +1,207 @@
+import asyncio
+import json
+import sys
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("langgraph")
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from fastapi.testclient import TestClient
+
+from api import server
+from utils import llm
+from utils.config import Config
+from utils.session_store import SessionStore
+
+
+def fake_generate(model, prompt, options=None, **_):
+    if "Respond with ONLY ONE WORD" in prompt:
+        return {"response": "direct"}
+    return {"response": "Paris is the capital of France."}
+
+
+async def fake_agenerate(model, prompt, options=None, stream=False, **_):
+    if stream:
+        async def chunks():
+            for word in ["Paris ", "is ", "lovely."]:
+                yield {"response": word}
+
+        return chunks()
+    return fake_generate(model, prompt, options)
+
+
+def sse_events(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    monkeypatch.setattr(llm, "_client", SimpleNamespace(generate=fake_generate))
+    monkeypatch.setattr(llm, "_async_client", SimpleNamespace(generate=fake_agenerate))
+
+
+def test_api_answers_streams_and_keeps_chat_sessions(fake_llm, monkeypatch):
+    monkeypatch.setattr(Config, "check_ollama", classmethod(lambda cls: True))
+    from agents.conversational import create_conversational_agent
+
+    store = SessionStore()
+    app = server.create_app(
+        conversational_agent=create_conversational_agent(session_store=store),
+        streaming_conversational_agent=create_conversational_agent(
+            session_store=store, stream_tokens=True
+        ),
+    )
+    with TestClient(app) as client:
+        assert client.get("/healthz").json() == {"status": "ok"}
+        ready = client.get("/readyz")
+        assert ready.status_code == 200 and ready.json()["ollama"] is True
+
+        answer = client.post("/v1/ask", json={"question": "What is the capital of France?"})
+        assert answer.status_code == 200
+        assert answer.json()["final_answer"] == "Paris is the capital of France."
+
+        streamed = client.post("/v1/ask", json={"question": "Tell me about Paris", "stream": True})
+        assert streamed.headers["content-type"].startswith("text/event-stream")
+        events = sse_events(streamed.text)
+        tokens = [data["token"] for event, data in events if event == "token"]
+        assert "".join(tokens) == "Paris is lovely."
+        assert events[-1][0] == "result"
+
+        for question in ["Hi, I'm Ada", "What's my name?"]:
+            chat = client.post("/v1/chat", json={"question": question, "session_id": "ada"})
+            assert chat.status_code == 200 and chat.json()["session_id"] == "ada"
+
+        chat = client.post(
+            "/v1/chat", json={"question": "Thanks", "session_id": "ada", "stream": True}
+        )
+        events = sse_events(chat.text)
+        nodes = [data["node"] for event, data in events if event == "node"]
+        assert nodes[0] == "load_session" and "answer_question" in nodes
+        tokens = [data["token"] for event, data in events if event == "token"]
+        assert "".join(tokens) == "Paris is lovely."
+        assert events[-1][1]["session_id"] == "ada"
+
+        # Without a session_id every call gets a fresh, private session
+        first = client.post("/v1/chat", json={"question": "My PIN is 4821"}).json()
+        second = client.post("/v1/chat", json={"question": "What is my PIN?"}).json()
+        assert first["session_id"] and first["session_id"] != second["session_id"]
+        assert store.count(second["session_id"]) == 2
+
+        assert client.post("/v1/ask", json={"question": ""}).status_code == 422
+
+        exposition = client.get("/metrics")
+        assert exposition.headers["content-type"].startswith("text/plain")
+        assert 'agent_node_runs_total{graph="conversational",node="load_session",status="ok"}' in (
+            exposition.text
+        )
+
+    # Readiness follows Ollama
+    monkeypatch.setattr(Config, "check_ollama", classmethod(lambda cls: False))
+    with TestClient(app) as client:
+        assert client.get("/readyz").status_code == 503
+
+
+def test_api_sheds_load_with_429_when_queue_is_full(fake_llm):
+    release = threading.Event()
+    started = threading.Event()
+
+    class SlowAgent:
+        async def ainvoke(self, state):
+            started.set()
+            await asyncio.to_thread(release.wait, 5)
+            return {"question": state["question"], "final_answer": "done"}
+
+    app = server.create_app(
+        multi_tool_agent=SlowAgent(),
+        streaming_agent=SlowAgent(),
+        conversational_agent=SlowAgent(),
+        max_concurrency=1,
+        max_queue=0,
+    )
+    with TestClient(app) as client:
+        results = []
+        first = threading.Thread(
+            target=lambda: results.append(client.post("/v1/ask", json={"question": "slow"}))
+        )
+        first.start()
+        assert started.wait(5)
+
+        busy = client.post("/v1/ask", json={"question": "another"})
+        assert busy.status_code == 429 and busy.headers["retry-after"] == "1"
+
+        release.set()
+        first.join()
+        assert results[0].json()["final_answer"] == "done"
+        assert client.post("/v1/ask", json={"question": "again"}).status_code == 200
+
+        stats = app.state.admission.stats()
+        assert stats["rejected"] == 1 and stats["completed"] == 2
+        assert stats["running"] == 0 and stats["waiting"] == 0
+
+
+def test_api_releases_queue_place_when_client_leaves_before_stream_starts(fake_llm):
+    class StreamingAgent:
+        async def astream(self, state, stream_mode=None):
+            yield "custom", {"node": "direct", "token": "hi"}
+            yield "values", {"question": state["question"], "final_answer": "hi"}
+
+    app = server.create_app(
+        multi_tool_agent=StreamingAgent(),
+        streaming_agent=StreamingAgent(),
+        conversational_agent=StreamingAgent(),
+        max_concurrency=1,
+        max_queue=1,
+    )
+    body = json.dumps({"question": "hello", "stream": True}).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/v1/ask",
+        "raw_path": b"/v1/ask",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json")],
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+
+    async def disconnecting_request():
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+        async def receive():
+            return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                raise OSError("client went away")
+
+        try:
+            await app(scope, receive, send)
+        except Exception:
+            pass
+
+    with TestClient(app) as client:
+        for _ in range(3):
+            client.portal.call(disconnecting_request)
+
+        stats = app.state.admission.stats()
+        assert stats["waiting"] == 0 and stats["running"] == 0
+
+        streamed = client.post("/v1/ask", json={"question": "hello", "stream": True})
+        assert streamed.status_code == 200
+        result = sse_events(streamed.text)[-1]
+        assert result == ("result", {"question": "hello", "final_answer": "hi"})
@@ -0,0 +1,232 @@
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from tools.search import WebSearchTool
+from tools.search_cache import FRESH, SearchCache
+
+
+class FakeTavily:
+    def __init__(self, results=None, error=None):
+        self.results = results if results is not None else [{"title": "T", "content": "v1"}]
+        self.error = error
+        self.calls = 0
+
+    def search(self, query, max_results, search_depth):
+        self.calls += 1
+        if self.error:
+            raise RuntimeError(self.error)
+        return {"results": self.results}
+
+
+def test_search_cache_serves_normalized_repeats_and_persists(tmp_path):
+    path = str(tmp_path / "search.sqlite3")
+    client = FakeTavily()
+    tool = WebSearchTool(client=client, cache=SearchCache(path=path))
+
+    first = tool.search("LangGraph news")
+    assert tool.search("  langgraph   NEWS? ") == first
+    assert client.calls == 1
+
+    # A new process only has the persistent tier
+    restarted = SearchCache(path=path)
+    assert restarted.get(SearchCache.make_key("langgraph news", 3)) == (first, FRESH)
+
+
+def test_search_cache_prunes_expired_rows_and_caps_the_persistent_tier(tmp_path, monkeypatch):
+    path = str(tmp_path / "search.sqlite3")
+    now = [1000.0]
+    monkeypatch.setattr("tools.search_cache.time.time", lambda: now[0])
+    cache = SearchCache(path=path, ttl_seconds=10, stale_seconds=100, max_disk_entries=3)
+
+    cache.set("old", "v")
+    now[0] += 200  # past ttl + stale window
+    for key in ["a", "b", "c", "d"]:
+        cache.set(key, "v")
+        now[0] += 1
+
+    # "old" expired and was pruned; "a" is the oldest row over the cap
+    stats = cache.stats()
+    assert stats["disk_size"] == 3
+    assert stats["disk_expired"] == 1 and stats["disk_evictions"] == 1
+    restarted = SearchCache(path=path, ttl_seconds=10, stale_seconds=100)
+    assert restarted.stats()["disk_size"] == 3
+    assert restarted.get("a") == (None, None) and restarted.get("d") == ("v", FRESH)
+
+
+def test_search_cache_stale_while_revalidate(monkeypatch):
+    client = FakeTavily()
+    cache = SearchCache(ttl_seconds=10, stale_seconds=100)
+    tool = WebSearchTool(client=client, cache=cache)
+
+    original = tool.search("python release")
+    client.results = [{"title": "T", "content": "v2"}]
+
+    now = time.time()
+    monkeypatch.setattr("tools.search_cache.time.time", lambda: now + 50)
+    assert tool.search("python release") == original  # stale copy returned at once
+
+    deadline = time.time() + 2
+    while cache.stats().get("refreshes", 0) < 1 and time.time() < deadline:
+        time.sleep(0.01)
+    assert client.calls == 2
+    assert "v2" in tool.search("python release")
+
+
+def test_search_cache_does_not_store_errors_or_empty_results():
+    failing = FakeTavily(error="boom")
+    tool = WebSearchTool(client=failing, cache=SearchCache())
+    assert tool.search("q").startswith("Search error")
+    tool.search("q")
+    assert failing.calls == 2
+
+    empty = FakeTavily(results=[])
+    tool = WebSearchTool(client=empty, cache=SearchCache())
+    assert tool.search("q") == "No results found."
+    tool.search("q")
+    assert empty.calls == 2
+
+
+def test_async_search_uses_async_client_and_cache():
+    import asyncio
+
+    class FakeAsyncTavily(FakeTavily):
+        async def search(self, query, max_results, search_depth):
+            return FakeTavily.search(self, query, max_results, search_depth)
+
+    client = FakeAsyncTavily()
+    tool = WebSearchTool(async_client=client, cache=SearchCache())
+
+    async def run():
+        return [await tool.asearch("LangGraph news") for _ in range(3)]
+
+    results = asyncio.run(run())
+    assert results[0] == results[2]
+    assert "v1" in results[0]
+    assert client.calls == 1
+
+
+def test_concurrent_identical_searches_share_one_request():
+    import threading
+
+    from utils.single_flight import SingleFlight
+
+    class SlowTavily(FakeTavily):
+        def search(self, query, max_results, search_depth):
+            time.sleep(0.05)
+            return super().search(query, max_results, search_depth)
+
+    client = SlowTavily()
+    tool = WebSearchTool(client=client, flight=SingleFlight())
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda q=q: results.append(tool.search(q)))
+        for q in ["trending topic", "Trending  topic?", "trending topic", "other topic"]
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert client.calls == 2
+    assert len(results) == 4 and all("v1" in r for r in results)
+    assert tool.flight.stats()["coalesced"] == 2
+
+
+def test_calculator_supports_functions_and_caret_without_eval():
+    from tools.calculator import calculate
+
+    assert calculate("2^10") == "1024"
+    # ^ binds like **, tighter than + and * and unary minus
+    assert calculate("2^10 + 5") == "1029"
+    assert calculate("3*2^2") == "12"
+    assert calculate("-2^2") == "-4"
+    assert calculate("max(3, 7) * abs(-2)") == "14"
+    assert calculate("sum(1, 2, 3) + sum([4, 5])") == "15"
+    assert calculate("round(10 / 3, 1)") == "3.30"
+    assert calculate("10 / 0") == "Error: Division by zero"
+    assert calculate("__import__('os').system('true')").startswith("Error")
+    assert calculate("(1).__class__").startswith("Error")
+
+
+def test_calculator_rejects_pathological_inputs_quickly():
+    from tools.calculator import calculate
+
+    start = time.perf_counter()
+    results = [
+        calculate("9**9**9**9"),
+        calculate("10**299 * 10**299"),
+        calculate("2 ** 100000"),
+        calculate("-(" * 200 + "1" + ")" * 200),
+        calculate("round(1, -10000000)"),
+    ]
+    elapsed = time.perf_counter() - start
+
+    assert all(r.startswith("Error") for r in results)
+    assert elapsed < 0.5
+
+    # Long flat chains are bounded by the operand count, not the depth guard
+    assert calculate(" + ".join(str(i) for i in range(1, 151))) == "11325"
+    assert calculate(" - ".join(["1"] * 150)) == "-148"
+    assert calculate(" + ".join(["1"] * 201)) == "Error: Too many operands (max 200)"
+    assert calculate("round(1, -101)") == "Error: round() digits are too large (max 100)"
+    assert calculate("round(123456, -2)") == "123500"
+
+
+def test_expression_extractor_parses_natural_language_math():
+    from tools.expression_parser import extract_expression
+
+    assert extract_expression("What is 157 * 23?") == "157 * 23"
+    assert extract_expression("157 times 23") == "157 * 23"
+    assert extract_expression("What is 2 to the power of 10?") == "2 ** 10"
+    assert extract_expression("What's 15% of 240?") == "(15 / 100 * 240)"
+    assert extract_expression("What is the sum of 3, 4 and 5?") == "sum(3, 4, 5)"
+    assert extract_expression("How much is 1,250 divided by 5?") == "1250 / 5"
+    assert extract_expression("How many legs does a spider have?") is None
+
+
+def test_bulk_math_aggregates_lists_ranges_and_vectors():
+    from tools.calculator import calculate_bulk
+
+    numbers = ", ".join(str(i) for i in range(1, 5001))
+    result = calculate_bulk(f"What is the mean and std of these 5,000 numbers: {numbers}")
+    assert result == "mean(5000 values) = 2500.50; std(5000 values) = 1443.38"
+
+    assert calculate_bulk("Sum of the numbers from 1 to 1,000,000") == (
+        "sum(1..1000000) = 500000500000"
+    )
+    # Closed-form range moments match the materialized list
+    assert calculate_bulk("variance and std of 1 to 10000") == calculate_bulk(
+        "variance and std of: " + " ".join(str(i) for i in range(1, 10001))
+    ).replace("10000 values", "1..10000")
+    assert calculate_bulk("sum of 1 to 10000") == "sum(1..10000) = 50005000"
+    assert calculate_bulk("median and 90th percentile of 0 to 100") == (
+        "median(0..100) = 50; p90(0..100) = 90"
+    )
+    assert calculate_bulk("Dot product of [1, 2, 3] and [4, 5, 6]") == "dot(3-vectors) = 32"
+    assert calculate_bulk("Dot product of [1, 2] and [4, 5, 6]").startswith("Error")
+    assert calculate_bulk("sum of 1 to 10000000000").startswith("Error: Range is too long")
+    # Decimal bounds aren't split into integer ranges; thousands separators stay in numbers
+    assert calculate_bulk("sum of 1.5 to 3.5") == "Error: Range bounds must be whole numbers"
+    assert calculate_bulk("sum of 1 to 3.5") == "Error: Range bounds must be whole numbers"
+    assert calculate_bulk("max and std of: 1,000, 2,000, 3,000") == (
+        "std(3 values) = 816.50; max(3 values) = 3000"
+    )
+    assert calculate_bulk("sum of 1..10") == "sum(1..10) = 55"
+    # Range sums stay exact beyond int64 and huge bounds don't raise
+    assert calculate_bulk("sum of 10000000000000000 to 10000000000999999") == (
+        "sum(10000000000000000..10000000000999999) = 10000000000499999500000"
+    )
+    big = 10 ** 400
+    assert calculate_bulk(f"sum and count of {big} to {big + 9}") == (
+        f"sum({big}..{big + 9}) = {10 * big + 45}; count({big}..{big + 9}) = 10"
+    )
+    assert calculate_bulk(f"mean of {big} to {big + 9}") == "Error: Result is too large"
+
+    # Short plain sums and ordinary arithmetic stay on the scalar path
+    assert calculate_bulk("What is the sum of 3, 4 and 5?") is None
+    assert calculate_bulk("What is 157 * 23?") is None
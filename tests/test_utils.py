@@ -0,0 +1,655 @@
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+ollama = pytest.importorskip("ollama")
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from utils import llm
+from utils.llm_cache import LLMCache
+from utils.messages import Message, MessageList, MessageLog, append_messages
+from utils.tokens import (
+    DROP_OLDEST,
+    KEEP,
+    TRUNCATE_TAIL,
+    Section,
+    estimate_tokens,
+    fit_sections,
+    truncate_to_tokens,
+)
+from utils.vector_store import HashingEmbedder, VectorMemory, VectorStore
+
+
+def use_fake_client(monkeypatch, generate):
+    """Route the shared LLM client's generate() to a fake."""
+    monkeypatch.setattr(llm, "_client", SimpleNamespace(generate=generate))
+
+
+def test_llm_cache_lru_ttl_and_temperature_policy(tmp_path, monkeypatch):
+    cache = LLMCache(path=str(tmp_path / "cache.sqlite3"), max_entries=2, ttl_seconds=60)
+
+    assert cache.is_cacheable({"temperature": 0.1})
+    assert not cache.is_cacheable({"temperature": 0.7})
+    assert not cache.is_cacheable(None)
+
+    keys = [cache.make_key("mistral", f"prompt {i}", {"temperature": 0.1}) for i in range(3)]
+    cache.set(keys[0], {"response": "a"})
+    cache.set(keys[1], {"response": "b"})
+    assert cache.get(keys[0]) == {"response": "a"}  # keys[0] is now most recent
+    cache.set(keys[2], {"response": "c"})
+
+    assert len(cache) == 2
+    assert cache.get(keys[1]) is None  # least recently used was evicted
+    assert cache.get(keys[2]) == {"response": "c"}
+
+    now = __import__("time").time()
+    monkeypatch.setattr("utils.llm_cache.time.time", lambda: now + 120)
+    assert cache.get(keys[2]) is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["evictions"] == 1 and stats["expired"] == 1
+    assert stats["bypassed"] == 2
+
+
+def test_generate_skips_model_on_repeated_deterministic_prompt(monkeypatch):
+    calls = []
+
+    def fake_generate(model, prompt, options=None, **_):
+        calls.append(prompt)
+        return {"response": f"answer {len(calls)}"}
+
+    use_fake_client(monkeypatch, fake_generate)
+    llm.set_llm_cache(LLMCache())
+    try:
+        first = llm.generate("mistral", "route me", {"temperature": 0.1})
+        second = llm.generate("mistral", "route me", {"temperature": 0.1})
+        creative = llm.generate("mistral", "route me", {"temperature": 0.7})
+    finally:
+        llm.set_llm_cache(None)
+
+    assert first["response"] == second["response"] == "answer 1"
+    assert creative["response"] == "answer 2"
+    assert len(calls) == 2
+
+
+def test_vector_store_persists_append_only_and_reloads_with_memmap(tmp_path):
+    embedder = HashingEmbedder(dim=64)
+    texts = ["the cat sat on the mat", "stock prices fell today", "python list comprehension"]
+    store = VectorStore(64, path=str(tmp_path))
+    store.add(embedder.embed(texts[:2]), [{"text": t} for t in texts[:2]])
+
+    reloaded = VectorStore(64, path=str(tmp_path))
+    assert len(reloaded) == 2
+    assert isinstance(reloaded._vectors, np.memmap)
+
+    reloaded.add(embedder.embed(texts[2:]), [{"text": texts[2]}])
+    hits = VectorStore(64, path=str(tmp_path)).search(embedder.embed(["python lists"])[0], k=1)
+    assert hits[0]["text"] == "python list comprehension"
+
+    with pytest.raises(ValueError):
+        VectorStore(32, path=str(tmp_path))
+
+
+def test_vector_store_lsh_search_agrees_with_brute_force():
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((3000, 32)).astype(np.float32)
+    payloads = [{"id": i} for i in range(len(vectors))]
+    exact = VectorStore(32, approximate_threshold=10**9)
+    approx = VectorStore(32, approximate_threshold=100, lsh_tables=8, lsh_bits=8)
+    exact.add(vectors, payloads)
+    approx.add(vectors, payloads)
+
+    found = 0
+    for i in range(50):
+        query = vectors[i] + 0.05 * rng.standard_normal(32).astype(np.float32)
+        assert exact.search(query, k=1)[0]["id"] == i
+        found += approx.search(query, k=1)[0]["id"] == i
+    assert found >= 45
+
+
+def test_vector_memory_embeds_each_turn_once():
+    class CountingEmbedder(HashingEmbedder):
+        calls = 0
+
+        def embed(self, texts):
+            CountingEmbedder.calls += len(texts)
+            return super().embed(texts)
+
+    memory = VectorMemory(embedder=CountingEmbedder(dim=256))
+    messages = []
+    for topic in ["gardening tomatoes", "rust borrow checker", "paris travel tips"]:
+        messages += [
+            {"role": "user", "content": f"Tell me about {topic}"},
+            {"role": "assistant", "content": f"Here is info on {topic}"},
+        ]
+        memory.sync("s1", messages)
+
+    assert memory.stats()["embedded"] == 3
+    assert CountingEmbedder.calls == 3
+    hits = memory.search("s1", "how does the borrow checker work?", k=1)
+    assert hits[0]["turn"] == 1
+    assert memory.search("other-session", "anything") == []
+
+
+def test_fit_sections_applies_priorities_and_truncation_policies():
+    assert estimate_tokens("") == 0
+    assert 8 <= estimate_tokens("The quick brown fox jumps over the lazy dog.") <= 12
+    cut = truncate_to_tokens("one two three four five six seven eight", 4)
+    assert cut.endswith("…") and estimate_tokens(cut) <= 4
+
+    messages = [f"User: message number {i}" for i in range(50)]
+    rendered, report = fit_sections(
+        [
+            Section("history", messages, priority=2, policy=DROP_OLDEST),
+            Section("question", ["What did I say last? " * 5], priority=0, policy=KEEP),
+            Section("context", ["background " * 20], priority=1, policy=TRUNCATE_TAIL),
+            Section("summary", ["older summary " * 50], priority=3, policy=TRUNCATE_TAIL),
+        ],
+        budget=120,
+        reserved=10,
+    )
+
+    assert report["total"] <= 120
+    assert report["template"] == 10
+    assert report["question"] == estimate_tokens(rendered["question"])
+    assert rendered["question"].count("What did I say last?") == 5
+    assert rendered["context"] == "background " * 20
+    # The newest messages survive, the oldest go first; nothing left for the summary
+    assert rendered["history"].endswith("message number 49")
+    assert "message number 0\n" not in rendered["history"]
+    assert rendered["summary"] == ""
+    assert report["truncated"] == ["history", "summary"]
+
+
+def test_message_log_appends_without_copying_or_changing_old_views():
+    first = append_messages([], [{"role": "user", "content": "hi"}])
+    assert isinstance(first, MessageLog)
+    assert first[0] == {"role": "user", "content": "hi"}
+    assert first[0]["role"] is Message("user", "")["role"]  # interned role
+
+    turn = [Message("assistant", "hello")]
+    second = append_messages(first, turn)
+    again = first.extend(turn)  # same objects: shares the buffer
+    assert second._buffer is first._buffer is again._buffer
+    assert len(first) == 1 and len(second) == 2
+
+    # Appending something else to an old view branches instead of clobbering
+    branch = first.extend([{"role": "assistant", "content": "bye"}])
+    assert branch[-1].content == "bye"
+    assert second[-1].content == "hello"
+    assert second.to_list() == [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+
+    # History passed back in from an earlier result is adopted, not copied
+    assert append_messages([], second) is second
+
+    # Graph output is plain dicts that still carry the log for the next turn
+    plain = second.to_list()
+    assert isinstance(plain, MessageList) and type(plain[0]) is dict
+    assert json.loads(json.dumps(plain)) == plain
+    assert plain.as_log() is second
+    plain[-1]["content"] = "edited"
+    assert plain.as_log() is not second and plain.as_log()[-1].content == "edited"
+
+
+def test_context_reuse_prefills_static_prefix_once_and_extends_sessions(monkeypatch):
+    from utils.context_reuse import ContextReuse, get_context_reuse, set_context_reuse
+
+    calls = []
+
+    def fake_generate(model, prompt, options=None, context=None, raw=False, **_):
+        calls.append({"prompt": prompt, "context": context, "raw": raw})
+        tokens = prompt.split()
+        return {
+            "response": "ok",
+            "context": list(context or []) + tokens + ["<gen>"],
+            "eval_count": 1,
+            "prompt_eval_count": len(tokens),
+            "prompt_eval_duration": 1_000_000 * len(tokens),
+        }
+
+    use_fake_client(monkeypatch, fake_generate)
+    set_context_reuse(
+        ContextReuse(raw_formats={"m": "[INST] {prompt} [/INST]", "chat": "<u>{prompt}<a>"})
+    )
+    llm.reset_prefill_stats()
+    try:
+        prefix = "Long static routing instructions.\n\n"
+        for question in ("one?", "two?"):
+            llm.generate("m", prefix + f"Question: {question}", reuse_key="template:router", prefix=prefix)
+
+        # First call primes the prefix, then only the per-question tail is sent
+        assert calls[0] == {"prompt": "[INST] " + prefix, "context": None, "raw": True}
+        assert calls[1]["prompt"] == "Question: one? [/INST]"
+        assert calls[1]["context"] == ["[INST]", "Long", "static", "routing", "instructions."]
+        assert calls[2]["prompt"] == "Question: two? [/INST]"
+        assert calls[2]["context"] == calls[1]["context"]
+
+        # A growing transcript extends the cached context with the new part only
+        calls.clear()
+        history = "User: hi\nAssistant: hello"
+        llm.generate("m", history + "\nQ: a", reuse_key="session:s", prefix=history)
+        grown = history + "\nUser: more\nAssistant: sure"
+        llm.generate("m", grown + "\nQ: b", reuse_key="session:s", prefix=grown)
+        assert calls[2]["prompt"] == "\nUser: more\nAssistant: sure"
+        assert calls[2]["context"] == calls[1]["context"]
+
+        # A rewritten transcript invalidates the entry and re-primes
+        llm.generate("m", "Summary: x\nQ: c", reuse_key="session:s", prefix="Summary: x")
+        assert calls[4]["context"] is None
+
+        stats = get_context_reuse().stats()
+        assert stats["hits"] == 1 and stats["extends"] == 1
+        assert stats["primes"] == 3 and stats["invalidations"] == 1
+        assert llm.prefill_stats()["request_calls"] == 5
+
+        # Each model gets its own wrapper; models without one skip reuse
+        calls.clear()
+        llm.generate("chat:7b", prefix + "Question: one?", reuse_key="template:router", prefix=prefix)
+        assert calls[0]["prompt"] == "<u>" + prefix and calls[1]["prompt"] == "Question: one?<a>"
+        calls.clear()
+        llm.generate("other", prefix + "Question: one?", reuse_key="template:router", prefix=prefix)
+        assert calls == [{"prompt": prefix + "Question: one?", "context": None, "raw": False}]
+        assert get_context_reuse().stats()["unsupported"] == 1
+    finally:
+        set_context_reuse(None)
+
+
+def test_backend_pool_prefers_least_outstanding_by_weight_and_sticks_sessions():
+    from utils.backends import Backend, BackendPool
+
+    a, b = Backend("http://a", weight=2), Backend("http://b", weight=1)
+    pool = BackendPool([a, b])
+
+    held = [pool.acquire() for _ in range(3)]
+    assert held == [a, b, a]
+    for backend in held:
+        pool.release(backend)
+
+    first = pool.acquire(session="chat-1")
+    pool.release(first)
+    for _ in range(3):
+        backend = pool.acquire(session="chat-1")
+        assert backend is first
+        pool.release(backend)
+    assert pool.stats()["sticky"] == 3
+
+
+def test_backend_pool_caps_outstanding_calls_per_backend():
+    import asyncio
+    import threading
+
+    from utils.backends import Backend, BackendPool
+
+    a, b = Backend("http://a"), Backend("http://b")
+    pool = BackendPool([a, b], max_outstanding=1)
+    held = [pool.acquire(), pool.acquire()]
+    assert {a, b} == set(held)
+
+    # A thread waits for a free slot instead of overloading a backend
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+    waiter.start()
+    waiter.join(0.05)
+    assert waiter.is_alive() and pool.stats()["waits"] == 1
+    pool.release(held[0])
+    waiter.join(1)
+    assert got == [held[0]]
+    pool.release(got[0])
+
+    async def scenario():
+        peak = {"now": 0, "max": 0}
+
+        async def call(backend):
+            peak["now"] += 1
+            peak["max"] = max(peak["max"], peak["now"])
+            await asyncio.sleep(0.01)
+            peak["now"] -= 1
+            return backend.url
+
+        # held[1] is still out: five coroutines take turns on the other backend
+        urls = await asyncio.gather(*(pool.acall(call) for _ in range(5)))
+        return urls, peak["max"]
+
+    urls, peak = asyncio.run(scenario())
+    assert urls == [held[0].url] * 5 and peak == 1
+    assert held[0].outstanding == 0 and pool.stats()["waiting"] == 0
+
+
+class _FakeOllama:
+    """Minimal Ollama HTTP server: answers /api/generate with its own name."""
+
+    def __init__(self, name):
+        import json
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        fake = self
+        self.name = name
+        self.failing = False
+        self.requests = 0
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like Ollama
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if fake.failing:
+                    return self._reply(503, {"error": "down"})
+                self._reply(200, {"models": []})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if fake.failing:
+                    return self._reply(500, {"error": "runner crashed"})
+                fake.requests += 1
+                self._reply(200, {"model": body["model"], "response": fake.name, "done": True})
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def test_llm_balances_across_fake_ollama_servers_with_ejection(monkeypatch):
+    from utils.backends import Backend, BackendPool
+
+    servers = [_FakeOllama("A"), _FakeOllama("B")]
+    try:
+        pool = BackendPool([Backend(s.url) for s in servers], eject_after=1, eject_seconds=60)
+        monkeypatch.setattr(llm, "_backend_pool", pool)
+        monkeypatch.setattr(llm, "_llm_cache", None)
+
+        answers = [llm.generate("m", "hi")["response"] for _ in range(4)]
+        assert sorted(answers) == ["A", "A", "B", "B"]
+
+        pinned = llm.generate("m", "hi", session="s1")["response"]
+        assert {llm.generate("m", "hi", session="s1")["response"] for _ in range(3)} == {pinned}
+
+        # The pinned server fails: the call fails over and the server is ejected
+        down, up = (servers[0], servers[1]) if pinned == "A" else (servers[1], servers[0])
+        down.failing = True
+        assert llm.generate("m", "hi", session="s1")["response"] == up.name
+        assert {llm.generate("m", "hi")["response"] for _ in range(3)} == {up.name}
+        stats = pool.stats()
+        assert stats["ejections"] == 1 and stats["failovers"] == 1
+        assert stats["backends"][down.url]["healthy"] is False
+
+        # A passing health check re-admits it
+        down.failing = False
+        assert pool.check_health() == {servers[0].url: True, servers[1].url: True}
+        assert pool.stats()["readmissions"] == 1
+        assert {llm.generate("m", "hi")["response"] for _ in range(4)} == {"A", "B"}
+    finally:
+        for server in servers:
+            server.close()
+
+
+def test_semantic_cache_matches_paraphrases_with_guards_ttl_and_audit(tmp_path):
+    import json
+
+    from utils.semantic_cache import SemanticCache
+
+    now = [1000.0]
+    audit_path = tmp_path / "audit.jsonl"
+    cache = SemanticCache(
+        threshold=0.8,
+        ttl_seconds={"search": 60},
+        audit_path=str(audit_path),
+        approximate_threshold=50,  # exercise the LSH path
+        clock=lambda: now[0],
+    )
+    for i in range(200):
+        cache.store(f"filler question number {i} about topic {i * 7}", {
+            "tool_choice": "direct", "final_answer": f"filler {i}",
+        })
+
+    assert cache.store("What is Python?", {"tool_choice": "direct", "final_answer": "A language."})
+    assert cache.store("What is 2 + 2?", {
+        "tool_choice": "calculator", "tool_output": "Calculation: 2 + 2 = 4", "final_answer": "4",
+    })
+    assert cache.store("Latest LangGraph release news", {
+        "tool_choice": "search", "tool_output": "results", "final_answer": "LangGraph 1.0",
+    })
+    assert not cache.store("Weather in Oslo", {
+        "tool_choice": "search", "tool_output": "Search error: timeout", "final_answer": "?",
+    })
+
+    exact = cache.lookup("what's python")
+    assert exact["final_answer"] == "A language." and exact["match"] == "exact"
+    similar = cache.lookup("Please, so what is Python?")
+    assert similar["final_answer"] == "A language." and similar["match"] == "similar"
+    assert cache.lookup("What is 2 * 2?") is None  # same words, different math
+    assert cache.lookup("What is Python programming?") is None  # extra content word
+    assert cache.lookup("what is 2+2")["final_answer"] == "4"
+
+    assert cache.lookup("latest langgraph release news!")["final_answer"] == "LangGraph 1.0"
+    now[0] += 61
+    assert cache.lookup("Latest LangGraph release news") is None  # search TTL
+    assert cache.lookup("What is Python?") is not None  # direct never expires
+
+    cache.log_hit("what's python", exact)
+    assert not cache.verify("what's python", exact, {"tool_choice": "search"})
+    assert cache.lookup("What is Python?") is None  # false hit evicted
+
+    events = [json.loads(line)["event"] for line in audit_path.read_text().splitlines()]
+    assert events == ["hit", "false_hit"]
+    stats = cache.stats()
+    assert stats["expired"] == 1 and stats["false_hits"] == 1 and stats["skipped"] == 1
+    assert stats["guard_rejects"] >= 1 and 0 < stats["hit_rate"] < 1
+
+
+def test_single_flight_fans_out_results_errors_and_cancellation(monkeypatch):
+    import asyncio
+    import threading
+    import time
+
+    from utils.single_flight import SingleFlight
+
+    flight = SingleFlight()
+    runs = []
+    release = threading.Event()
+
+    def work():
+        runs.append(1)
+        release.wait(2)
+        return {"answer": 42}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("q", work))) for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    while flight.counters["coalesced"] < 4:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join()
+    assert len(runs) == 1 and results == [{"answer": 42}] * 5
+
+    def boom():
+        raise ValueError("backend down")
+
+    with pytest.raises(ValueError, match="backend down"):
+        flight.do("q", boom)
+    assert flight.inflight() == 0  # the key is free again after an error
+
+    async def scenario():
+        started = []
+
+        async def slow():
+            started.append(1)
+            await asyncio.sleep(0.05)
+            return "done"
+
+        # One caller gives up; the other still gets the shared result
+        quitter = asyncio.ensure_future(flight.ado("a", slow))
+        stayer = asyncio.ensure_future(flight.ado("a", slow))
+        await asyncio.sleep(0)
+        quitter.cancel()
+        assert await stayer == "done"
+        assert quitter.cancelled() and len(started) == 1
+
+        # Everyone gives up: the shared task is cancelled too
+        waiters = [asyncio.ensure_future(flight.ado("b", slow)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for w in waiters:
+            w.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        return flight.inflight()
+
+    assert asyncio.run(scenario()) == 0
+    stats = flight.stats()
+    assert stats["executed"] == 4 and stats["coalesced"] == 6
+    assert stats["errors"] == 1 and stats["cancelled"] == 1
+
+    # LLM calls: identical concurrent prompts hit the model once
+    calls = []
+
+    async def fake_generate(model, prompt, options=None, **_):
+        calls.append(prompt)
+        await asyncio.sleep(0.01)
+        return {"response": f"answer to {prompt}"}
+
+    llm.set_async_client(SimpleNamespace(generate=fake_generate))
+    llm.set_llm_flight(SingleFlight())
+    try:
+        async def burst():
+            return await asyncio.gather(
+                *(llm.agenerate("mistral", "same", {"temperature": 0.7}) for _ in range(8)),
+                llm.agenerate("mistral", "same", {"temperature": 0.7, "seed": 1}),
+            )
+
+        responses = asyncio.run(burst())
+    finally:
+        llm.set_async_client(None)
+        llm.set_llm_flight(None)
+    assert {r["response"] for r in responses} == {"answer to same"}
+    assert len(calls) == 2  # the seeded call is a different request
+
+
+def test_vector_memory_reindexes_when_history_is_shorter_or_replaced(tmp_path):
+    memory = VectorMemory(embedder=HashingEmbedder(dim=128), path=str(tmp_path))
+
+    def turns(*topics):
+        messages = []
+        for topic in topics:
+            messages += [
+                {"role": "user", "content": f"Tell me about {topic}"},
+                {"role": "assistant", "content": f"Here is info on {topic}"},
+            ]
+        return messages
+
+    memory.sync("s1", turns("bank pins", "tax returns", "passwords"))
+    # A new conversation under the same id: shorter, then same length but different
+    assert memory.sync("s1", turns("gardening")) == 1
+    assert [hit["text"] for hit in memory.search("s1", "bank pin", k=3)] == [
+        "User: Tell me about gardening\nAssistant: Here is info on gardening"
+    ]
+    assert memory.sync("s1", turns("cooking")) == 1
+    assert memory.search("s1", "gardening", k=3)[0]["text"].endswith("cooking")
+
+    reloaded = VectorMemory(embedder=HashingEmbedder(dim=128), path=str(tmp_path))
+    assert reloaded.sync("s1", turns("cooking", "hiking")) == 1
+    assert memory.stats()["reindexed"] == 2
+
+
+def test_batch_runs_twice_in_one_process_against_a_real_http_client(monkeypatch):
+    pytest.importorskip("langgraph")
+    from agents.batch import batch
+    from utils.backends import Backend, BackendPool
+    from utils.config import Config
+
+    server = _FakeOllama("Fine, thanks.")
+    monkeypatch.setattr(Config, "OLLAMA_BASE_URL", server.url)
+    monkeypatch.setattr(llm, "_llm_cache", None)
+    monkeypatch.setattr(llm, "_flight", None)
+    llm.set_async_client(None)
+    try:
+        # Each batch() runs its own event loop; the async clients must follow it
+        for pool in (None, BackendPool([Backend(server.url)])):
+            monkeypatch.setattr(llm, "_backend_pool", pool)
+            for _ in range(2):
+                results = batch(["Tell me something nice", "How are you today?"])
+                assert [r.get("error") for r in results] == [None, None]
+                assert all(r["final_answer"] for r in results)
+    finally:
+        llm.set_async_client(None)
+        server.close()
+
+
+def test_shared_client_is_built_from_config(monkeypatch):
+    from utils.config import Config
+
+    monkeypatch.setattr(Config, "OLLAMA_BASE_URL", "http://ollama.internal:11500")
+    monkeypatch.setattr(Config, "OLLAMA_READ_TIMEOUT", 42.0)
+    monkeypatch.setattr(llm, "_client", None)
+
+    client = llm.get_client()
+    assert llm.get_client() is client
+    assert str(client._client.base_url).startswith("http://ollama.internal:11500")
+    assert client._client.timeout.read == 42.0
+
+
+def test_vector_memory_session_ids_stay_inside_path_and_never_collide(tmp_path):
+    root = tmp_path / "vector_memory"
+    sibling = tmp_path / "sessions.sqlite3"
+    sibling.write_text("keep me")
+    memory = VectorMemory(embedder=HashingEmbedder(dim=64), path=str(root))
+
+    def turn(topic):
+        return [
+            {"role": "user", "content": f"Tell me about {topic}"},
+            {"role": "assistant", "content": f"Here is info on {topic}"},
+        ]
+
+    for session_id in ["..", "/", "a:b", "a_b"]:
+        memory.sync(session_id, turn(session_id))
+    # A shorter history drops and rebuilds the index: only inside root
+    memory.sync("..", [])
+    memory.sync("..", turn("again"))
+
+    assert sibling.read_text() == "keep me"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["sessions.sqlite3", "vector_memory"]
+    assert len(list(root.iterdir())) == 4
+
+    reloaded = VectorMemory(embedder=HashingEmbedder(dim=64), path=str(root))
+    assert reloaded.search("a:b", "topic", k=5)[0]["text"].endswith("a:b")
+    assert reloaded.search("a_b", "topic", k=5)[0]["text"].endswith("a_b")
+
+
+def test_semantic_cache_rejects_questions_that_swap_an_entity():
+    from utils.semantic_cache import SemanticCache
+
+    france = "What is the population of the capital city of France in the year we are in right now?"
+    first = "What was the name of the first president of the United States?"
+    cache = SemanticCache()  # default threshold and embedder
+    cache.store(france, {"tool_choice": "direct", "final_answer": "About 2.1 million."})
+    cache.store(first, {"tool_choice": "direct", "final_answer": "George Washington."})
+
+    # Each pair scores above the default threshold but asks about something else
+    assert cache.lookup(france.replace("France", "Germany")) is None
+    assert cache.lookup(first.replace("first", "last")) is None
+    assert cache.stats()["guard_rejects"] == 2
+
+    assert cache.lookup("So " + first.lower())["final_answer"] == "George Washington."